@@ -0,0 +1,72 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def wait_for_first(*awaitables) -> None:
+    """
+    Waits until the first of the awaitables completes. Coroutines are wrapped in tasks that are
+    cancelled afterwards; tasks passed in (e.g. the agent's run task) are left running.
+    """
+    created = []
+    waiters = []
+    for awaitable in awaitables:
+        if asyncio.isfuture(awaitable):
+            waiters.append(awaitable)
+        else:
+            task = asyncio.ensure_future(awaitable)
+            created.append(task)
+            waiters.append(task)
+    try:
+        await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in created:
+            task.cancel()
+
+
+class AgentControl:
+    """
+    Pause, resume and stop signals for a running agent. The flags stay on the agent's state
+    (browser_use checks state.paused / state.stopped itself), and an asyncio Event mirrors
+    them so that anything waiting for a resume wakes up as soon as it happens instead of
+    polling. A stop also wakes resume waiters, which then see the agent is stopped.
+    """
+
+    def __init__(self, state):
+        self.state = state
+        self._running = asyncio.Event()
+        self._sync()
+
+    def _sync(self):
+        if self.state.paused and not self.state.stopped:
+            self._running.clear()
+        else:
+            self._running.set()
+
+    def pause(self):
+        logger.info("⏸️ Agent paused")
+        self.state.paused = True
+        self._sync()
+
+    def resume(self):
+        logger.info("▶️ Agent resumed")
+        self.state.paused = False
+        self._sync()
+
+    def stop(self):
+        logger.info("⏹️ Agent stopping")
+        self.state.stopped = True
+        self._sync()
+
+    def reset(self):
+        """Clears pause and stop, e.g. before the agent runs its next task."""
+        self.state.paused = False
+        self.state.stopped = False
+        self._sync()
+
+    async def wait_until_resumed(self) -> bool:
+        """Returns once the agent is no longer paused: True if it was resumed, False if it was stopped."""
+        self._sync()  # In case the flags were set directly
+        await self._running.wait()
+        return not self.state.stopped
@@ -3,6 +3,9 @@ from __future__ import annotations
 import asyncio
 import logging
 import os
+import threading
+import time
+from distutils.util import strtobool
 
 # from lmnr.sdk.decorators import observe
 from browser_use.agent.gif import create_history_gif
@@ -11,13 +14,24 @@ from browser_use.agent.views import (
     ActionResult,
     AgentHistory,
     AgentHistoryList,
+    AgentOutput,
     AgentStepInfo,
+    StepMetadata,
     ToolCallingMethod,
 )
+from browser_use.controller.registry.views import ActionModel
 from browser_use.browser.views import BrowserStateHistory
 from browser_use.utils import time_execution_async
 from dotenv import load_dotenv
 from browser_use.agent.message_manager.utils import is_model_without_tool_support
+from langchain_core.messages import BaseMessage, HumanMessage
+
+from src.utils.metrics import observe
+
+from .agent_control import AgentControl
+from .message_manager import CustomMessageManager
+from .replay import resolve_element
+from .vision_pipeline import create_vision_pipeline
 
 load_dotenv()
 logger = logging.getLogger(__name__)
@@ -28,6 +42,202 @@ SKIP_LLM_API_KEY_VERIFICATION = (
 
 
 class BrowserUseAgent(Agent):
+    def __init__(self, *args, pipelined_steps: bool | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Same history and settings; only how screenshots and the page's elements are put into
+        # state messages differs
+        self._message_manager = CustomMessageManager(
+            task=self._message_manager.task,
+            system_message=self._message_manager.system_prompt,
+            settings=self._message_manager.settings,
+            state=self._message_manager.state,
+            dom_snapshots=getattr(self.browser_context, "dom_snapshots", None),
+            vision_pipeline=create_vision_pipeline() if self.settings.use_vision else None,
+        )
+        # Pipelined steps: capture the next browser state right after the actions, overlapping
+        # with the step's bookkeeping and hooks (needs a CustomBrowserContext)
+        self.pipelined_steps = (
+            pipelined_steps if pipelined_steps is not None
+            else bool(strtobool(os.getenv("AGENT_PIPELINED_STEPS") or "true"))
+        )
+        # Run consecutive parallel-safe actions of a step concurrently (see _multi_act_batched)
+        self.parallel_actions = bool(strtobool(os.getenv("AGENT_PARALLEL_ACTIONS") or "true"))
+        self.control = AgentControl(self.state)
+        self._acting = False
+        # Seconds per phase of each step: state (waiting for the browser state), llm, actions, total
+        self.step_timings: list[dict] = []
+        self._current_step_timing: dict = {}
+        # 'time' or 'steps' when the last run() stopped on its budget, None otherwise
+        self.budget_exhausted: str | None = None
+
+    async def get_next_action(self, input_messages: list[BaseMessage]) -> AgentOutput:
+        started = time.perf_counter()
+        try:
+            return await super().get_next_action(input_messages)
+        finally:
+            self._current_step_timing["llm"] = self._current_step_timing.get("llm", 0.0) + time.perf_counter() - started
+
+    def _split_parallel_batches(self, actions: list[ActionModel]) -> list[tuple[bool, list[ActionModel]]]:
+        """Groups the step's actions into runs of parallel-safe actions (2 or more) and sequential runs, in order."""
+        is_parallel_safe = getattr(self.controller, "is_parallel_safe", None)
+        if not self.parallel_actions or is_parallel_safe is None:
+            return [(False, actions)]
+        segments: list[tuple[bool, list[ActionModel]]] = []
+        for action in actions:
+            safe = is_parallel_safe(action)
+            if segments and segments[-1][0] == safe:
+                segments[-1][1].append(action)
+            else:
+                segments.append((safe, [action]))
+        # A lone parallel-safe action gains nothing from a batch; merge it into the sequential neighbours
+        merged: list[tuple[bool, list[ActionModel]]] = []
+        for safe, segment in segments:
+            safe = safe and len(segment) > 1
+            if merged and not safe and not merged[-1][0]:
+                merged[-1][1].extend(segment)
+            else:
+                merged.append((safe, segment))
+        return merged
+
+    async def _page_changed_before(self, action: ActionModel, step_selector_map: dict, check_for_new_elements: bool) -> str | None:
+        """browser_use's check before an indexed action that follows others: did the page change under it?"""
+        if action.get_index() is None:
+            return None
+        new_selector_map = (await self.browser_context.get_state(cache_clickable_elements_hashes=False)).selector_map
+        orig_target = step_selector_map.get(action.get_index())
+        new_target = new_selector_map.get(action.get_index())
+        orig_hash = orig_target.hash.branch_path_hash if orig_target else None
+        new_hash = new_target.hash.branch_path_hash if new_target else None
+        if orig_hash != new_hash:
+            return "Element index changed after the previous actions, because page changed."
+        step_hashes = {e.hash.branch_path_hash for e in step_selector_map.values()}
+        if check_for_new_elements and not {e.hash.branch_path_hash for e in new_selector_map.values()}.issubset(step_hashes):
+            return "Something new appeared after the previous actions"
+        return None
+
+    async def _act(self, action: ActionModel) -> ActionResult:
+        return await self.controller.act(
+            action,
+            self.browser_context,
+            self.settings.page_extraction_llm,
+            self.sensitive_data,
+            self.settings.available_file_paths,
+            context=self.context,
+        )
+
+    async def _multi_act_batched(self, actions: list[ActionModel], check_for_new_elements: bool) -> list[ActionResult]:
+        """
+        Runs the step's actions in order, except that consecutive parallel-safe actions (read-only
+        extraction, MCP tools; see CustomController.is_parallel_safe) run concurrently. Results
+        keep the order of the actions.
+        """
+        segments = self._split_parallel_batches(actions)
+        if len(segments) == 1 and not segments[0][0]:
+            return await super().multi_act(actions, check_for_new_elements=check_for_new_elements)
+
+        step_selector_map = await self.browser_context.get_selector_map()
+        results: list[ActionResult] = []
+        for i, (parallel, segment) in enumerate(segments):
+            if i > 0:
+                await asyncio.sleep(self.browser_context.config.wait_between_actions)
+            if parallel:
+                await self._raise_if_stopped_or_paused()
+                started = time.perf_counter()
+                outcomes = await asyncio.gather(*(self._act(action) for action in segment), return_exceptions=True)
+                for outcome in outcomes:
+                    if isinstance(outcome, BaseException):
+                        raise outcome
+                results += outcomes
+                logger.info(f"⚡ Ran {len(segment)} independent actions concurrently in {time.perf_counter() - started:.1f}s")
+                observe("agent.actions.parallel_batch", time.perf_counter() - started)
+            else:
+                if results:
+                    note = await self._page_changed_before(segment[0], step_selector_map, check_for_new_elements)
+                    if note:
+                        logger.info(note)
+                        results.append(ActionResult(extracted_content=note, include_in_memory=True))
+                        break
+                segment_results = await super().multi_act(segment, check_for_new_elements=check_for_new_elements)
+                results += segment_results
+                stopped_early = len(segment_results) != len(segment) or (
+                        segment_results[-1].extracted_content or ""
+                ).startswith(("Element index changed", "Something new appeared"))
+                if stopped_early:
+                    break  # browser_use stopped the rest of the step because the page changed
+            if any(result.is_done or result.error for result in results):
+                break
+        return results
+
+    def pause(self) -> None:
+        self.control.pause()
+
+    def resume(self) -> None:
+        # Unlike browser_use, do not relaunch the browser here: a dead browser or context is
+        # replaced by CustomBrowser / CustomBrowserContext on next use
+        self.control.resume()
+
+    def stop(self) -> None:
+        self.control.stop()
+
+    async def _raise_if_stopped_or_paused(self) -> None:
+        # Between the actions of a step, a pause holds the step until resumed instead of discarding
+        # the remaining actions (a Ctrl+C pause is resumed from the terminal in run() instead)
+        if (
+                self._acting
+                and self.state.paused
+                and not self.state.stopped
+                and not getattr(asyncio.get_running_loop(), "ctrl_c_pressed", False)
+        ):
+            logger.info("⏸️ Paused between actions, waiting to resume")
+            await self.control.wait_until_resumed()
+        await super()._raise_if_stopped_or_paused()
+
+    async def multi_act(
+            self,
+            actions: list[ActionModel],
+            check_for_new_elements: bool = True,
+    ) -> list[ActionResult]:
+        started = time.perf_counter()
+        self._acting = True
+        try:
+            results = await self._multi_act_batched(actions, check_for_new_elements)
+        finally:
+            self._acting = False
+        self._current_step_timing["actions"] = time.perf_counter() - started
+        if (
+                self.pipelined_steps
+                and hasattr(self.browser_context, "start_state_prefetch")
+                and not (results and results[-1].is_done)
+                and not self.state.stopped
+        ):
+            self.browser_context.start_state_prefetch()
+        return results
+
+    async def step(self, step_info: AgentStepInfo | None = None) -> None:
+        self._current_step_timing = {}
+        if hasattr(self.browser_context, "last_state_timing"):
+            self.browser_context.last_state_timing = {}
+        vision_pipeline = getattr(self._message_manager, "vision_pipeline", None)
+        if vision_pipeline is not None:
+            vision_pipeline.last_report = {}
+        started = time.perf_counter()
+        try:
+            await super().step(step_info)
+        finally:
+            timing = self._current_step_timing
+            state_timing = getattr(self.browser_context, "last_state_timing", None) or {}
+            if "wait" in state_timing:
+                timing["state"] = state_timing["wait"]
+                timing["prefetched"] = state_timing["prefetched"]
+            timing["total"] = time.perf_counter() - started
+            if vision_pipeline is not None and vision_pipeline.last_report:
+                report = vision_pipeline.last_report
+                timing["image_tokens_saved"] = report["tokens_before"] - report["tokens_after"]
+            for phase in ("state", "llm", "actions", "total"):
+                if phase in timing:
+                    observe(f"agent.step.{phase}", timing[phase])
+            self.step_timings.append({"step": self.state.n_steps, **timing})
+
     def _set_tool_calling_method(self) -> ToolCallingMethod | None:
         tool_calling_method = self.settings.tool_calling_method
         if tool_calling_method == 'auto':
@@ -44,14 +254,181 @@ class BrowserUseAgent(Agent):
         else:
             return tool_calling_method
 
+    def _append_budget_error(self, error_message: str) -> None:
+        """Record a terminal history entry when the run ends without the agent calling done"""
+        self.state.history.history.append(
+            AgentHistory(
+                model_output=None,
+                result=[ActionResult(error=error_message, include_in_memory=True)],
+                state=BrowserStateHistory(
+                    url='',
+                    title='',
+                    tabs=[],
+                    interacted_element=[],
+                    screenshot=None,
+                ),
+                metadata=None,
+            )
+        )
+
+    async def _step_with_deadline(self, step_info: AgentStepInfo, deadline: float | None) -> bool:
+        """Run one step, cancelling it if the wall-clock deadline passes. Returns False on timeout."""
+        if deadline is None:
+            await self.step(step_info)
+            return True
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        try:
+            await asyncio.wait_for(self.step(step_info), timeout=remaining)
+        except (asyncio.TimeoutError, InterruptedError):
+            # step() converts its own cancellation into InterruptedError
+            if time.monotonic() < deadline:
+                raise
+            return False
+        # step() may also swallow the cancellation and return normally; a step that did not
+        # finish the task before the deadline still counts as timed out
+        if time.monotonic() >= deadline and not self.state.history.is_done():
+            return False
+        return True
+
+    def _resolve_recorded_actions(self, recorded: AgentHistory, state) -> tuple[list[ActionModel] | None, str]:
+        """Copies of a recorded step's actions with element indices re-resolved on the current page."""
+        actions = []
+        interacted = recorded.state.interacted_element
+        for i, action in enumerate(recorded.model_output.action):
+            action = action.model_copy(deep=True)
+            historical = interacted[i] if i < len(interacted) else None
+            if action.get_index() is not None:
+                if historical is None:
+                    return None, f"action {i + 1} has no recorded element"
+                element, strategy = resolve_element(historical, state)
+                if element is None:
+                    return None, f"element <{historical.tag_name}> of action {i + 1} not found on {state.url}"
+                if element.highlight_index != action.get_index():
+                    logger.debug(f"Replay: action {i + 1} element re-resolved by {strategy}, "
+                                 f"index {action.get_index()} -> {element.highlight_index}")
+                action.set_index(element.highlight_index)
+            actions.append(action)
+        return actions, ""
+
+    async def replay(
+            self,
+            recording: AgentHistoryList,
+            on_step_start: AgentHookFunc | None = None,
+            on_step_end: AgentHookFunc | None = None,
+            replay_final_step: bool = False,
+            deadline: float | None = None,
+            cancel_event: threading.Event | None = None,
+    ) -> bool:
+        """
+        Re-executes the steps of a recorded run without calling the LLM, re-resolving each
+        action's element on the current page (see replay.resolve_element). Stops at the first step
+        that diverges (element not found, action error) and hands over to the LLM from there,
+        telling it which steps were already done. The final done step is left to the LLM unless
+        replay_final_step, so its answer reflects this run's page content. deadline (a
+        time.monotonic() value) and cancel_event end the replay early, like they end run().
+
+        Returns True if the replay completed the task.
+        """
+        steps = [item for item in recording.history if item.model_output and item.model_output.action]
+        done_goals, memory = [], []
+        divergence = None
+        for item in steps:
+            if self.state.stopped or (cancel_event is not None and cancel_event.is_set()):
+                return False
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            is_final = any(action.model_dump(exclude_unset=True).get("done") is not None
+                           for action in item.model_output.action)
+            if is_final and not replay_final_step:
+                break
+            if self.state.paused and not await self.control.wait_until_resumed():
+                return False
+            if on_step_start is not None:
+                await on_step_start(self)
+
+            step_start_time = time.time()
+            state = await self.browser_context.get_state(cache_clickable_elements_hashes=True)
+            actions, divergence = self._resolve_recorded_actions(item, state)
+            if actions is None:
+                break
+            model_output = item.model_output.model_copy(update={"action": actions})
+            try:
+                results = await self.multi_act(actions, check_for_new_elements=False)
+            except InterruptedError:
+                return False  # Stopped between actions
+            except Exception as e:
+                # e.g. a click on a covered element: the LLM takes over from this step
+                divergence = f"action raised: {e}"
+                break
+            self.state.last_result = results
+            self.state.n_steps += 1
+            self._make_history_item(
+                model_output, state, results,
+                StepMetadata(step_start_time=step_start_time, step_end_time=time.time(), input_tokens=0,
+                             step_number=self.state.n_steps),
+            )
+            if self.register_new_step_callback:
+                if asyncio.iscoroutinefunction(self.register_new_step_callback):
+                    await self.register_new_step_callback(state, model_output, self.state.n_steps)
+                else:
+                    self.register_new_step_callback(state, model_output, self.state.n_steps)
+            if on_step_end is not None:
+                await on_step_end(self)
+
+            errors = [r.error for r in results if r.error]
+            if errors:
+                divergence = f"action failed: {errors[-1].splitlines()[-1]}"
+                break
+            done_goals.append(model_output.current_state.next_goal)
+            memory += [r.extracted_content for r in results if r.include_in_memory and r.extracted_content]
+            if results[-1].is_done:
+                logger.info(f"🔁 Replayed all {len(done_goals)} recorded steps without the LLM")
+                return True
+
+        if divergence:
+            logger.info(f"🔁 Replay diverged after {len(done_goals)}/{len(steps)} steps ({divergence}), continuing with the LLM")
+        else:
+            logger.info(f"🔁 Replayed {len(done_goals)} recorded steps, handing the final step to the LLM")
+        if done_goals:
+            summary = "\n".join(f"{i + 1}. {goal}" for i, goal in enumerate(done_goals))
+            message = (
+                f"The first {len(done_goals)} step{'s' if len(done_goals) > 1 else ''} of this task "
+                f"{'were' if len(done_goals) > 1 else 'was'} replayed from an earlier run:\n{summary}"
+            )
+            if memory:
+                message += "\nResults from those steps:\n" + "\n".join(memory)
+            if divergence:
+                message += f"\nThe next recorded step could not be replayed ({divergence})."
+            message += "\nContinue the task from the current page."
+            self._message_manager._add_message_with_tokens(HumanMessage(content=message))
+        return False
+
     @time_execution_async("--run (agent)")
     async def run(
             self, max_steps: int = 100, on_step_start: AgentHookFunc | None = None,
-            on_step_end: AgentHookFunc | None = None
+            on_step_end: AgentHookFunc | None = None,
+            max_duration: float | None = None,
+            cancel_event: threading.Event | None = None,
+            replay_history: AgentHistoryList | None = None,
     ) -> AgentHistoryList:
-        """Execute the task with maximum number of steps"""
+        """
+        Execute the task with maximum number of steps.
+
+        Args:
+            max_steps: Step budget for this run.
+            max_duration: Optional wall-clock budget in seconds. When it runs out the current
+                step is cancelled and the history gathered so far is returned.
+            cancel_event: Optional external stop signal, checked before every step.
+            replay_history: Optional recorded run to replay first (see replay()); the LLM only
+                takes over where the replay diverges. Replayed steps count towards max_steps.
+        """
 
         loop = asyncio.get_event_loop()
+        deadline = time.monotonic() + max_duration if max_duration else None
+        self.budget_exhausted = None
 
         # Set up the Ctrl+C signal handler with callbacks specific to this agent
         from browser_use.utils import SignalHandler
@@ -73,9 +450,17 @@ class BrowserUseAgent(Agent):
                 result = await self.multi_act(self.initial_actions, check_for_new_elements=False)
                 self.state.last_result = result
 
-            for step in range(max_steps):
-                # Check if waiting for user input after Ctrl+C
-                if self.state.paused:
+            steps_before_replay = self.state.n_steps
+            if replay_history is not None and await self.replay(
+                    replay_history, on_step_start=on_step_start, on_step_end=on_step_end,
+                    deadline=deadline, cancel_event=cancel_event,
+            ):
+                await self.log_completion()
+                return self.state.history
+
+            for step in range(self.state.n_steps - steps_before_replay, max_steps):
+                # Check if waiting for user input after Ctrl+C (a pause from elsewhere is awaited below)
+                if self.state.paused and getattr(loop, "ctrl_c_pressed", False):
                     signal_handler.wait_for_resume()
                     signal_handler.reset()
 
@@ -89,16 +474,25 @@ class BrowserUseAgent(Agent):
                     logger.info('Agent stopped')
                     break
 
-                while self.state.paused:
-                    await asyncio.sleep(0.2)  # Small delay to prevent CPU spinning
-                    if self.state.stopped:  # Allow stopping while paused
-                        break
+                if cancel_event is not None and cancel_event.is_set():
+                    logger.info('Agent cancelled by external stop signal')
+                    self.stop()
+                    break
+
+                if self.state.paused and not await self.control.wait_until_resumed():
+                    logger.info('Agent stopped')
+                    break
 
                 if on_step_start is not None:
                     await on_step_start(self)
 
                 step_info = AgentStepInfo(step_number=step, max_steps=max_steps)
-                await self.step(step_info)
+                if not await self._step_with_deadline(step_info, deadline):
+                    self.budget_exhausted = 'time'
+                    error_message = f'Failed to complete task within {max_duration:.0f} seconds'
+                    self._append_budget_error(error_message)
+                    logger.info(f'⏱️ {error_message}')
+                    break
 
                 if on_step_end is not None:
                     await on_step_end(self)
@@ -111,23 +505,9 @@ class BrowserUseAgent(Agent):
                     await self.log_completion()
                     break
             else:
+                self.budget_exhausted = 'steps'
                 error_message = 'Failed to complete task in maximum steps'
-
-                self.state.history.history.append(
-                    AgentHistory(
-                        model_output=None,
-                        result=[ActionResult(error=error_message, include_in_memory=True)],
-                        state=BrowserStateHistory(
-                            url='',
-                            title='',
-                            tabs=[],
-                            interacted_element=[],
-                            screenshot=None,
-                        ),
-                        metadata=None,
-                    )
-                )
-
+                self._append_budget_error(error_message)
                 logger.info(f'❌ {error_message}')
 
             return self.state.history
@@ -140,6 +520,8 @@ class BrowserUseAgent(Agent):
         finally:
             # Unregister signal handlers before cleanup
             signal_handler.unregister()
+            if hasattr(self.browser_context, "cancel_state_prefetch"):
+                self.browser_context.cancel_state_prefetch()
 
             if self.settings.save_playwright_script_path:
                 logger.info(
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import logging
+
+from browser_use.agent.message_manager.service import MessageManager
+from browser_use.agent.views import ActionResult, AgentStepInfo
+from browser_use.browser.views import BrowserState
+from langchain_core.messages import BaseMessage, HumanMessage
+
+from src.browser.dom_snapshot import DomSnapshot, DomSnapshotCache
+
+from .vision_pipeline import VisionImagePipeline
+
+logger = logging.getLogger(__name__)
+
+
+class CustomMessageManager(MessageManager):
+    """
+    Keeps state messages small:
+    - the step screenshot goes through the vision pipeline (downscaled, re-encoded, or left
+      out when the page looks unchanged), see VisionImagePipeline;
+    - the page's interactive elements are sent as a delta against the last full snapshot while
+      the page is largely unchanged, see DomSnapshotCache.
+
+    State messages are dropped from the history after every step, so a delta needs its
+    reference to stay visible: when a state message carried the full tree, it is replaced by a
+    compact page snapshot message (url and elements only) instead of being dropped. That
+    message stays until the next full tree replaces it, and as an unchanging part of the
+    prompt it is also what provider-side prompt caching can reuse between steps.
+    """
+
+    def __init__(
+            self,
+            *args,
+            dom_snapshots: DomSnapshotCache | None = None,
+            vision_pipeline: VisionImagePipeline | None = None,
+            **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.dom_snapshots = dom_snapshots
+        self.vision_pipeline = vision_pipeline
+        self._baseline_message: BaseMessage | None = None
+        # Full state message of this step and its snapshot, until the step is done with it
+        self._pending_full: tuple[BaseMessage, DomSnapshot] | None = None
+        self._pending_state: BaseMessage | None = None
+
+    def _drop_message(self, message: BaseMessage | None):
+        history = self.state.history
+        for i, managed in enumerate(history.messages):
+            if managed.message is message:
+                history.current_tokens -= managed.metadata.tokens
+                history.messages.pop(i)
+                return
+
+    def _baseline_in_history(self) -> bool:
+        return self._baseline_message is not None and any(
+            managed.message is self._baseline_message for managed in self.state.history.messages
+        )
+
+    def add_state_message(
+            self,
+            state: BrowserState,
+            result: list[ActionResult] | None = None,
+            step_info: AgentStepInfo | None = None,
+            use_vision=True,
+    ) -> None:
+        if self.dom_snapshots is None or not self.dom_snapshots.enabled or state.element_tree is None:
+            super().add_state_message(state, result, step_info, use_vision)
+            self._process_screenshot(use_vision)
+            return
+
+        snapshot = DomSnapshot.from_state(state, self.settings.include_attributes)
+        if not self._baseline_in_history():
+            # e.g. cut from the history to fit max_input_tokens
+            self.dom_snapshots.reset()
+        delta = self.dom_snapshots.diff(snapshot)
+
+        super().add_state_message(state, result, step_info, use_vision)
+        self._process_screenshot(use_vision)
+        message = self.state.history.messages[-1].message
+        self._pending_state = message
+        if delta is not None:
+            delta_text = delta.to_text(self.dom_snapshots.baseline_step)
+            if self._replace_elements_text(snapshot.text, delta_text):
+                self.dom_snapshots.record_delta(snapshot, delta_text)
+                logger.debug(
+                    f"Sending a DOM delta of {len(delta_text)} chars instead of {len(snapshot.text)} chars "
+                    f"({delta.size} changed lines)"
+                )
+                return
+
+        self._drop_message(self._baseline_message)
+        self._baseline_message = None
+        self._pending_full = (message, snapshot)
+        self.dom_snapshots.set_baseline(snapshot, step_info.step_number + 1 if step_info else None)
+
+    def _process_screenshot(self, use_vision: bool):
+        """Replaces the screenshot of the last (state) message with the vision pipeline's image, or a note if skipped."""
+        if self.vision_pipeline is None or not use_vision:
+            return
+        managed = self.state.history.messages[-1]
+        content = managed.message.content
+        if not isinstance(content, list):
+            return
+        for i, item in enumerate(content):
+            if not (isinstance(item, dict) and item.get("type") == "image_url"):
+                continue
+            url = item["image_url"]["url"]
+            try:
+                image = self.vision_pipeline.process(url.split(",", 1)[1])
+            except Exception as e:
+                logger.warning(f"Vision pipeline failed, sending the original screenshot: {e}")
+                return
+            if image is None:
+                content[i] = {
+                    "type": "text",
+                    "text": "[No screenshot this step: the page looks visually unchanged since the last one; "
+                            "rely on the element list]",
+                }
+            else:
+                mime_type, data = image
+                content[i] = {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{data}"}}
+            break
+        tokens = self._count_tokens(managed.message)
+        self.state.history.current_tokens += tokens - managed.metadata.tokens
+        managed.metadata.tokens = tokens
+
+    def _replace_elements_text(self, elements_text: str, delta_text: str) -> bool:
+        """Swaps the full element list in the last (state) message for the delta and recounts its tokens."""
+        if self.settings.sensitive_data:
+            # The message was already filtered, so look for the filtered element list
+            elements_text = self._filter_sensitive_data(HumanMessage(content=elements_text)).content
+            delta_text = self._filter_sensitive_data(HumanMessage(content=delta_text)).content
+        managed = self.state.history.messages[-1]
+        content = managed.message.content
+        if isinstance(content, str):
+            if elements_text not in content:
+                return False
+            managed.message.content = content.replace(elements_text, delta_text, 1)
+        else:
+            parts = [item for item in content if isinstance(item, dict) and elements_text in item.get("text", "")]
+            if not parts:
+                return False
+            parts[0]["text"] = parts[0]["text"].replace(elements_text, delta_text, 1)
+        tokens = self._count_tokens(managed.message)
+        self.state.history.current_tokens += tokens - managed.metadata.tokens
+        managed.metadata.tokens = tokens
+        return True
+
+    def _remove_last_state_message(self) -> None:
+        pending_full, self._pending_full = self._pending_full, None
+        pending_state, self._pending_state = self._pending_state, None
+        messages = self.state.history.messages
+        if pending_full is None or not messages or messages[-1].message is not pending_state:
+            if pending_full is not None:
+                # The full state message stays in the history (something was added after it) and serves as the baseline
+                self._baseline_message = pending_full[0]
+            super()._remove_last_state_message()
+            return
+
+        # Keep the element tree of the full state message as the baseline for the next steps' deltas
+        _, snapshot = pending_full
+        super()._remove_last_state_message()
+        step = self.dom_snapshots.baseline_step
+        baseline = HumanMessage(
+            content=(
+                f"[Page snapshot{f' of step {step}' if step else ''} - later states list only the changes to it]\n"
+                f"Url: {snapshot.url}\n"
+                f"Interactive elements:\n{snapshot.text}"
+            )
+        )
+        self._add_message_with_tokens(baseline)
+        self._baseline_message = self.state.history.messages[-1].message
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+from pathlib import Path
+
+from browser_use.agent.views import AgentHistoryList
+from browser_use.browser.context import BrowserContext
+from browser_use.browser.views import BrowserState
+from browser_use.dom.history_tree_processor.service import DOMHistoryElement, HistoryTreeProcessor
+from browser_use.dom.views import DOMElementNode
+
+logger = logging.getLogger(__name__)
+
+# Attributes that usually identify an element across page loads (unlike classes or generated ids)
+STABLE_ATTRIBUTES = ("id", "name", "type", "role", "aria-label", "placeholder", "title", "href", "alt", "data-testid")
+
+
+def resolve_element(historical: DOMHistoryElement, state: BrowserState) -> tuple[DOMElementNode | None, str]:
+    """
+    Finds the element a recorded action interacted with on the current page. Tries, in order:
+    the exact branch/attribute hash browser_use records, the xpath, the CSS selector and finally a
+    unique match on stable attributes. Returns the element and the strategy that found it.
+    """
+    if state.element_tree is not None:
+        node = HistoryTreeProcessor.find_history_element_in_tree(historical, state.element_tree)
+        if node is not None and node.highlight_index is not None:
+            return node, "hash"
+
+    candidates = [node for node in state.selector_map.values() if node.tag_name == historical.tag_name]
+
+    by_xpath = [node for node in candidates if node.xpath == historical.xpath]
+    if len(by_xpath) == 1:
+        return by_xpath[0], "xpath"
+
+    if historical.css_selector:
+        by_selector = []
+        for node in candidates:
+            try:
+                if BrowserContext._enhanced_css_selector_for_element(node) == historical.css_selector:
+                    by_selector.append(node)
+            except Exception:
+                continue
+        if len(by_selector) == 1:
+            return by_selector[0], "selector"
+
+    stable = {key: value for key, value in historical.attributes.items() if key in STABLE_ATTRIBUTES and value}
+    if stable:
+        by_attributes = [
+            node for node in candidates if all(node.attributes.get(key) == value for key, value in stable.items())
+        ]
+        if len(by_attributes) == 1:
+            return by_attributes[0], "attributes"
+    return None, "not found"
+
+
+class RecordingStore:
+    """
+    Recorded successful runs, one AgentHistoryList JSON per task (keyed by the normalised task
+    text), so a recurring task can be replayed instead of re-planned by the LLM.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def path_for(self, task: str) -> str:
+        normalised = " ".join(task.lower().split())
+        return os.path.join(self.directory, f"{hashlib.sha256(normalised.encode('utf-8')).hexdigest()[:24]}.json")
+
+    def load(self, task: str, output_model) -> AgentHistoryList | None:
+        """The recording for task, parsed with the agent's AgentOutput model, or None."""
+        path = self.path_for(task)
+        if not os.path.exists(path):
+            return None
+        try:
+            return AgentHistoryList.load_from_file(path, output_model)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable recording {path}: {e}")
+            return None
+
+    def save(self, task: str, history: AgentHistoryList) -> str | None:
+        """Stores history as the recording for task if the run finished successfully. Returns the path."""
+        if not (history.is_done() and history.is_successful()):
+            return None
+        path = self.path_for(task)
+        Path(self.directory).mkdir(parents=True, exist_ok=True)
+        history.save_to_file(path)
+        logger.info(f"Recorded run for replay: {path}")
+        return path
+
+
+def get_recording_store() -> RecordingStore:
+    """Recordings live in AGENT_REPLAY_DIR (default ./tmp/recordings)."""
+    return RecordingStore(os.getenv("AGENT_REPLAY_DIR") or "./tmp/recordings")
@@ -0,0 +1,196 @@
+import base64
+import io
+import logging
+import os
+import time
+from distutils.util import strtobool
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image, ImageChops
+
+from src.utils.metrics import observe
+
+logger = logging.getLogger(__name__)
+
+IMAGE_FORMATS = {"jpeg": "JPEG", "webp": "WEBP", "png": "PNG"}
+MIN_QUALITY = 35
+QUALITY_STEP = 15
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    """Rough prompt cost of an image: vision models bill by area, around 750 pixels per token."""
+    return max(int(width * height / 750), 1)
+
+
+def dhash(image: Image.Image, hash_size: int = 16) -> int:
+    """Difference hash: one bit per horizontally adjacent pixel pair of a small grayscale thumbnail."""
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+
+def crop_uniform_border(image: Image.Image, tolerance: int = 8, min_saving: float = 0.1) -> Image.Image:
+    """
+    Crops margins of the page background colour (taken from the top-left pixel) around the content,
+    e.g. the empty sides of a narrow centred layout, when that removes at least min_saving of the area.
+    """
+    rgb = image.convert("RGB")
+    background = Image.new("RGB", rgb.size, rgb.getpixel((0, 0)))
+    diff = ImageChops.difference(rgb, background).convert("L").point(lambda value: 255 if value > tolerance else 0)
+    bbox = diff.getbbox()
+    if not bbox:
+        return image
+    width, height = image.size
+    if (bbox[2] - bbox[0]) * (bbox[3] - bbox[1]) > (1 - min_saving) * width * height:
+        return image
+    return image.crop(bbox)
+
+
+class VisionImagePipeline:
+    """
+    Prepares the step screenshot for the LLM: crops uniform page margins, caps the resolution,
+    re-encodes it as JPEG/WebP with the highest quality that fits max_bytes, and optionally skips
+    it when the page looks the same as the last screenshot sent (perceptual hash within
+    hash_threshold bits). Skipping is off by default: earlier state messages are removed from the
+    prompt, so a skipped step leaves the LLM without any image, and a small change such as a
+    typed character or a toggled checkbox can fall within the threshold.
+    The screenshot in the browser state, history and GIF is left untouched.
+    """
+
+    def __init__(
+            self,
+            max_width: int = 1024,
+            max_height: int = 1024,
+            image_format: str = "jpeg",
+            quality: int = 75,
+            max_bytes: int = 150 * 1024,
+            crop: bool = True,
+            skip_unchanged: bool = False,
+            hash_threshold: int = 2,
+            max_consecutive_skips: int = 2,
+    ):
+        self.max_width = max_width
+        self.max_height = max_height
+        self.image_format = image_format if image_format in IMAGE_FORMATS else "jpeg"
+        self.quality = quality
+        self.max_bytes = max_bytes
+        self.crop = crop
+        self.skip_unchanged = skip_unchanged
+        self.hash_threshold = hash_threshold
+        self.max_consecutive_skips = max_consecutive_skips
+        self._last_hash: Optional[int] = None
+        self._consecutive_skips = 0
+        self.last_report: Dict[str, Any] = {}
+        self.stats = {"images": 0, "skipped": 0, "tokens_before": 0, "tokens_after": 0, "bytes_before": 0, "bytes_after": 0}
+
+    def reset(self):
+        self._last_hash = None
+        self._consecutive_skips = 0
+
+    def _encode(self, image: Image.Image) -> Tuple[bytes, int]:
+        pil_format = IMAGE_FORMATS[self.image_format]
+        if pil_format == "PNG":
+            buffer = io.BytesIO()
+            image.save(buffer, format="PNG", optimize=True)
+            return buffer.getvalue(), 100
+        image = image.convert("RGB")
+        quality = self.quality
+        while True:
+            buffer = io.BytesIO()
+            image.save(buffer, format=pil_format, quality=quality)
+            if buffer.tell() <= self.max_bytes or quality <= MIN_QUALITY:
+                return buffer.getvalue(), quality
+            quality = max(quality - QUALITY_STEP, MIN_QUALITY)
+
+    def process(self, screenshot_b64: str) -> Optional[Tuple[str, str]]:
+        """
+        Returns (mime type, base64 data) of the image to send, or None when it should be skipped
+        because the page has not visibly changed since the last image sent.
+        """
+        started = time.perf_counter()
+        raw = base64.b64decode(screenshot_b64)
+        image = Image.open(io.BytesIO(raw))
+        image.load()
+        original_size = image.size
+        tokens_before = estimate_image_tokens(*original_size)
+
+        image_hash = dhash(image)
+        unchanged = (
+                self.skip_unchanged
+                and self._last_hash is not None
+                and bin(image_hash ^ self._last_hash).count("1") <= self.hash_threshold
+                and self._consecutive_skips < self.max_consecutive_skips
+        )
+        self.stats["images"] += 1
+        self.stats["tokens_before"] += tokens_before
+        self.stats["bytes_before"] += len(raw)
+        if unchanged:
+            self._consecutive_skips += 1
+            self.stats["skipped"] += 1
+            self.last_report = {"skipped": True, "tokens_before": tokens_before, "tokens_after": 0}
+            logger.info(f"📷 Screenshot unchanged since the last step, not sent (~{tokens_before} image tokens saved)")
+            return None
+        self._last_hash = image_hash
+        self._consecutive_skips = 0
+
+        if self.crop:
+            image = crop_uniform_border(image)
+        image.thumbnail((self.max_width, self.max_height), Image.Resampling.LANCZOS)
+        data, quality = self._encode(image)
+        if image.size == original_size and len(data) >= len(raw):
+            # Nothing to gain, keep the original PNG
+            data, quality = raw, 100
+            mime_type = "image/png"
+        else:
+            mime_type = f"image/{self.image_format}"
+        tokens_after = estimate_image_tokens(*image.size)
+        self.stats["tokens_after"] += tokens_after
+        self.stats["bytes_after"] += len(data)
+        self.last_report = {
+            "skipped": False,
+            "original_size": original_size,
+            "size": image.size,
+            "quality": quality,
+            "bytes_before": len(raw),
+            "bytes_after": len(data),
+            "tokens_before": tokens_before,
+            "tokens_after": tokens_after,
+        }
+        observe("agent.vision.process", time.perf_counter() - started)
+        logger.info(
+            f"📷 Screenshot {original_size[0]}x{original_size[1]} ({len(raw) // 1024}KB, ~{tokens_before} tokens) -> "
+            f"{image.size[0]}x{image.size[1]} {mime_type} q{quality} ({len(data) // 1024}KB, ~{tokens_after} tokens)"
+        )
+        return mime_type, base64.b64encode(data).decode("ascii")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "tokens_saved": self.stats["tokens_before"] - self.stats["tokens_after"]}
+
+
+def create_vision_pipeline() -> Optional[VisionImagePipeline]:
+    """
+    Builds the pipeline from VISION_IMAGE_PIPELINE (true/false), VISION_IMAGE_MAX_WIDTH/HEIGHT,
+    VISION_IMAGE_FORMAT (jpeg, webp or png), VISION_IMAGE_QUALITY, VISION_IMAGE_MAX_KB,
+    VISION_IMAGE_CROP, VISION_SKIP_UNCHANGED and VISION_HASH_THRESHOLD.
+    """
+    def flag(name: str, default: str) -> bool:
+        return bool(strtobool(os.getenv(name) or default))
+
+    if not flag("VISION_IMAGE_PIPELINE", "true"):
+        return None
+    return VisionImagePipeline(
+        max_width=int(os.getenv("VISION_IMAGE_MAX_WIDTH", "1024")),
+        max_height=int(os.getenv("VISION_IMAGE_MAX_HEIGHT", "1024")),
+        image_format=os.getenv("VISION_IMAGE_FORMAT", "jpeg").lower(),
+        quality=int(os.getenv("VISION_IMAGE_QUALITY", "75")),
+        max_bytes=int(os.getenv("VISION_IMAGE_MAX_KB", "150")) * 1024,
+        crop=flag("VISION_IMAGE_CROP", "true"),
+        skip_unchanged=flag("VISION_SKIP_UNCHANGED", "false"),
+        hash_threshold=int(os.getenv("VISION_HASH_THRESHOLD", "2")),
+    )
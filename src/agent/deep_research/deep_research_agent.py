@@ -1,11 +1,14 @@
 import asyncio
+import contextlib
+import inspect
 import json
 import logging
 import os
 import threading
 import uuid
+from functools import partial
 from pathlib import Path
-from typing import Any, Dict, List, Optional, TypedDict
+from typing import Any, Callable, Dict, List, Optional, TypedDict
 
 from browser_use.browser.browser import BrowserConfig
 from langchain_community.tools.file_management import (
@@ -32,7 +35,11 @@ from pydantic import BaseModel, Field
 from browser_use.browser.context import BrowserContextConfig
 
 from src.agent.browser_use.browser_use_agent import BrowserUseAgent
+from src.agent.deep_research import progress_events
+from src.agent.deep_research.progress_events import ResearchEventBus
+from src.agent.deep_research.tiered_retrieval import BrowserRenderPool, create_tiered_fetch_tool
 from src.browser.custom_browser import CustomBrowser
+from src.browser.custom_context import CustomBrowserContextConfig
 from src.controller.custom_controller import CustomController
 from src.utils.mcp_client import setup_mcp_client_and_tools
 
@@ -42,9 +49,15 @@ logger = logging.getLogger(__name__)
 REPORT_FILENAME = "report.md"
 PLAN_FILENAME = "research_plan.md"
 SEARCH_INFO_FILENAME = "search_info.json"
+SEARCH_STREAM_FILENAME = "search_stream.jsonl"
 
 _AGENT_STOP_FLAGS = {}
 _BROWSER_AGENT_INSTANCES = {}
+# Searches left running after a quorum was reached (and their result notifications), and the results they produced since
+_BACKGROUND_SEARCH_TASKS = set()
+_LATE_SEARCH_RESULTS: Dict[str, List[Dict[str, Any]]] = {}
+# Research runs in progress; late results of any other task_id are dropped
+_ACTIVE_RESEARCH_RUNS = set()
 
 
 async def run_single_browser_task(
@@ -54,10 +67,18 @@ async def run_single_browser_task(
         browser_config: Dict[str, Any],
         stop_event: threading.Event,
         use_vision: bool = False,
+        max_steps: int = 100,
+        max_duration: Optional[float] = None,
+        task_key: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
     Runs a single BrowserUseAgent task.
     Manages browser creation and closing for this specific task.
+
+    max_steps and max_duration bound how long one query can hold a browser. When the
+    time budget runs out, whatever the agent extracted so far is returned with status "timeout".
+    task_key, if given, is the key the agent is registered under in _BROWSER_AGENT_INSTANCES,
+    so the caller can stop this query's agent.
     """
     if not BrowserUseAgent:
         return {
@@ -76,9 +97,11 @@ async def run_single_browser_task(
     wss_url = browser_config.get("wss_url", None)
     cdp_url = browser_config.get("cdp_url", None)
     disable_security = browser_config.get("disable_security", False)
+    resource_blocking = browser_config.get("resource_blocking", "off")
 
     bu_browser = None
     bu_browser_context = None
+    task_key = task_key or f"{task_id}_{uuid.uuid4()}"
     try:
         logger.info(f"Starting browser task for query: {task_query}")
         extra_args = []
@@ -113,11 +136,13 @@ async def run_single_browser_task(
             )
         )
 
-        context_config = BrowserContextConfig(
+        context_config = CustomBrowserContextConfig(
             save_downloads_path="./tmp/downloads",
             window_height=window_h,
             window_width=window_w,
             force_new_context=True,
+            resource_blocking=resource_blocking,
+            use_vision=use_vision,
         )
         bu_browser_context = await bu_browser.new_context(config=context_config)
 
@@ -148,22 +173,23 @@ async def run_single_browser_task(
         )
 
         # Store instance for potential stop() call
-        task_key = f"{task_id}_{uuid.uuid4()}"
         _BROWSER_AGENT_INSTANCES[task_key] = bu_agent_instance
 
         # --- Run with Stop Check ---
-        # BrowserUseAgent needs to internally check a stop signal or have a stop method.
-        # We simulate checking before starting and assume `run` might be interruptible
-        # or have its own stop mechanism we can trigger via bu_agent_instance.stop().
+        # The stop event is checked before every step of the agent; DeepResearchAgent.stop()
+        # additionally calls bu_agent_instance.stop() so a running step is interrupted too.
         if stop_event.is_set():
             logger.info(f"Browser task for '{task_query}' cancelled before start.")
             return {"query": task_query, "result": None, "status": "cancelled"}
 
-        # The run needs to be awaitable and ideally accept a stop signal or have a .stop() method
-        # result = await bu_agent_instance.run(max_steps=max_steps) # Add max_steps if applicable
-        # Let's assume a simplified run for now
-        logger.info(f"Running BrowserUseAgent for: {task_query}")
-        result = await bu_agent_instance.run()  # Assuming run is the main method
+        logger.info(
+            f"Running BrowserUseAgent for: {task_query} (max_steps={max_steps}, max_duration={max_duration})"
+        )
+        result = await bu_agent_instance.run(
+            max_steps=max_steps,
+            max_duration=max_duration,
+            cancel_event=stop_event,
+        )
         logger.info(f"BrowserUseAgent finished for: {task_query}")
 
         final_data = result.final_result()
@@ -171,6 +197,11 @@ async def run_single_browser_task(
         if stop_event.is_set():
             logger.info(f"Browser task for '{task_query}' stopped during execution.")
             return {"query": task_query, "result": final_data, "status": "stopped"}
+        elif bu_agent_instance.budget_exhausted == "time":
+            # Hand back what was extracted before the deadline instead of nothing
+            partial_data = final_data or "\n".join(result.extracted_content()) or None
+            logger.warning(f"Browser task for '{task_query}' timed out after {max_duration}s.")
+            return {"query": task_query, "result": partial_data, "status": "timeout"}
         else:
             logger.info(f"Browser result for '{task_query}': {final_data}")
             return {"query": task_query, "result": final_data, "status": "completed"}
@@ -196,8 +227,7 @@ async def run_single_browser_task(
             except Exception as e:
                 logger.error(f"Error closing browser: {e}")
 
-        if task_key in _BROWSER_AGENT_INSTANCES:
-            del _BROWSER_AGENT_INSTANCES[task_key]
+        _BROWSER_AGENT_INSTANCES.pop(task_key, None)
 
 
 class BrowserSearchInput(BaseModel):
@@ -206,6 +236,66 @@ class BrowserSearchInput(BaseModel):
     )
 
 
+def _normalize_search_result(query: str, res: Any, task_id: str) -> Dict[str, Any]:
+    """Turns whatever a search task produced (dict or exception) into a result dict."""
+    if isinstance(res, asyncio.CancelledError):
+        return {"query": query, "result": None, "status": "cancelled"}
+    if isinstance(res, Exception):
+        logger.error(
+            f"[Browser Tool {task_id}] Search task raised for query '{query}': {res}",
+            exc_info=res,
+        )
+        return {"query": query, "error": str(res), "status": "failed"}
+    if isinstance(res, dict):
+        return res
+    logger.error(
+        f"[Browser Tool {task_id}] Unexpected result type for query '{query}': {type(res)}"
+    )
+    return {"query": query, "error": "Unexpected result type", "status": "failed"}
+
+
+def _task_outcome(task: asyncio.Task) -> Any:
+    if task.cancelled():
+        return asyncio.CancelledError()
+    return task.exception() or task.result()
+
+
+async def _notify_search_result(
+        on_result: Optional[Callable[[Dict[str, Any]], Any]], result: Dict[str, Any], task_id: str
+):
+    if not on_result:
+        return
+    try:
+        ret = on_result(result)
+        if inspect.isawaitable(ret):
+            await ret
+    except Exception as e:
+        logger.error(f"[Browser Tool {task_id}] on_result callback failed: {e}")
+
+
+def _drain_late_search_results(task_id: str) -> List[Dict[str, Any]]:
+    """Returns (and forgets) results of background searches that finished after their tool call returned."""
+    return _LATE_SEARCH_RESULTS.pop(task_id, [])
+
+
+def _merge_late_search_results(results: List[Dict[str, Any]], task_id: str) -> List[Dict[str, Any]]:
+    """
+    Puts the results of background searches in place of their "running" placeholders (matched
+    by search_id) in results; late results without a placeholder are appended.
+    """
+    placeholders = {
+        res["search_id"]: i for i, res in enumerate(results)
+        if res.get("status") == "running" and res.get("search_id")
+    }
+    for late in _drain_late_search_results(task_id):
+        i = placeholders.pop(late.get("search_id"), None)
+        if i is None:
+            results.append(late)
+        else:
+            results[i] = late
+    return results
+
+
 async def _run_browser_search_tool(
         queries: List[str],
         task_id: str,  # Injected dependency
@@ -213,10 +303,23 @@ async def _run_browser_search_tool(
         browser_config: Dict[str, Any],
         stop_event: threading.Event,
         max_parallel_browsers: int = 1,
+        max_query_steps: int = 100,
+        query_timeout: Optional[float] = None,
+        result_quorum: Optional[int] = None,
+        cancel_stragglers: bool = True,
+        on_result: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        browser_semaphore: Optional[asyncio.Semaphore] = None,
 ) -> List[Dict[str, Any]]:
     """
     Internal function to execute parallel browser searches based on LLM-provided queries.
-    Handles concurrency and stop signals.
+    Handles concurrency, per-query budgets and stop signals. browser_semaphore, when given,
+    is a process-wide browser budget shared with other research runs.
+
+    Results are consumed as they complete: each one is handed to on_result immediately, so
+    the slowest browser no longer delays persisting the others. With result_quorum set, the
+    tool returns once that many queries produced a result; the remaining searches are either
+    cancelled or, with cancel_stragglers=False, left to finish in the background (their
+    results are still passed to on_result and picked up by the next graph node).
     """
 
     # Limit queries just in case LLM ignores the description
@@ -225,11 +328,12 @@ async def _run_browser_search_tool(
         f"[Browser Tool {task_id}] Running search for {len(queries)} queries: {queries}"
     )
 
-    results = []
     semaphore = asyncio.Semaphore(max_parallel_browsers)
 
-    async def task_wrapper(query):
-        async with semaphore:
+    agent_keys = [f"{task_id}_{uuid.uuid4()}" for _ in queries]
+
+    async def task_wrapper(query, agent_key):
+        async with semaphore, (browser_semaphore or contextlib.nullcontext()):
             if stop_event.is_set():
                 logger.info(
                     f"[Browser Tool {task_id}] Skipping task due to stop signal: {query}"
@@ -243,44 +347,101 @@ async def _run_browser_search_tool(
                 browser_config,
                 stop_event,
                 # use_vision could be added here if needed
+                max_steps=max_query_steps,
+                max_duration=query_timeout,
+                task_key=agent_key,
             )
 
-    tasks = [task_wrapper(query) for query in queries]
-    search_results = await asyncio.gather(*tasks, return_exceptions=True)
-
-    processed_results = []
-    for i, res in enumerate(search_results):
-        query = queries[i]  # Get corresponding query
-        if isinstance(res, Exception):
-            logger.error(
-                f"[Browser Tool {task_id}] Gather caught exception for query '{query}': {res}",
-                exc_info=True,
-            )
-            processed_results.append(
-                {"query": query, "error": str(res), "status": "failed"}
-            )
-        elif isinstance(res, dict):
-            processed_results.append(res)
-        else:
-            logger.error(
-                f"[Browser Tool {task_id}] Unexpected result type for query '{query}': {type(res)}"
-            )
-            processed_results.append(
-                {"query": query, "error": "Unexpected result type", "status": "failed"}
+    tasks = {asyncio.create_task(task_wrapper(query, agent_keys[i])): i for i, query in enumerate(queries)}
+    processed_results: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+    pending = set(tasks)
+    useful_results = 0
+
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for finished in done:
+            i = tasks[finished]
+            result = _normalize_search_result(queries[i], _task_outcome(finished), task_id)
+            processed_results[i] = result
+            if result.get("status") in ("completed", "timeout") and result.get("result"):
+                useful_results += 1
+            logger.info(
+                f"[Browser Tool {task_id}] Query finished ({len(queries) - len(pending)}/{len(queries)}): "
+                f"'{queries[i]}' -> {result.get('status')}"
             )
+            await _notify_search_result(on_result, result, task_id)
 
+        if pending and result_quorum and useful_results >= result_quorum:
+            logger.info(
+                f"[Browser Tool {task_id}] Quorum of {result_quorum} results reached, "
+                f"{'cancelling' if cancel_stragglers else 'detaching'} {len(pending)} straggler(s)."
+            )
+            for straggler in pending:
+                i = tasks[straggler]
+                if cancel_stragglers:
+                    # browser_use turns a cancelled step into InterruptedError and carries on with
+                    # the next step, so stop the agent itself before cancelling its task
+                    agent = _BROWSER_AGENT_INSTANCES.get(agent_keys[i])
+                    if agent is not None:
+                        agent.stop()
+                    straggler.cancel()
+                    processed_results[i] = {"query": queries[i], "result": None, "status": "cancelled"}
+                else:
+                    search_id = agent_keys[i]
+                    _detach_search_task(straggler, queries[i], task_id, on_result, search_id)
+                    processed_results[i] = {"query": queries[i], "result": None, "status": "running",
+                                            "search_id": search_id}
+            if cancel_stragglers:
+                # Wait until their browsers are closed and their semaphore slots are free again
+                await asyncio.gather(*pending, return_exceptions=True)
+            break
+
+    processed_results = [res for res in processed_results if res is not None]
     logger.info(
         f"[Browser Tool {task_id}] Finished search. Results count: {len(processed_results)}"
     )
     return processed_results
 
 
+def _detach_search_task(
+        task: asyncio.Task,
+        query: str,
+        task_id: str,
+        on_result: Optional[Callable[[Dict[str, Any]], Any]],
+        search_id: str,
+):
+    """
+    Lets a straggling search finish in the background and queues its result for the graph, which
+    puts it in place of the "running" placeholder with the same search_id. Results arriving
+    after the research run finished are only passed to on_result.
+    """
+    _BACKGROUND_SEARCH_TASKS.add(task)
+
+    def _on_done(t: asyncio.Task):
+        _BACKGROUND_SEARCH_TASKS.discard(t)
+        result = {**_normalize_search_result(query, _task_outcome(t), task_id), "search_id": search_id}
+        if task_id in _ACTIVE_RESEARCH_RUNS:
+            _LATE_SEARCH_RESULTS.setdefault(task_id, []).append(result)
+        if on_result:
+            notification = asyncio.ensure_future(_notify_search_result(on_result, result, task_id))
+            _BACKGROUND_SEARCH_TASKS.add(notification)
+            notification.add_done_callback(_BACKGROUND_SEARCH_TASKS.discard)
+
+    task.add_done_callback(_on_done)
+
+
 def create_browser_search_tool(
         llm: Any,
         browser_config: Dict[str, Any],
         task_id: str,
         stop_event: threading.Event,
         max_parallel_browsers: int = 1,
+        max_query_steps: int = 100,
+        query_timeout: Optional[float] = None,
+        result_quorum: Optional[int] = None,
+        cancel_stragglers: bool = True,
+        on_result: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        browser_semaphore: Optional[asyncio.Semaphore] = None,
 ) -> StructuredTool:
     """Factory function to create the browser search tool with necessary dependencies."""
     # partial 是 Python functools 模块中的一个函数，用于“预先绑定”部分参数，返回一个新的可调用对象。
@@ -294,6 +455,12 @@ def create_browser_search_tool(
         browser_config=browser_config,
         stop_event=stop_event,
         max_parallel_browsers=max_parallel_browsers,
+        max_query_steps=max_query_steps,
+        query_timeout=query_timeout,
+        result_quorum=result_quorum,
+        cancel_stragglers=cancel_stragglers,
+        on_result=on_result,
+        browser_semaphore=browser_semaphore,
     )
 
     return StructuredTool.from_function(
@@ -338,6 +505,8 @@ class DeepResearchState(TypedDict):
     stop_requested: bool
     error_message: Optional[str]
     messages: List[BaseMessage]
+    event_bus: Optional[ResearchEventBus]
+    llm_semaphore: Optional[asyncio.Semaphore]
 
 
 # --- Langgraph Nodes ---
@@ -426,18 +595,23 @@ def _load_previous_state(task_id: str, output_dir: str) -> Dict[str, Any]:
     return state_updates
 
 
+def format_plan_markdown(plan: List[ResearchCategoryItem]) -> str:
+    lines = ["# Research Plan\n"]
+    for cat_idx, category in enumerate(plan):
+        lines.append(f"## {cat_idx + 1}. {category['category_name']}\n")
+        for task_idx, task in enumerate(category['tasks']):
+            marker = "- [x]" if task["status"] == "completed" else "- [ ]" if task[
+                                                                                  "status"] == "pending" else "- [-]"  # [-] for failed
+            lines.append(f"  {marker} {task['task_description']}")
+        lines.append("")
+    return "\n".join(lines) + "\n"
+
+
 def _save_plan_to_md(plan: List[ResearchCategoryItem], output_dir: str):
     plan_file = os.path.join(output_dir, PLAN_FILENAME)
     try:
         with open(plan_file, "w", encoding="utf-8") as f:
-            f.write(f"# Research Plan\n\n")
-            for cat_idx, category in enumerate(plan):
-                f.write(f"## {cat_idx + 1}. {category['category_name']}\n\n")
-                for task_idx, task in enumerate(category['tasks']):
-                    marker = "- [x]" if task["status"] == "completed" else "- [ ]" if task[
-                                                                                          "status"] == "pending" else "- [-]"  # [-] for failed
-                    f.write(f"  {marker} {task['task_description']}\n")
-                f.write("\n")
+            f.write(format_plan_markdown(plan))
         logger.info(f"Hierarchical research plan saved to {plan_file}")
     except Exception as e:
         logger.error(f"Failed to save research plan to {plan_file}: {e}")
@@ -455,6 +629,16 @@ def _save_search_results_to_json(results: List[Dict[str, Any]], output_dir: str)
         logger.error(f"Failed to save search results to {search_file}: {e}")
 
 
+def _append_search_result_to_stream(result: Dict[str, Any], output_dir: str):
+    """Appends a single finished query result to the JSONL stream file as soon as it is available."""
+    stream_file = os.path.join(output_dir, SEARCH_STREAM_FILENAME)
+    try:
+        with open(stream_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+    except Exception as e:
+        logger.error(f"Failed to append search result to {stream_file}: {e}")
+
+
 def _save_report_to_md(report: str, output_dir: Path):
     """Saves the final report to a markdown file."""
     report_file = os.path.join(output_dir, REPORT_FILENAME)
@@ -466,6 +650,39 @@ def _save_report_to_md(report: str, output_dir: Path):
         logger.error(f"Failed to save final report to {report_file}: {e}")
 
 
+def _publish_event(state: DeepResearchState, event_type: str, **data: Any):
+    event_bus = state.get("event_bus")
+    if event_bus:
+        event_bus.publish(event_type, state.get("task_id"), **data)
+
+
+def _publish_plan(state: DeepResearchState, plan: List[ResearchCategoryItem]):
+    # Snapshot, so later in-place status updates don't leak into already queued events
+    snapshot = [
+        {
+            "category_name": category["category_name"],
+            "tasks": [
+                {"task_description": task["task_description"], "status": task["status"]}
+                for task in category["tasks"]
+            ],
+        }
+        for category in plan
+    ]
+    _publish_event(state, progress_events.PLAN_UPDATED, plan=snapshot)
+
+
+async def _ainvoke_llm(state: DeepResearchState, llm: Any, messages: Any) -> Any:
+    """Invokes the LLM, waiting for a slot of the shared LLM budget if one is configured."""
+    async with state.get("llm_semaphore") or contextlib.nullcontext():
+        return await llm.ainvoke(messages)
+
+
+def _record_token_usage(state: DeepResearchState, node: str, response: Any):
+    event_bus = state.get("event_bus")
+    if event_bus:
+        event_bus.record_token_usage(state.get("task_id"), node, response)
+
+
 async def planning_node(state: DeepResearchState) -> Dict[str, Any]:
     logger.info("--- Entering Planning Node ---")
     if state.get("stop_requested"):
@@ -481,6 +698,7 @@ async def planning_node(state: DeepResearchState) -> Dict[str, Any]:
             state.get("current_category_index", 0) > 0 or state.get("current_task_index_in_category", 0) > 0):
         logger.info("Resuming with existing plan.")
         _save_plan_to_md(existing_plan, output_dir)  # Ensure it's saved initially
+        _publish_plan(state, existing_plan)
         # current_category_index and current_task_index_in_category should be set by _load_previous_state
         return {"research_plan": existing_plan}
 
@@ -533,7 +751,8 @@ Ensure the output is a valid JSON array.
     ]
 
     try:
-        response = await llm.ainvoke(messages)
+        response = await _ainvoke_llm(state, llm, messages)
+        _record_token_usage(state, "plan_research", response)
         raw_content = response.content
         # The LLM might wrap the JSON in backticks
         if raw_content.strip().startswith("```json"):
@@ -598,6 +817,7 @@ Ensure the output is a valid JSON array.
 
         logger.info(f"Generated research plan with {len(new_plan)} categories.")
         _save_plan_to_md(new_plan, output_dir)  # Save the hierarchical plan
+        _publish_plan(state, new_plan)
 
         return {
             "research_plan": new_plan,
@@ -668,6 +888,13 @@ async def research_execution_node(state: DeepResearchState) -> Dict[str, Any]:
     logger.info(
         f"Executing research task: '{current_task['task_description']}' (Category: '{current_category['category_name']}')"
     )
+    task_event_info = {
+        "category_index": cat_idx,
+        "task_index": task_idx,
+        "category_name": current_category["category_name"],
+        "task_description": current_task["task_description"],
+    }
+    _publish_event(state, progress_events.TASK_STARTED, **task_event_info)
 
     llm_with_tools = llm.bind_tools(tools)
 
@@ -677,6 +904,7 @@ async def research_execution_node(state: DeepResearchState) -> Dict[str, Any]:
         f"Specific Task: {current_task['task_description']}\n\n"
         "Please use the available tools, especially 'parallel_browser_search', to gather information for this specific task. "
         "Provide focused search queries relevant ONLY to this task. "
+        "If you already know the URLs of relevant pages, read them with 'fetch_web_pages' instead, it is much faster. "
         "If you believe you have sufficient information from previous steps for this specific task, you can indicate that you are ready to summarize or that no further search is needed."
     )
     current_task_message_history = [
@@ -692,12 +920,14 @@ async def research_execution_node(state: DeepResearchState) -> Dict[str, Any]:
 
     try:
         logger.info(f"Invoking LLM with tools for task: {current_task['task_description']}")
-        ai_response: BaseMessage = await llm_with_tools.ainvoke(invocation_messages)
+        ai_response: BaseMessage = await _ainvoke_llm(state, llm_with_tools, invocation_messages)
+        _record_token_usage(state, "execute_research", ai_response)
         logger.info("LLM invocation complete.")
 
         tool_results = []
         executed_tool_names = []
         current_search_results = state.get("search_results", [])  # Get existing search results
+        _merge_late_search_results(current_search_results, task_id)  # Finished in the background
 
         if not isinstance(ai_response, AIMessage) or not ai_response.tool_calls:
             logger.warning(
@@ -707,6 +937,8 @@ async def research_execution_node(state: DeepResearchState) -> Dict[str, Any]:
             current_task["result_summary"] = f"LLM did not use a tool. Response: {ai_response.content}"
             current_task["current_category_index"] = cat_idx
             current_task["current_task_index_in_category"] = task_idx
+            _publish_event(state, progress_events.TASK_COMPLETED, status=current_task["status"],
+                           result_summary=current_task["result_summary"], **task_event_info)
             return current_task
             # We still save the plan and advance.
         else:
@@ -732,6 +964,7 @@ async def research_execution_node(state: DeepResearchState) -> Dict[str, Any]:
                         logger.info(f"Stop requested before executing tool: {tool_name}")
                         current_task["status"] = "pending"  # Or a new "stopped" status
                         _save_plan_to_md(plan, output_dir)
+                        _publish_plan(state, plan)
                         return {"stop_requested": True, "research_plan": plan, "current_category_index": cat_idx,
                                 "current_task_index_in_category": task_idx}
 
@@ -739,7 +972,7 @@ async def research_execution_node(state: DeepResearchState) -> Dict[str, Any]:
                     tool_output = await selected_tool.ainvoke(tool_args)
                     logger.info(f"Tool '{tool_name}' executed successfully.")
 
-                    if tool_name == "parallel_browser_search":
+                    if tool_name in ("parallel_browser_search", "fetch_web_pages"):
                         current_search_results.extend(tool_output)  # tool_output is List[Dict]
                     else:  # For other tools, we might need specific handling or just log
                         logger.info(f"Result from tool '{tool_name}': {str(tool_output)[:200]}...")
@@ -778,6 +1011,9 @@ async def research_execution_node(state: DeepResearchState) -> Dict[str, Any]:
         # Save progress
         _save_plan_to_md(plan, output_dir)
         _save_search_results_to_json(current_search_results, output_dir)
+        _publish_plan(state, plan)
+        _publish_event(state, progress_events.TASK_COMPLETED, status=current_task["status"],
+                       result_summary=current_task["result_summary"], **task_event_info)
 
         # Determine next indices
         next_task_idx = task_idx + 1
@@ -801,6 +1037,9 @@ async def research_execution_node(state: DeepResearchState) -> Dict[str, Any]:
                      exc_info=True)
         current_task["status"] = "failed"
         _save_plan_to_md(plan, output_dir)
+        _publish_plan(state, plan)
+        _publish_event(state, progress_events.TASK_COMPLETED, status="failed", result_summary=str(e),
+                       **task_event_info)
         # Determine next indices even on error to attempt to move on
         next_task_idx = task_idx + 1
         next_cat_idx = cat_idx
@@ -825,7 +1064,7 @@ async def synthesis_node(state: DeepResearchState) -> Dict[str, Any]:
 
     llm = state["llm"]
     topic = state["topic"]
-    search_results = state.get("search_results", [])
+    search_results = _merge_late_search_results(list(state.get("search_results", [])), state["task_id"])
     output_dir = state["output_dir"]
     plan = state["research_plan"]  # Include plan for context
 
@@ -833,11 +1072,13 @@ async def synthesis_node(state: DeepResearchState) -> Dict[str, Any]:
         logger.warning("No search results found to synthesize report.")
         report = f"# Research Report: {topic}\n\nNo information was gathered during the research process."
         _save_report_to_md(report, output_dir)
+        _publish_event(state, progress_events.REPORT_READY, report=report)
         return {"final_report": report}
 
     logger.info(
         f"Synthesizing report from {len(search_results)} collected search result entries."
     )
+    _publish_event(state, progress_events.SYNTHESIS_STARTED, result_count=len(search_results))
 
     # Prepare context for the LLM
     # Format search results nicely, maybe group by query or original plan step
@@ -851,14 +1092,17 @@ async def synthesis_node(state: DeepResearchState) -> Dict[str, Any]:
         result_data = result_entry.get("result")  # From BrowserUseAgent's final_result
         tool_output_str = result_entry.get("output")  # From other tools
 
-        if tool_name == "parallel_browser_search" and status == "completed" and result_data:
+        is_browser_result = tool_name is None and "query" in result_entry  # entries from parallel_browser_search
+        if is_browser_result and status in ("completed", "timeout") and result_data:
             # result_data is the summary from BrowserUseAgent
-            formatted_results += f'### Finding from Web Search Query: "{query}"\n'
+            partial_note = " (partial, query timed out)" if status == "timeout" else ""
+            source_label = "Page" if "url" in result_entry else "Web Search Query"  # fetch_web_pages entries carry a url
+            formatted_results += f'### Finding from {source_label}: "{query}"{partial_note}\n'
             formatted_results += f"- **Summary:**\n{result_data}\n"  # result_data is already a summary string here
             # If result_data contained title/URL, you'd format them here.
             # The current BrowserUseAgent returns a string summary directly as 'final_data' in run_single_browser_task
             formatted_results += "---\n"
-        elif tool_name != "parallel_browser_search" and status == "completed" and tool_output_str:
+        elif not is_browser_result and status == "completed" and tool_output_str:
             formatted_results += f'### Finding from Tool: "{tool_name}" (Args: {result_entry.get("args")})\n'
             formatted_results += f"- **Output:**\n{tool_output_str}\n"
             formatted_results += "---\n"
@@ -911,13 +1155,16 @@ async def synthesis_node(state: DeepResearchState) -> Dict[str, Any]:
     )
 
     try:
-        response = await llm.ainvoke(
+        response = await _ainvoke_llm(
+            state,
+            llm,
             synthesis_prompt.format_prompt(
                 topic=topic,
                 plan_summary=plan_summary,
                 formatted_results=formatted_results,
             ).to_messages()
         )
+        _record_token_usage(state, "synthesize_report", response)
         final_report_md = response.content
 
         # Append the reference list automatically to the end of the generated markdown
@@ -933,6 +1180,7 @@ async def synthesis_node(state: DeepResearchState) -> Dict[str, Any]:
 
         logger.info("Successfully synthesized the final report.")
         _save_report_to_md(final_report_md, output_dir)
+        _publish_event(state, progress_events.REPORT_READY, report=final_report_md)
         return {"final_report": final_report_md}
 
     except Exception as e:
@@ -993,6 +1241,8 @@ class DeepResearchAgent:
             llm: Any,
             browser_config: Dict[str, Any],
             mcp_server_config: Optional[Dict[str, Any]] = None,
+            browser_semaphore: Optional[asyncio.Semaphore] = None,
+            llm_semaphore: Optional[asyncio.Semaphore] = None,
     ):
         """
         Initializes the DeepSearchAgent.
@@ -1002,19 +1252,48 @@ class DeepResearchAgent:
             browser_config: Configuration dictionary for the BrowserUseAgent tool.
                             Example: {"headless": True, "window_width": 1280, ...}
             mcp_server_config: Optional configuration for the MCP client.
+            browser_semaphore: Optional process-wide limit on concurrently running browser
+                sub-agents, shared between agents (see ResearchJobManager).
+            llm_semaphore: Optional process-wide limit on concurrent LLM calls of the graph nodes.
         """
         self.llm = llm
         self.browser_config = browser_config
         self.mcp_server_config = mcp_server_config
+        self.browser_semaphore = browser_semaphore
+        self.llm_semaphore = llm_semaphore
         self.mcp_client = None
         self.stopped = False
         self.graph = self._compile_graph()
         self.current_task_id: Optional[str] = None
         self.stop_event: Optional[threading.Event] = None
         self.runner: Optional[asyncio.Task] = None  # To hold the asyncio task for run
+        # Live progress for UIs and other in-process consumers; subscribe before calling run()
+        self.event_bus = ResearchEventBus()
+        self.render_pool: Optional[BrowserRenderPool] = None
+
+    def _handle_search_result(self, result: Dict[str, Any], task_id: str, output_dir: Optional[str] = None):
+        """Persists a finished query result and publishes it on the progress bus."""
+        if output_dir:
+            _append_search_result_to_stream(result, output_dir)
+        self.event_bus.publish(
+            progress_events.QUERY_RESULT,
+            task_id,
+            query=result.get("query"),
+            status=result.get("status"),
+            result=result.get("result"),
+            error=result.get("error"),
+        )
 
     async def _setup_tools(
-            self, task_id: str, stop_event: threading.Event, max_parallel_browsers: int = 1
+            self,
+            task_id: str,
+            stop_event: threading.Event,
+            max_parallel_browsers: int = 1,
+            max_query_steps: int = 100,
+            query_timeout: Optional[float] = None,
+            output_dir: Optional[str] = None,
+            search_quorum: Optional[int] = None,
+            cancel_stragglers: bool = True,
     ) -> List[Tool]:
         """Sets up the basic tools (File I/O) and optional MCP tools."""
         tools = [
@@ -1030,8 +1309,39 @@ class DeepResearchAgent:
             task_id=task_id,
             stop_event=stop_event,
             max_parallel_browsers=max_parallel_browsers,
+            max_query_steps=max_query_steps,
+            query_timeout=query_timeout,
+            result_quorum=search_quorum,
+            cancel_stragglers=cancel_stragglers,
+            on_result=partial(self._handle_search_result, task_id=task_id, output_dir=output_dir),
+            browser_semaphore=self.browser_semaphore,
         )
         tools += [browser_use_tool]
+
+        # Cheap page retrieval that only escalates to a browser agent when fetching/rendering fails
+        self.render_pool = BrowserRenderPool(self.browser_config, max_pages=max_parallel_browsers)
+
+        async def escalate_to_browser_agent(agent_task: str) -> Dict[str, Any]:
+            async with self.browser_semaphore or contextlib.nullcontext():
+                return await run_single_browser_task(
+                    agent_task,
+                    task_id,
+                    self.llm,
+                    self.browser_config,
+                    stop_event,
+                    max_steps=max_query_steps,
+                    max_duration=query_timeout,
+                )
+
+        tools += [
+            create_tiered_fetch_tool(
+                render_pool=self.render_pool,
+                escalate=escalate_to_browser_agent,
+                stop_event=stop_event,
+                on_result=partial(self._handle_search_result, task_id=task_id, output_dir=output_dir),
+                browser_semaphore=self.browser_semaphore,
+            )
+        ]
         # Add MCP tools if config is provided
         if self.mcp_server_config:
             try:
@@ -1050,11 +1360,31 @@ class DeepResearchAgent:
                 "MCP server config provided, but setup function unavailable."
             )
         tools_map = {tool.name: tool for tool in tools}
-        return tools_map.values()
+        agent_tools = list(tools_map.values())
+        if self.mcp_client:
+            # Tools of a reconnected server are bound to its new session; swap them in for this run
+            self.mcp_client.add_reconnect_listener(
+                partial(self._refresh_mcp_tools, agent_tools)
+            )
+        return agent_tools
+
+    def _refresh_mcp_tools(self, agent_tools: List[Tool], server_name: str):
+        """Swaps the tools of a reconnected MCP server into the run's tool list (in place)."""
+        if not self.mcp_client:
+            return
+        fresh = {
+            tool.name: tool
+            for tool in self.mcp_client.server_name_to_tools.get(server_name, [])
+        }
+        for i, tool in enumerate(agent_tools):
+            if tool.name in fresh:
+                agent_tools[i] = fresh.pop(tool.name)
+        agent_tools.extend(fresh.values())
+        logger.info(f"Refreshed MCP tools of reconnected server {server_name}.")
 
     async def close_mcp_client(self):
         if self.mcp_client:
-            await self.mcp_client.__aexit__(None, None, None)
+            await self.mcp_client.release()
             self.mcp_client = None
 
     def _compile_graph(self) -> StateGraph:
@@ -1098,6 +1428,10 @@ class DeepResearchAgent:
             task_id: Optional[str] = None,
             save_dir: str = "./tmp/deep_research",
             max_parallel_browsers: int = 1,
+            max_query_steps: int = 100,
+            query_timeout: Optional[float] = None,
+            search_quorum: Optional[int] = None,
+            cancel_stragglers: bool = True,
     ) -> Dict[str, Any]:
         """
         Starts the deep research process (Async Generator Version).
@@ -1105,6 +1439,15 @@ class DeepResearchAgent:
         Args:
             topic: The research topic.
             task_id: Optional existing task ID to resume. If None, a new ID is generated.
+            max_query_steps: Step budget for each browser sub-agent.
+            query_timeout: Optional wall-clock budget (seconds) for each browser sub-agent.
+            search_quorum: If set, a parallel_browser_search call returns once this many queries
+                produced results instead of waiting for the slowest one.
+            cancel_stragglers: Whether searches still running at quorum are cancelled (default)
+                or left to finish in the background.
+
+        Progress (plan updates, task start/completion, query results, token usage) is published
+        on self.event_bus while the graph runs.
 
         Yields:
              Intermediate state updates or messages during execution.
@@ -1121,6 +1464,7 @@ class DeepResearchAgent:
             }
 
         self.current_task_id = task_id if task_id else str(uuid.uuid4())
+        _ACTIVE_RESEARCH_RUNS.add(self.current_task_id)
         safe_root_dir = "./tmp/deep_research"
         normalized_save_dir = os.path.normpath(save_dir)
         if not normalized_save_dir.startswith(os.path.abspath(safe_root_dir)):
@@ -1133,11 +1477,26 @@ class DeepResearchAgent:
             f"[AsyncGen] Starting research task ID: {self.current_task_id} for topic: '{topic}'"
         )
         logger.info(f"[AsyncGen] Output directory: {output_dir}")
+        self.event_bus.reset_usage()
+        self.event_bus.publish(
+            progress_events.RUN_STARTED,
+            self.current_task_id,
+            topic=topic,
+            output_dir=output_dir,
+            resumed=bool(task_id),
+        )
 
         self.stop_event = threading.Event()
         _AGENT_STOP_FLAGS[self.current_task_id] = self.stop_event
         agent_tools = await self._setup_tools(
-            self.current_task_id, self.stop_event, max_parallel_browsers
+            self.current_task_id,
+            self.stop_event,
+            max_parallel_browsers,
+            max_query_steps=max_query_steps,
+            query_timeout=query_timeout,
+            output_dir=output_dir,
+            search_quorum=search_quorum,
+            cancel_stragglers=cancel_stragglers,
         )
         initial_state: DeepResearchState = {
             "task_id": self.current_task_id,
@@ -1154,6 +1513,8 @@ class DeepResearchAgent:
             "current_task_index_in_category": 0,
             "stop_requested": False,
             "error_message": None,
+            "event_bus": self.event_bus,
+            "llm_semaphore": self.llm_semaphore,
         }
 
         if task_id:
@@ -1220,8 +1581,21 @@ class DeepResearchAgent:
             self.stop_event = None
             self.current_task_id = None
             self.runner = None  # Mark runner as finished
-            if self.mcp_client:
-                await self.mcp_client.__aexit__(None, None, None)
+            _ACTIVE_RESEARCH_RUNS.discard(task_id_to_clean)
+            _drain_late_search_results(task_id_to_clean)
+            _AGENT_STOP_FLAGS.pop(task_id_to_clean, None)
+            if self.render_pool:
+                await self.render_pool.close()
+                self.render_pool = None
+            # Pooled MCP servers stay connected for the next run
+            await self.close_mcp_client()
+            self.event_bus.publish(
+                progress_events.RUN_FINISHED,
+                task_id_to_clean,
+                status=status,
+                message=message,
+                token_usage=dict(self.event_bus.token_usage),
+            )
 
             # Return a result dictionary including the status and the final state if available
             return {
@@ -1248,8 +1622,8 @@ class DeepResearchAgent:
             agent_instance = _BROWSER_AGENT_INSTANCES.get(key)
             try:
                 if agent_instance:
-                    # Assuming BU agent has an async stop method
-                    await agent_instance.stop()
+                    # Agent.stop() is synchronous; the flag is picked up at the next checkpoint
+                    agent_instance.stop()
                     logger.info(f"Called stop() on browser agent instance {key}")
             except Exception as e:
                 logger.error(
@@ -0,0 +1,251 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from src.agent.deep_research import progress_events
+from src.agent.deep_research.deep_research_agent import DeepResearchAgent
+
+logger = logging.getLogger(__name__)
+
+FINAL_JOB_STATUSES = ("completed", "stopped", "error", "cancelled", "finished_incomplete")
+
+
+class BudgetSemaphore(asyncio.Semaphore):
+    """A semaphore that counts its holders, so the manager can report how much of a budget is in use."""
+
+    def __init__(self, limit: int):
+        super().__init__(limit)
+        self.limit = limit
+        self.in_use = 0
+
+    async def acquire(self) -> bool:
+        await super().acquire()
+        self.in_use += 1
+        return True
+
+    def release(self):
+        self.in_use = max(self.in_use - 1, 0)
+        super().release()
+
+
+class ResearchJob:
+    """Bookkeeping for one research topic run by the ResearchJobManager."""
+
+    def __init__(self, job_id: str, topic: str, agent: DeepResearchAgent, resume_task_id: Optional[str] = None):
+        self.job_id = job_id
+        self.topic = topic
+        self.agent = agent
+        self.task_id: Optional[str] = resume_task_id
+        self.status = "queued"
+        self.message: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.runner: Optional[asyncio.Task] = None
+        self.result: Optional[Dict[str, Any]] = None
+        # Live progress, folded from the agent's event bus
+        self.tasks_total = 0
+        self.tasks_done = 0
+        self.current_task: Optional[str] = None
+        self.query_results = 0
+        self.token_usage: Dict[str, int] = {}
+
+    def apply_event(self, event: Dict[str, Any]):
+        data = event["data"]
+        if event["type"] == progress_events.RUN_STARTED:
+            self.task_id = event["task_id"]
+        elif event["type"] == progress_events.PLAN_UPDATED:
+            tasks = [task for category in data["plan"] for task in category["tasks"]]
+            self.tasks_total = len(tasks)
+            self.tasks_done = sum(1 for task in tasks if task["status"] != "pending")
+        elif event["type"] == progress_events.TASK_STARTED:
+            self.current_task = data["task_description"]
+        elif event["type"] == progress_events.TASK_COMPLETED:
+            self.current_task = None
+        elif event["type"] == progress_events.QUERY_RESULT:
+            self.query_results += 1
+        elif event["type"] == progress_events.TOKEN_USAGE:
+            self.token_usage = data["cumulative"]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "task_id": self.task_id,
+            "topic": self.topic,
+            "status": self.status,
+            "message": self.message,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "tasks_total": self.tasks_total,
+            "tasks_done": self.tasks_done,
+            "current_task": self.current_task,
+            "query_results": self.query_results,
+            "token_usage": dict(self.token_usage),
+        }
+
+
+class ResearchJobManager:
+    """
+    Runs several research topics concurrently in one process.
+
+    Each job gets its own DeepResearchAgent (and so its own task ID, stop flag, browser
+    sub-agents and event bus); what is shared is the budget: at most max_concurrent_jobs
+    graphs run at once, at most max_total_browsers browser sub-agents are alive across all
+    jobs, and at most max_concurrent_llm_calls graph-node LLM calls are in flight.
+
+    This is a library entry point for embedding research in a server process; the web UI runs
+    one DeepResearchAgent per session and does not go through it.
+    """
+
+    def __init__(
+            self,
+            llm: Any,
+            browser_config: Dict[str, Any],
+            mcp_server_config: Optional[Dict[str, Any]] = None,
+            max_concurrent_jobs: int = 2,
+            max_total_browsers: int = 2,
+            max_concurrent_llm_calls: int = 4,
+            save_dir: str = "./tmp/deep_research",
+    ):
+        self.llm = llm
+        self.browser_config = browser_config
+        self.mcp_server_config = mcp_server_config
+        self.save_dir = save_dir
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.max_total_browsers = max_total_browsers
+        self.max_concurrent_llm_calls = max_concurrent_llm_calls
+        self._job_slots = asyncio.Semaphore(max_concurrent_jobs)
+        self.browser_semaphore = BudgetSemaphore(max_total_browsers)
+        self.llm_semaphore = BudgetSemaphore(max_concurrent_llm_calls)
+        self.jobs: Dict[str, ResearchJob] = {}
+
+    async def submit(
+            self,
+            topic: str,
+            resume_task_id: Optional[str] = None,
+            llm: Any = None,
+            **run_kwargs: Any,
+    ) -> str:
+        """
+        Queues a research topic and returns its job ID immediately.
+
+        Args:
+            topic: The research topic.
+            resume_task_id: Optional task ID of a previous run to resume.
+            llm: Optional LLM overriding the manager's default for this job.
+            run_kwargs: Passed to DeepResearchAgent.run (max_parallel_browsers, query_timeout, ...).
+        """
+        if resume_task_id and any(
+                job.task_id == resume_task_id and job.status not in FINAL_JOB_STATUSES for job in self.jobs.values()
+        ):
+            raise ValueError(f"Research task {resume_task_id} is already queued or running.")
+
+        agent = DeepResearchAgent(
+            llm=llm or self.llm,
+            browser_config=self.browser_config,
+            mcp_server_config=self.mcp_server_config,
+            browser_semaphore=self.browser_semaphore,
+            llm_semaphore=self.llm_semaphore,
+        )
+        job = ResearchJob(str(uuid.uuid4()), topic, agent, resume_task_id=resume_task_id)
+        self.jobs[job.job_id] = job
+        job.runner = asyncio.create_task(self._run_job(job, run_kwargs))
+        logger.info(f"Queued research job {job.job_id} for topic: '{topic}'")
+        return job.job_id
+
+    async def _run_job(self, job: ResearchJob, run_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        events = job.agent.event_bus.subscribe()
+        watcher = asyncio.create_task(self._watch_events(job, events))
+        try:
+            async with self._job_slots:
+                if job.status == "stopped":  # Stopped while still queued
+                    job.result = {"status": "stopped", "message": "Job stopped before it started.",
+                                  "task_id": job.task_id, "final_state": {}}
+                    return job.result
+                job.status = "running"
+                job.started_at = time.time()
+                logger.info(f"Starting research job {job.job_id}")
+                job.result = await job.agent.run(
+                    topic=job.topic,
+                    task_id=job.task_id,
+                    save_dir=run_kwargs.pop("save_dir", self.save_dir),
+                    **run_kwargs,
+                )
+                job.status = job.result.get("status", "error")
+                job.message = job.result.get("message")
+                job.task_id = job.result.get("task_id") or job.task_id
+                return job.result
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            job.message = "Job was cancelled."
+            raise
+        except Exception as e:
+            logger.error(f"Research job {job.job_id} failed: {e}", exc_info=True)
+            job.status = "error"
+            job.message = str(e)
+            job.result = {"status": "error", "message": str(e), "task_id": job.task_id, "final_state": {}}
+            return job.result
+        finally:
+            job.finished_at = time.time()
+            job.current_task = None
+            watcher.cancel()
+            while not events.empty():  # Events published after the watcher's last wake-up
+                job.apply_event(events.get_nowait())
+            job.agent.event_bus.unsubscribe(events)
+            logger.info(f"Research job {job.job_id} finished with status: {job.status}")
+
+    @staticmethod
+    async def _watch_events(job: ResearchJob, events: asyncio.Queue):
+        while True:
+            job.apply_event(await events.get())
+
+    def get_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.jobs.get(job_id)
+        return job.to_dict() if job else None
+
+    def list_jobs(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        return [job.to_dict() for job in self.jobs.values() if status is None or job.status == status]
+
+    def get_budget(self) -> Dict[str, Any]:
+        """Reports how much of the shared job/browser/LLM budget is currently in use."""
+        return {
+            "jobs_running": sum(1 for job in self.jobs.values() if job.status == "running"),
+            "jobs_queued": sum(1 for job in self.jobs.values() if job.status == "queued"),
+            "max_concurrent_jobs": self.max_concurrent_jobs,
+            "browsers_in_use": self.browser_semaphore.in_use,
+            "max_total_browsers": self.max_total_browsers,
+            "llm_calls_in_flight": self.llm_semaphore.in_use,
+            "max_concurrent_llm_calls": self.max_concurrent_llm_calls,
+        }
+
+    async def wait(self, job_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Waits for a job to finish and returns the agent's result dict."""
+        job = self.jobs[job_id]
+        await asyncio.wait_for(asyncio.shield(job.runner), timeout)
+        return job.result
+
+    async def stop(self, job_id: str):
+        """Stops one job without affecting the others."""
+        job = self.jobs.get(job_id)
+        if not job or job.status in FINAL_JOB_STATUSES:
+            return
+        logger.info(f"Stopping research job {job_id}")
+        if job.status == "queued":
+            job.status = "stopped"
+            job.message = "Job stopped before it started."
+            return
+        await job.agent.stop()
+
+    async def stop_all(self):
+        await asyncio.gather(*(self.stop(job_id) for job_id in list(self.jobs)))
+
+    def remove(self, job_id: str) -> bool:
+        """Forgets a finished job. Returns False if the job is unknown or still active."""
+        job = self.jobs.get(job_id)
+        if not job or job.status not in FINAL_JOB_STATUSES:
+            return False
+        del self.jobs[job_id]
+        return True
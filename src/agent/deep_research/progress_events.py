@@ -0,0 +1,77 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, TypedDict
+
+logger = logging.getLogger(__name__)
+
+# Event types emitted by the deep research graph
+RUN_STARTED = "run_started"
+PLAN_UPDATED = "plan_updated"
+TASK_STARTED = "task_started"
+TASK_COMPLETED = "task_completed"
+QUERY_RESULT = "query_result"
+TOKEN_USAGE = "token_usage"
+SYNTHESIS_STARTED = "synthesis_started"
+REPORT_READY = "report_ready"
+RUN_FINISHED = "run_finished"
+
+
+class ResearchEvent(TypedDict):
+    type: str
+    task_id: Optional[str]
+    timestamp: float
+    data: Dict[str, Any]
+
+
+class ResearchEventBus:
+    """
+    In-process publish/subscribe channel for deep research progress.
+
+    Every subscriber gets its own asyncio.Queue, so a slow consumer (e.g. the web UI) never
+    blocks the graph nodes that publish. Publishing is synchronous and safe to call from
+    done-callbacks and other non-async code running on the event loop.
+    """
+
+    def __init__(self):
+        self._subscribers: List[asyncio.Queue] = []
+        self.token_usage: Dict[str, int] = {}
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        if queue in self._subscribers:
+            self._subscribers.remove(queue)
+
+    def reset_usage(self):
+        self.token_usage = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+
+    def publish(self, event_type: str, task_id: Optional[str] = None, **data: Any):
+        event = ResearchEvent(type=event_type, task_id=task_id, timestamp=time.time(), data=data)
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except Exception as e:
+                logger.warning(f"Dropping research event {event_type} for a subscriber: {e}")
+
+    def record_token_usage(self, task_id: Optional[str], node: str, response: Any):
+        """Publishes the token usage reported on an LLM response, if the provider returned any."""
+        usage = getattr(response, "usage_metadata", None)
+        if not usage:
+            return
+        if not self.token_usage:
+            self.reset_usage()
+        for key in ("input_tokens", "output_tokens", "total_tokens"):
+            self.token_usage[key] += int(usage.get(key, 0) or 0)
+        self.publish(
+            TOKEN_USAGE,
+            task_id,
+            node=node,
+            input_tokens=usage.get("input_tokens", 0),
+            output_tokens=usage.get("output_tokens", 0),
+            total_tokens=usage.get("total_tokens", 0),
+            cumulative=dict(self.token_usage),
+        )
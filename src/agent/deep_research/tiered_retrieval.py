@@ -0,0 +1,424 @@
+import asyncio
+import atexit
+import contextlib
+import ipaddress
+import logging
+import multiprocessing
+import os
+import re
+import socket
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urljoin, urlsplit
+
+import httpx
+from browser_use.browser.browser import BrowserConfig
+from langchain_core.tools import StructuredTool
+from main_content_extractor import MainContentExtractor
+from pydantic import BaseModel, Field
+
+from src.browser.custom_browser import CustomBrowser
+from src.browser.http_cache import get_http_cache
+from src.browser.resource_blocker import ResourceBlocker
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+)
+# Pages that came back but clearly are not the content (bot walls, JS-only shells)
+BLOCKED_PAGE_MARKERS = (
+    "captcha",
+    "enable javascript",
+    "javascript is disabled",
+    "access denied",
+    "are you a robot",
+    "unusual traffic",
+)
+# Markers are only looked for (in the title and the text) on pages whose main content is
+# shorter than this: bot walls are short, while a full article may well discuss captchas
+BLOCKED_PAGE_MAX_CHARS = 3000
+_TITLE_RE = re.compile(r"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+
+TIER_HTTP = 1
+TIER_RENDER = 2
+TIER_AGENT = 3
+
+# Process-wide counters of which tier ended up answering a fetch
+_TIER_STATS = {"requests": 0, "tier_1": 0, "tier_2": 0, "tier_3": 0, "failed": 0}
+_TIER_STATS_LOCK = threading.Lock()
+
+_EXTRACTION_POOL: Optional[ProcessPoolExecutor] = None
+
+
+def _record_tier(tier: Optional[int]):
+    with _TIER_STATS_LOCK:
+        _TIER_STATS["requests"] += 1
+        _TIER_STATS[f"tier_{tier}" if tier else "failed"] += 1
+
+
+def get_tier_stats() -> Dict[str, Any]:
+    """Returns fetch counts and hit rates per retrieval tier since process start."""
+    with _TIER_STATS_LOCK:
+        stats = dict(_TIER_STATS)
+    total = stats["requests"] or 1
+    for key in ("tier_1", "tier_2", "tier_3", "failed"):
+        stats[f"{key}_rate"] = round(stats[key] / total, 3)
+    return stats
+
+
+def _extract_main_content(html: str) -> str:
+    # Runs in a worker process: MainContentExtractor is pure CPU work on large documents
+    return MainContentExtractor.extract(html, output_format="markdown")
+
+
+def _get_extraction_pool() -> ProcessPoolExecutor:
+    global _EXTRACTION_POOL
+    if _EXTRACTION_POOL is None:
+        # spawn, not fork: this process runs Playwright and event-loop threads that a forked
+        # child would inherit in an arbitrary state
+        _EXTRACTION_POOL = ProcessPoolExecutor(
+            max_workers=min(4, os.cpu_count() or 1),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        atexit.unregister(shutdown_extraction_pool)  # Registered once, even when a broken pool is replaced
+        atexit.register(shutdown_extraction_pool)
+    return _EXTRACTION_POOL
+
+
+def shutdown_extraction_pool():
+    """Stops the extraction worker processes; registered with atexit when the pool is created."""
+    global _EXTRACTION_POOL
+    if _EXTRACTION_POOL is not None:
+        _EXTRACTION_POOL.shutdown(wait=False, cancel_futures=True)
+        _EXTRACTION_POOL = None
+
+
+async def extract_main_content(html: str) -> str:
+    """Extracts the main content of a page as Markdown without blocking the event loop."""
+    global _EXTRACTION_POOL
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_get_extraction_pool(), _extract_main_content, html)
+    except BrokenProcessPool:
+        logger.warning("Content extraction process pool broke, falling back to a worker thread.")
+        _EXTRACTION_POOL = None
+        return await asyncio.to_thread(_extract_main_content, html)
+
+
+def _page_title(html: str) -> str:
+    match = _TITLE_RE.search(html[:20000])
+    return match.group(1).strip().lower() if match else ""
+
+
+def _is_sufficient(content: Optional[str], min_chars: int, html: str = "") -> bool:
+    if not content or len(content.strip()) < min_chars:
+        return False
+    if len(content.strip()) >= BLOCKED_PAGE_MAX_CHARS:
+        return True
+    text = f"{_page_title(html) if html else ''}\n{content.lower()}"
+    return not any(marker in text for marker in BLOCKED_PAGE_MARKERS)
+
+
+class PrivateAddressError(ValueError):
+    """A URL (or one of its redirects) points at a host that is not publicly routable."""
+
+
+def _is_private_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return (ip.is_private or ip.is_loopback or ip.is_link_local or ip.is_reserved
+            or ip.is_multicast or ip.is_unspecified)
+
+
+async def check_public_url(url: str):
+    """Raises PrivateAddressError unless every address the URL's host resolves to is publicly routable."""
+    host = urlsplit(url).hostname
+    if not host:
+        raise PrivateAddressError(f"no host in {url}")
+    try:
+        addresses = [str(ipaddress.ip_address(host))]
+    except ValueError:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        addresses = [info[4][0] for info in infos]
+    if not addresses or any(_is_private_address(address) for address in addresses):
+        raise PrivateAddressError(f"refusing to fetch {host}: not a public address")
+
+
+async def _check_public_request(request: httpx.Request):
+    # Also applied to every redirect hop
+    await check_public_url(str(request.url))
+
+
+class BrowserRenderPool:
+    """
+    A lazily launched headless browser that renders pages without an LLM (tier 2).
+
+    One browser and context are shared by all renders; each render uses its own page,
+    and at most max_pages render concurrently.
+    """
+
+    def __init__(self, browser_config: Dict[str, Any], max_pages: int = 2, page_timeout: float = 20.0):
+        self.browser_config = browser_config
+        self.page_timeout = page_timeout
+        self._pages = asyncio.Semaphore(max_pages)
+        self._start_lock = asyncio.Lock()
+        self.browser: Optional[CustomBrowser] = None
+        self.context = None
+        # host -> refusal reason (None when public), so subresources do not resolve their host each time
+        self._host_checks: Dict[str, Optional[str]] = {}
+
+    async def _ensure_started(self):
+        async with self._start_lock:
+            if self.context:
+                return
+            self.browser = CustomBrowser(
+                config=BrowserConfig(
+                    headless=True,
+                    disable_security=self.browser_config.get("disable_security", False),
+                )
+            )
+            playwright_browser = await self.browser.get_playwright_browser()
+            self.context = await playwright_browser.new_context(user_agent=DEFAULT_USER_AGENT)
+            http_cache = get_http_cache()
+            if http_cache:
+                await http_cache.attach(self.context)
+            # Only the text is extracted, so images, media and fonts are never needed
+            await ResourceBlocker("research").attach(self.context)
+            # Registered last so it runs before the blocker and the cache
+            await self.context.route("**/*", self._guard_route)
+            logger.info("Started headless render browser for tiered retrieval.")
+
+    async def _refusal(self, url: str) -> Optional[str]:
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            return None
+        host = parts.hostname or ""
+        if host not in self._host_checks:
+            try:
+                await check_public_url(url)
+                self._host_checks[host] = None
+            except (PrivateAddressError, OSError) as e:
+                self._host_checks[host] = str(e)
+        return self._host_checks[host]
+
+    async def _guard_route(self, route):
+        """Aborts requests (navigations, redirect hops and subresources) to non-public hosts."""
+        request = route.request
+        refusal = await self._refusal(request.url)
+        if refusal is None and request.is_navigation_request():
+            # Playwright only routes the first URL of a redirect chain: fetch navigations without
+            # following redirects and check each Location before the page follows it
+            response = await route.fetch(max_redirects=0)
+            location = response.headers.get("location")
+            if 300 <= response.status < 400 and location:
+                refusal = await self._refusal(urljoin(request.url, location))
+            if refusal is None:
+                await route.fulfill(response=response)
+                return
+        if refusal is not None:
+            logger.warning(f"[Tiered Fetch] Render blocked request to {request.url}: {refusal}")
+            await route.abort("blockedbyclient")
+            return
+        await route.fallback()
+
+    async def render(self, url: str) -> str:
+        """Loads the URL and returns the DOM serialised after scripts ran."""
+        async with self._pages:
+            await self._ensure_started()
+            page = await self.context.new_page()
+            try:
+                await page.goto(url, wait_until="domcontentloaded", timeout=self.page_timeout * 1000)
+                with contextlib.suppress(Exception):
+                    # Give client-side rendering a moment, but never wait for every tracker to settle
+                    await page.wait_for_load_state("load", timeout=min(5.0, self.page_timeout) * 1000)
+                return await page.content()
+            finally:
+                await page.close()
+
+    async def close(self):
+        if self.context:
+            with contextlib.suppress(Exception):
+                await self.context.close()
+            self.context = None
+        if self.browser:
+            with contextlib.suppress(Exception):
+                await self.browser.close()
+            self.browser = None
+
+
+class TieredFetchInput(BaseModel):
+    urls: List[str] = Field(description="URLs of pages whose content is needed for the research task.")
+    question: Optional[str] = Field(
+        default=None,
+        description="What to look for on the pages. Used only when a page needs a full browser agent.",
+    )
+
+
+def _rejected(result: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+    result["error"] = str(error)
+    _record_tier(None)
+    logger.warning(f"[Tiered Fetch] {result['url']} rejected: {error}")
+    return result
+
+
+async def fetch_url_tiered(
+        url: str,
+        http_client: httpx.AsyncClient,
+        render_pool: Optional[BrowserRenderPool],
+        escalate: Optional[Callable[[str], Awaitable[Dict[str, Any]]]],
+        question: Optional[str] = None,
+        min_content_chars: int = 500,
+        max_content_chars: int = 8000,
+        browser_semaphore: Optional[asyncio.Semaphore] = None,
+) -> Dict[str, Any]:
+    """
+    Retrieves one URL with the cheapest tier that yields usable content.
+
+    Tier 1: plain HTTP GET and main-content extraction. Tier 2: headless render of the page,
+    then the same extraction (for JS-rendered pages). Tier 3: a full BrowserUseAgent run via
+    escalate (logins, cookie walls, PDFs, interaction). The returned dict has the same shape
+    as parallel_browser_search results, plus the tier that answered.
+    """
+    result = {"query": url, "url": url, "tier": None, "result": None, "status": "failed"}
+    reasons = []
+    renderable = True
+
+    # URLs come from the LLM: never let them reach loopback, link-local or internal hosts
+    try:
+        await check_public_url(url)
+    except (PrivateAddressError, OSError) as e:
+        return _rejected(result, e)
+
+    # --- Tier 1: HTTP fetch ---
+    try:
+        response = await http_client.get(url)
+        content_type = response.headers.get("content-type", "")
+        if response.status_code >= 400:
+            reasons.append(f"HTTP {response.status_code}")
+        elif "html" not in content_type and "text" not in content_type:
+            reasons.append(f"unsupported content type {content_type or 'unknown'}")
+            renderable = False  # e.g. PDFs: a render would not help, the agent can download them
+        else:
+            content = await extract_main_content(response.text)
+            if _is_sufficient(content, min_content_chars, html=response.text):
+                result.update(tier=TIER_HTTP, result=content[:max_content_chars], status="completed")
+            else:
+                reasons.append("too little content over plain HTTP")
+    except PrivateAddressError as e:  # Redirected to an internal host
+        return _rejected(result, e)
+    except Exception as e:
+        reasons.append(f"HTTP fetch failed: {e}")
+
+    # --- Tier 2: headless render, no LLM ---
+    if result["tier"] is None and render_pool and renderable:
+        try:
+            async with browser_semaphore or contextlib.nullcontext():
+                html = await render_pool.render(url)
+            content = await extract_main_content(html)
+            if _is_sufficient(content, min_content_chars, html=html):
+                result.update(tier=TIER_RENDER, result=content[:max_content_chars], status="completed")
+            else:
+                reasons.append("too little content after rendering")
+        except Exception as e:
+            reasons.append(f"render failed: {e}")
+
+    # --- Tier 3: full browser agent ---
+    if result["tier"] is None and escalate:
+        logger.info(f"[Tiered Fetch] Escalating {url} to a browser agent: {'; '.join(reasons)}")
+        agent_task = f"Open {url} and extract its content"
+        agent_task += f" relevant to: {question}" if question else "."
+        agent_result = await escalate(agent_task)
+        if agent_result.get("status") in ("completed", "timeout") and agent_result.get("result"):
+            result.update(tier=TIER_AGENT, result=agent_result["result"], status=agent_result["status"])
+        else:
+            reasons.append(f"browser agent: {agent_result.get('error') or agent_result.get('status')}")
+
+    if result["tier"] is None:
+        result["error"] = "; ".join(reasons)
+    _record_tier(result["tier"])
+    logger.info(f"[Tiered Fetch] {url} -> tier {result['tier']} ({result['status']})")
+    return result
+
+
+async def _run_tiered_fetch_tool(
+        urls: List[str],
+        question: Optional[str] = None,
+        render_pool: Optional[BrowserRenderPool] = None,
+        escalate: Optional[Callable[[str], Awaitable[Dict[str, Any]]]] = None,
+        stop_event: Optional[threading.Event] = None,
+        max_urls: int = 5,
+        http_timeout: float = 15.0,
+        min_content_chars: int = 500,
+        max_content_chars: int = 8000,
+        on_result: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        browser_semaphore: Optional[asyncio.Semaphore] = None,
+) -> List[Dict[str, Any]]:
+    urls = [url for url in urls if url.startswith(("http://", "https://"))][:max_urls]
+    if stop_event and stop_event.is_set():
+        return [{"query": url, "url": url, "result": None, "status": "cancelled"} for url in urls]
+
+    async with httpx.AsyncClient(
+            timeout=http_timeout,
+            follow_redirects=True,
+            headers={"User-Agent": DEFAULT_USER_AGENT},
+            limits=httpx.Limits(max_connections=max_urls * 2),
+            event_hooks={"request": [_check_public_request]},
+    ) as http_client:
+
+        async def fetch_one(url: str) -> Dict[str, Any]:
+            res = await fetch_url_tiered(
+                url,
+                http_client,
+                render_pool,
+                escalate,
+                question=question,
+                min_content_chars=min_content_chars,
+                max_content_chars=max_content_chars,
+                browser_semaphore=browser_semaphore,
+            )
+            if on_result:
+                try:
+                    ret = on_result(res)
+                    if asyncio.iscoroutine(ret):
+                        await ret
+                except Exception as e:
+                    logger.error(f"[Tiered Fetch] on_result callback failed: {e}")
+            return res
+
+        return list(await asyncio.gather(*(fetch_one(url) for url in urls)))
+
+
+def create_tiered_fetch_tool(
+        render_pool: Optional[BrowserRenderPool],
+        escalate: Optional[Callable[[str], Awaitable[Dict[str, Any]]]],
+        stop_event: Optional[threading.Event] = None,
+        max_urls: int = 5,
+        on_result: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        browser_semaphore: Optional[asyncio.Semaphore] = None,
+) -> StructuredTool:
+    """Factory for the fetch_web_pages tool; escalate runs a full browser agent task (tier 3)."""
+    from functools import partial
+
+    bound_tool_func = partial(
+        _run_tiered_fetch_tool,
+        render_pool=render_pool,
+        escalate=escalate,
+        stop_event=stop_event,
+        max_urls=max_urls,
+        on_result=on_result,
+        browser_semaphore=browser_semaphore,
+    )
+
+    return StructuredTool.from_function(
+        coroutine=bound_tool_func,
+        name="fetch_web_pages",
+        description=f"""Use this tool to read the content of up to {max_urls} known URLs (e.g. sources found by an earlier search).
+It is much faster and cheaper than parallel_browser_search: pages are fetched directly and only handed to a browser agent when that fails.
+Prefer it whenever you already know which pages to read.""",
+        args_schema=TieredFetchInput,
+    )
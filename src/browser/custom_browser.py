@@ -1,5 +1,8 @@
 import asyncio
+import os
 import pdb
+import time
+from distutils.util import strtobool
 
 from playwright.async_api import Browser as PlaywrightBrowser
 from playwright.async_api import (
@@ -9,7 +12,7 @@ from playwright.async_api import (
     Playwright,
     async_playwright,
 )
-from browser_use.browser.browser import Browser, IN_DOCKER
+from browser_use.browser.browser import Browser, BrowserConfig, IN_DOCKER
 from browser_use.browser.context import BrowserContext, BrowserContextConfig
 from playwright.async_api import BrowserContext as PlaywrightBrowserContext
 import logging
@@ -24,21 +27,99 @@ from browser_use.browser.chrome import (
 from browser_use.browser.context import BrowserContext, BrowserContextConfig
 from browser_use.browser.utils.screen_resolution import get_screen_resolution, get_window_adjustments
 from browser_use.utils import time_execution_async
-import socket
 
-from .custom_context import CustomBrowserContext
+from src.utils.metrics import observe
+
+from .custom_context import CustomBrowserContext, CustomBrowserContextConfig
+from .fast_launch import (
+    FAST_LAUNCH_ARGS,
+    FAST_LAUNCH_DISABLED_FEATURES,
+    PHASE_PLAYWRIGHT_START,
+    PHASE_SPAWN_CONNECT,
+    merge_disable_features,
+)
+from .port_allocator import get_port_allocator
 
 logger = logging.getLogger(__name__)
 
 
 class CustomBrowser(Browser):
+    # Remote-debugging port reserved for the launched Chromium and its CDP endpoint, if any
+    debugging_port: int | None = None
+    cdp_endpoint: str | None = None
+
+    def __init__(self, config: BrowserConfig | None = None, fast_launch: bool | None = None):
+        super().__init__(config=config)
+        # Tuned Chromium flags for headless launches; defaults to BROWSER_FAST_LAUNCH
+        self.fast_launch = (
+            fast_launch if fast_launch is not None else bool(strtobool(os.getenv("BROWSER_FAST_LAUNCH") or "false"))
+        )
+        # Seconds spent in each launch phase of this browser (also recorded in the browser.launch.* histograms)
+        self.launch_timings: dict[str, float] = {}
+        # Set when the browser disconnected without close() being called
+        self.disconnected_at: float | None = None
+        self._closing = False
+
+    def record_launch_phase(self, phase: str, started: float):
+        elapsed = time.perf_counter() - started
+        self.launch_timings[phase] = elapsed
+        observe(phase, elapsed)
+
+    async def _init(self):
+        """Initialize the browser session, timing each phase"""
+        started = time.perf_counter()
+        playwright = await async_playwright().start()
+        self.playwright = playwright
+        self.record_launch_phase(PHASE_PLAYWRIGHT_START, started)
+
+        started = time.perf_counter()
+        # For built-in browsers Playwright spawns the process and completes the CDP handshake in one call
+        browser = await self._setup_browser(playwright)
+        self.playwright_browser = browser
+        self.record_launch_phase(PHASE_SPAWN_CONNECT, started)
+        browser.on("disconnected", self._on_disconnected)
+
+        return self.playwright_browser
+
+    def _on_disconnected(self, _browser):
+        if not self._closing:
+            self.disconnected_at = time.time()
+            logger.warning("Browser disconnected (crashed or CDP connection lost), it will be relaunched on next use.")
+
+    def is_connected(self) -> bool:
+        return self.playwright_browser is not None and self.playwright_browser.is_connected()
+
+    async def get_playwright_browser(self) -> PlaywrightBrowser:
+        """Returns the Playwright browser, relaunching it first if the previous one died."""
+        if self.playwright_browser is not None and not self.playwright_browser.is_connected():
+            await self._discard_dead_browser()
+        return await super().get_playwright_browser()
+
+    async def _discard_dead_browser(self):
+        logger.info("Discarding disconnected browser before relaunching.")
+        if self.playwright:
+            try:
+                await self.playwright.stop()
+            except Exception as e:
+                logger.debug(f"Failed to stop Playwright for the dead browser: {e}")
+        if chrome_proc := getattr(self, '_chrome_subprocess', None):
+            try:
+                for proc in chrome_proc.children(recursive=True):
+                    proc.kill()
+                chrome_proc.kill()
+            except Exception as e:
+                logger.debug(f"Failed to kill the dead chrome subprocess: {e}")
+        self.playwright_browser = None
+        self.playwright = None
+        self._chrome_subprocess = None
+        self._release_debugging_port()
 
     async def new_context(self, config: BrowserContextConfig | None = None) -> CustomBrowserContext:
         """Create a browser context"""
         browser_config = self.config.model_dump() if self.config else {}
         context_config = config.model_dump() if config else {}
         merged_config = {**browser_config, **context_config}
-        return CustomBrowserContext(config=BrowserContextConfig(**merged_config), browser=self)
+        return CustomBrowserContext(config=CustomBrowserContextConfig(**merged_config), browser=self)
 
     async def _setup_builtin_browser(self, playwright: Playwright) -> PlaywrightBrowser:
         """Sets up and returns a Playwright Browser instance with anti-detection measures."""
@@ -63,27 +144,29 @@ class CustomBrowser(Browser):
             screen_size = get_screen_resolution()
             offset_x, offset_y = get_window_adjustments()
 
+        # Reserve a unique remote-debugging port until close(), so concurrent launches never collide
+        allocator = get_port_allocator()
+        self.debugging_port = allocator.acquire(
+            owner=f"CustomBrowser@{id(self):x}", preferred=self.config.chrome_remote_debugging_port
+        )
+        self.cdp_endpoint = allocator.endpoint(self.debugging_port) if self.debugging_port else None
+
         chrome_args = {
-            f'--remote-debugging-port={self.config.chrome_remote_debugging_port}',
+            *([f'--remote-debugging-port={self.debugging_port}'] if self.debugging_port else []),
             *CHROME_ARGS,
             *(CHROME_DOCKER_ARGS if IN_DOCKER else []),
             *(CHROME_HEADLESS_ARGS if self.config.headless else []),
             *(CHROME_DISABLE_SECURITY_ARGS if self.config.disable_security else []),
             *(CHROME_DETERMINISTIC_RENDERING_ARGS if self.config.deterministic_rendering else []),
+            *(self._fast_launch_args() if self.fast_launch and self.config.headless else []),
             f'--window-position={offset_x},{offset_y}',
             f'--window-size={screen_size["width"]},{screen_size["height"]}',
             *self.config.extra_browser_args,
         }
 
-        # check if chrome remote debugging port is already taken,
-        # if so remove the remote-debugging-port arg to prevent conflicts
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            if s.connect_ex(('localhost', self.config.chrome_remote_debugging_port)) == 0:
-                chrome_args.remove(f'--remote-debugging-port={self.config.chrome_remote_debugging_port}')
-
         browser_class = getattr(playwright, self.config.browser_class)
         args = {
-            'chromium': list(chrome_args),
+            'chromium': merge_disable_features(chrome_args),
             'firefox': [
                 *{
                     '-no-remote',
@@ -98,12 +181,37 @@ class CustomBrowser(Browser):
             ],
         }
 
-        browser = await browser_class.launch(
-            channel='chromium',  # https://github.com/microsoft/playwright/issues/33566
-            headless=self.config.headless,
-            args=args[self.config.browser_class],
-            proxy=self.config.proxy.model_dump() if self.config.proxy else None,
-            handle_sigterm=False,
-            handle_sigint=False,
-        )
+        try:
+            browser = await browser_class.launch(
+                channel='chromium',  # https://github.com/microsoft/playwright/issues/33566
+                headless=self.config.headless,
+                args=args[self.config.browser_class],
+                proxy=self.config.proxy.model_dump() if self.config.proxy else None,
+                handle_sigterm=False,
+                handle_sigint=False,
+            )
+        except Exception:
+            self._release_debugging_port()
+            raise
+        if self.cdp_endpoint:
+            logger.info(f"Browser launched with CDP endpoint {self.cdp_endpoint}")
         return browser
+
+    @staticmethod
+    def _fast_launch_args() -> list[str]:
+        return [*FAST_LAUNCH_ARGS, f'--disable-features={",".join(FAST_LAUNCH_DISABLED_FEATURES)}']
+
+    def _release_debugging_port(self):
+        get_port_allocator().release(self.debugging_port)
+        self.debugging_port = None
+        self.cdp_endpoint = None
+
+    async def close(self):
+        self._closing = True
+        try:
+            await super().close()
+        finally:
+            self._closing = False
+        # keep_alive browsers stay open, and keep their port
+        if not self.config.keep_alive:
+            self._release_debugging_port()
@@ -1,17 +1,40 @@
+import asyncio
 import json
 import logging
 import os
+import time
 
 from browser_use.browser.browser import Browser, IN_DOCKER
 from browser_use.browser.context import BrowserContext, BrowserContextConfig
 from playwright.async_api import Browser as PlaywrightBrowser
 from playwright.async_api import BrowserContext as PlaywrightBrowserContext
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from browser_use.browser.context import BrowserContextState
+from browser_use.browser.views import BrowserState
+
+from src.utils.metrics import observe
+
+from .dom_snapshot import create_dom_snapshot_cache
+from .fast_launch import FIRST_CONTENTFUL_PAINT_SCRIPT, PHASE_CONTEXT_CREATE, PHASE_FIRST_NAVIGATION, PHASE_FIRST_PAINT
+from .http_cache import get_http_cache
+from .resource_blocker import create_resource_blocker
 
 logger = logging.getLogger(__name__)
 
 
+class CustomBrowserContextConfig(BrowserContextConfig):
+    # Resource blocking profile ("off", "standard", "research" or "auto" to pick by use_vision);
+    # None defers to the BROWSER_BLOCK_PROFILE environment variable
+    resource_blocking: Optional[str] = None
+    use_vision: bool = True
+    blocked_domains: List[str] = []
+    # Serve static sub-resources from the shared on-disk cache (see http_cache.get_http_cache);
+    # None defers to the BROWSER_HTTP_CACHE environment variable
+    http_cache: Optional[bool] = None
+    # What to re-open after a dead browser or context was relaunched: "none", "url" or "tabs"
+    restore_on_relaunch: str = "url"
+
+
 class CustomBrowserContext(BrowserContext):
     def __init__(
             self,
@@ -20,3 +43,240 @@ class CustomBrowserContext(BrowserContext):
             state: Optional[BrowserContextState] = None,
     ):
         super(CustomBrowserContext, self).__init__(browser=browser, config=config, state=state)
+        self.resource_blocker = None
+        # Why the current Playwright context is unusable (closed underneath us, page crashed), if it is
+        self.lost_reason: Optional[str] = None
+        self._closing = False
+        # Browser state captured ahead of the agent's next step (see start_state_prefetch)
+        self._state_prefetch: Optional[asyncio.Task] = None
+        self._state_prefetch_done_at: Optional[float] = None
+        # How the last step-level get_state was served: seconds waited, extraction seconds, prefetched or not
+        self.last_state_timing: Dict[str, Any] = {}
+        # Element tree last sent to the LLM in full, for sending deltas on later steps
+        self.dom_snapshots = create_dom_snapshot_cache()
+
+    async def _create_context(self, browser: PlaywrightBrowser) -> PlaywrightBrowserContext:
+        started = time.perf_counter()
+        context = await super()._create_context(browser)
+        self.dom_snapshots.reset()
+        # Routes registered later run first: the blocker sees requests before the cache does
+        http_cache = get_http_cache(getattr(self.config, "http_cache", None))
+        if http_cache:
+            await http_cache.attach(context)
+        self.resource_blocker = create_resource_blocker(
+            getattr(self.config, "resource_blocking", None),
+            use_vision=getattr(self.config, "use_vision", True),
+            blocked_domains=getattr(self.config, "blocked_domains", None),
+        )
+        if self.resource_blocker:
+            await self.resource_blocker.attach(context)
+        self._record_launch_phase(PHASE_CONTEXT_CREATE, time.perf_counter() - started)
+        self._watch_first_navigation(context)
+        self._watch_liveness(context)
+        return context
+
+    def _watch_liveness(self, context: PlaywrightBrowserContext):
+        self.lost_reason = None
+
+        def on_close(_context):
+            if not self._closing:
+                self.lost_reason = "context closed"
+                logger.warning("Browser context closed unexpectedly, it will be recreated before the next step.")
+
+        def on_crash(page):
+            if page is self.agent_current_page:
+                self.lost_reason = f"page crashed ({page.url})"
+                logger.warning(f"Agent page crashed ({page.url}), the context will be recreated before the next step.")
+
+        def watch(page):
+            page.on("crash", on_crash)
+
+        context.on("close", on_close)
+        for page in context.pages:
+            watch(page)
+        context.on("page", watch)
+
+    async def close(self):
+        self.cancel_state_prefetch()
+        self._closing = True
+        try:
+            await super().close()
+        finally:
+            self._closing = False
+
+    # A prefetched state older than this (e.g. the agent was paused) is re-captured instead
+    STATE_PREFETCH_MAX_AGE = 3.0
+
+    async def _capture_state(self, cache_clickable_elements_hashes: bool) -> BrowserState:
+        started = time.perf_counter()
+        state = await super().get_state(cache_clickable_elements_hashes=cache_clickable_elements_hashes)
+        observe("browser.get_state", time.perf_counter() - started)
+        return state
+
+    def start_state_prefetch(self):
+        """
+        Starts capturing the browser state (DOM and screenshot) for the agent's next step in the
+        background, so it overlaps with the agent's post-action bookkeeping. The next get_state
+        call returns it instead of capturing again.
+        """
+        if self.session is None or (self._state_prefetch and not self._state_prefetch.done()):
+            return
+        self._state_prefetch_done_at = None
+
+        async def prefetch() -> BrowserState:
+            try:
+                return await self._capture_state(cache_clickable_elements_hashes=True)
+            finally:
+                self._state_prefetch_done_at = time.perf_counter()
+
+        self._state_prefetch = asyncio.create_task(prefetch())
+
+    def cancel_state_prefetch(self):
+        prefetch, self._state_prefetch = self._state_prefetch, None
+        if prefetch is None:
+            return
+        if not prefetch.done():
+            prefetch.cancel()
+        elif not prefetch.cancelled():
+            prefetch.exception()  # Mark a failure as retrieved
+
+    async def get_state(self, cache_clickable_elements_hashes: bool) -> BrowserState:
+        started = time.perf_counter()
+        prefetch, state = self._state_prefetch, None
+        if prefetch is not None:
+            if cache_clickable_elements_hashes:
+                self._state_prefetch = None  # Consumed by the step that asked for it
+            try:
+                state = await asyncio.shield(prefetch)
+            except asyncio.CancelledError:
+                if not prefetch.cancelled():
+                    raise  # The caller itself was cancelled
+            except Exception as e:
+                logger.debug(f"State prefetch failed, capturing again: {e}")
+            if state is not None and time.perf_counter() - (self._state_prefetch_done_at or 0) > self.STATE_PREFETCH_MAX_AGE:
+                state = None
+        prefetched = state is not None
+        if state is None:
+            state = await self._capture_state(cache_clickable_elements_hashes)
+        if cache_clickable_elements_hashes:
+            waited = time.perf_counter() - started
+            observe("browser.get_state.wait", waited)
+            self.last_state_timing = {"wait": waited, "prefetched": prefetched}
+        return state
+
+    async def heartbeat(self, timeout: float = 5.0) -> Optional[str]:
+        """Round-trips to the browser through the context. Returns why the session is dead, or None if alive."""
+        if not self.browser.is_connected():
+            return "browser disconnected"
+        if self.lost_reason:
+            return self.lost_reason
+        try:
+            await asyncio.wait_for(self.session.context.cookies(), timeout)
+        except asyncio.TimeoutError:
+            return f"no heartbeat response within {timeout:.0f}s"
+        except Exception as e:
+            return f"heartbeat failed: {e}"
+        return None
+
+    async def ensure_alive(self, timeout: float = 5.0) -> bool:
+        """
+        Checks the session before the agent uses it and, if the browser or context died, replaces
+        it in place (re-opening the last URL or tabs per restore_on_relaunch), so agents holding
+        this object recover without manual intervention. Returns False if a relaunch happened.
+        """
+        if self.session is None:
+            return True  # Created lazily on first use, which also relaunches a dead browser
+        reason = await self.heartbeat(timeout)
+        if reason is None:
+            return True
+        relaunch_browser = not self.browser.is_connected()
+        logger.warning(f"Browser session is dead ({reason}), relaunching the {'browser' if relaunch_browser else 'context'}.")
+        restored = await self.recycle(
+            relaunch_browser=relaunch_browser,
+            restore=getattr(self.config, "restore_on_relaunch", "url"),
+        )
+        logger.info(f"Browser session relaunched, restored {restored or 'nothing'}.")
+        return False
+
+    def _record_launch_phase(self, phase: str, elapsed: float):
+        observe(phase, elapsed)
+        launch_timings = getattr(self.browser, "launch_timings", None)
+        if launch_timings is not None:
+            launch_timings[phase] = elapsed
+
+    def _watch_first_navigation(self, context: PlaywrightBrowserContext):
+        """Records the time from context creation to the first real page load, and that page's first paint."""
+        created_at = time.perf_counter()
+        recorded = False
+
+        async def on_load(page):
+            nonlocal recorded
+            if recorded or page.url.startswith("about:"):
+                return
+            recorded = True
+            self._record_launch_phase(PHASE_FIRST_NAVIGATION, time.perf_counter() - created_at)
+            try:
+                first_paint_ms = await page.evaluate(FIRST_CONTENTFUL_PAINT_SCRIPT)
+            except Exception as e:
+                logger.debug(f"Could not read first-contentful-paint: {e}")
+                return
+            if first_paint_ms is not None:
+                self._record_launch_phase(PHASE_FIRST_PAINT, first_paint_ms / 1000)
+
+        def watch(page):
+            page.on("load", on_load)
+
+        for page in context.pages:
+            watch(page)
+        context.on("page", watch)
+
+    def _open_urls(self, restore: str) -> List[str]:
+        """URLs to re-open after a recycle: the agent's current page first, then (for "tabs") the other tabs."""
+        if restore == "none" or self.session is None:
+            return []
+        current = self.agent_current_page.url if self.agent_current_page else None
+        urls = [current] if current else []
+        if restore == "tabs":
+            try:
+                urls += [page.url for page in self.session.context.pages if page.url != current]
+            except Exception as e:
+                logger.debug(f"Could not list open tabs: {e}")
+        return [url for url in urls if url.startswith(("http://", "https://", "file://"))]
+
+    async def recycle(self, relaunch_browser: bool = False, restore: str = "url") -> List[str]:
+        """
+        Replaces the Playwright context (and with relaunch_browser, the browser process) in place:
+        the new one is created lazily on next use, so agents holding this object keep working.
+        restore re-opens "url" (the agent's current page), "tabs" (all tabs) or "none".
+        Returns the re-opened URLs.
+        """
+        urls = self._open_urls(restore)
+        try:
+            await self.close()
+        except Exception as e:
+            logger.debug(f"Error closing context during recycle: {e}")
+        if relaunch_browser:
+            try:
+                await self.browser.close()
+            except Exception as e:
+                logger.debug(f"Error closing browser during recycle: {e}")
+
+        restored = []
+        for i, url in enumerate(urls):
+            try:
+                if i == 0:
+                    page = await self.get_current_page()
+                    await page.goto(url, wait_until="domcontentloaded")
+                else:
+                    await self.create_new_tab(url)
+                restored.append(url)
+            except Exception as e:
+                logger.warning(f"Could not re-open {url} after recycling the browser context: {e}")
+        if len(restored) > 1:
+            await self.switch_to_tab(0)
+        elif not restored:
+            await self.get_session()
+        return restored
+
+    def get_blocking_stats(self) -> Optional[dict]:
+        return self.resource_blocker.get_stats() if self.resource_blocker else None
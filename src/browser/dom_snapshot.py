@@ -0,0 +1,171 @@
+import logging
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# "\t\t*[12]*<button type='submit'>Send />" as written by clickable_elements_to_string
+ELEMENT_LINE = re.compile(r"^(\t*)\*?\[(\d+)\]\*?(<.*)$", re.S)
+
+
+class DomSnapshot:
+    """
+    The serialised interactive elements of one browser state, split into items keyed by a
+    stable identity: the element's xpath for indexed elements, the text itself for text lines.
+    Highlight indices are re-assigned on every extraction, so they are not part of the identity.
+    """
+
+    def __init__(self, url: str, text: str, items: List[Tuple[Tuple[str, str, int], Optional[int], str]]):
+        self.url = url
+        self.text = text
+        # (identity, highlight index or None for text lines, line without the index marker)
+        self.items = items
+
+    @classmethod
+    def from_state(cls, state, include_attributes: Optional[List[str]] = None) -> "DomSnapshot":
+        text = state.element_tree.clickable_elements_to_string(include_attributes=include_attributes or [])
+        seen: Counter = Counter()
+        items = []
+        for line in text.split("\n") if text else []:
+            match = ELEMENT_LINE.match(line)
+            if match:
+                depth, index, rest = match.group(1), int(match.group(2)), match.group(3)
+                node = state.selector_map.get(index)
+                base = ("element", node.xpath if node is not None else rest)
+                body = depth + rest
+            else:
+                index, body = None, line
+                base = ("text", line.strip())
+            seen[base] += 1
+            items.append(((*base, seen[base]), index, body))
+        return cls(state.url, text, items)
+
+
+class DomDelta:
+    """Changes between a baseline snapshot and the current one, in baseline and current indices."""
+
+    def __init__(self):
+        self.renumbered: List[Tuple[int, int, int]] = []  # (first old index, last old index, first new index)
+        self.removed: List[int] = []
+        self.removed_text: List[str] = []
+        self.added: List[str] = []  # Current lines of new or changed elements and text
+
+    @property
+    def size(self) -> int:
+        """Lines the delta takes in the prompt."""
+        return len(self.renumbered) + len(self.added) + len(self.removed_text) + (1 if self.removed else 0)
+
+    def to_text(self, baseline_step: Optional[int]) -> str:
+        reference = f"the page snapshot of step {baseline_step}" if baseline_step else "the last page snapshot"
+        if not (self.renumbered or self.removed or self.removed_text or self.added):
+            return f"Unchanged since {reference}."
+        lines = [f"Unchanged since {reference}, except (indices below are current):"]
+        for old_start, old_end, new_start in self.renumbered:
+            if old_start == old_end:
+                lines.append(f"Renumbered: [{old_start}] is now [{new_start}]")
+            else:
+                lines.append(
+                    f"Renumbered: [{old_start}]-[{old_end}] are now [{new_start}]-[{new_start + old_end - old_start}]"
+                )
+        if self.removed:
+            ranges = []
+            for index in self.removed:
+                if ranges and index == ranges[-1][1] + 1:
+                    ranges[-1][1] = index
+                else:
+                    ranges.append([index, index])
+            removed = ", ".join(f"[{start}]" if start == end else f"[{start}]-[{end}]" for start, end in ranges)
+            lines.append(f"Removed elements (snapshot indices): {removed}")
+        for text in self.removed_text:
+            lines.append(f"Removed text: {text}")
+        if self.added:
+            lines.append("New or changed:")
+            lines += self.added
+        return "\n".join(lines)
+
+
+def diff_snapshots(baseline: DomSnapshot, current: DomSnapshot) -> DomDelta:
+    delta = DomDelta()
+    previous = {key: (index, body) for key, index, body in baseline.items}
+    current_keys = set()
+    moved = []
+    for key, index, body in current.items:
+        current_keys.add(key)
+        old = previous.get(key)
+        if old is None or old[1] != body:
+            delta.added.append(body if index is None else re.sub(r"^(\t*)", rf"\g<1>[{index}]", body, count=1))
+        elif index is not None and old[0] != index:
+            moved.append((old[0], index))
+
+    # Collapse runs of elements shifted by the same offset into one range
+    for old_index, new_index in sorted(moved):
+        if delta.renumbered:
+            start, end, new_start = delta.renumbered[-1]
+            if old_index == end + 1 and new_index == new_start + old_index - start:
+                delta.renumbered[-1] = (start, old_index, new_start)
+                continue
+        delta.renumbered.append((old_index, old_index, new_index))
+
+    for key, index, body in baseline.items:
+        if key not in current_keys:
+            if index is not None:
+                delta.removed.append(index)
+            else:
+                delta.removed_text.append(body.strip())
+    return delta
+
+
+class DomSnapshotCache:
+    """
+    Remembers the last element tree that was sent to the LLM in full (the baseline) and diffs
+    later states against it. While the page stays the same and the delta is at most
+    max_change_ratio of the current element count, the agent can send the delta instead of
+    the full tree; otherwise the current state becomes the new baseline.
+    """
+
+    def __init__(self, max_change_ratio: float = 0.3):
+        self.max_change_ratio = max_change_ratio
+        self.baseline: Optional[DomSnapshot] = None
+        self.baseline_step: Optional[int] = None
+        self.stats = {"full": 0, "delta": 0, "full_chars": 0, "delta_chars": 0, "saved_chars": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_change_ratio > 0
+
+    def reset(self):
+        self.baseline = None
+        self.baseline_step = None
+
+    def set_baseline(self, snapshot: DomSnapshot, step: Optional[int] = None):
+        self.baseline = snapshot
+        self.baseline_step = step
+        self.stats["full"] += 1
+        self.stats["full_chars"] += len(snapshot.text)
+
+    def diff(self, snapshot: DomSnapshot) -> Optional[DomDelta]:
+        """The delta to send instead of the full tree, or None when the full tree should be sent."""
+        if not self.enabled or self.baseline is None or not snapshot.items:
+            return None
+        if snapshot.url != self.baseline.url:
+            return None
+        delta = diff_snapshots(self.baseline, snapshot)
+        if delta.size > self.max_change_ratio * len(snapshot.items):
+            logger.debug(f"DOM delta too large ({delta.size} lines for {len(snapshot.items)} items), sending the full tree")
+            return None
+        return delta
+
+    def record_delta(self, snapshot: DomSnapshot, delta_text: str):
+        self.stats["delta"] += 1
+        self.stats["delta_chars"] += len(delta_text)
+        self.stats["saved_chars"] += max(len(snapshot.text) - len(delta_text), 0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats)
+
+
+def create_dom_snapshot_cache() -> DomSnapshotCache:
+    """Builds a cache from BROWSER_DOM_DELTA_MAX_RATIO (0 always sends the full tree)."""
+    return DomSnapshotCache(max_change_ratio=float(os.getenv("BROWSER_DOM_DELTA_MAX_RATIO", "0.3")))
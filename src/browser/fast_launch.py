@@ -0,0 +1,68 @@
+from typing import Iterable, List
+
+# Chromium flags for headless server use: no background services, updaters, crash reporting
+# or GPU paths, none of which an automation browser needs.
+FAST_LAUNCH_ARGS = [
+    '--disable-background-networking',
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-extensions',
+    '--disable-client-side-phishing-detection',
+    '--disable-breakpad',
+    '--disable-domain-reliability',
+    '--disable-hang-monitor',
+    '--disable-prompt-on-repost',
+    '--disable-renderer-backgrounding',
+    '--disable-background-timer-throttling',
+    '--disable-backgrounding-occluded-windows',
+    '--disable-gpu',
+    '--metrics-recording-only',
+    '--mute-audio',
+    '--no-first-run',
+    '--no-default-browser-check',
+    '--no-pings',
+    '--password-store=basic',
+    '--use-mock-keychain',
+]
+
+FAST_LAUNCH_DISABLED_FEATURES = [
+    'Translate',
+    'OptimizationHints',
+    'MediaRouter',
+    'DialMediaRouteProvider',
+    'CalculateNativeWinOcclusion',
+    'InterestFeedContentSuggestions',
+    'CertificateTransparencyComponentUpdater',
+    'AutofillServerCommunication',
+]
+
+# Histogram names (src.utils.metrics) of the launch phases recorded by CustomBrowser/CustomBrowserContext
+PHASE_PLAYWRIGHT_START = 'browser.launch.playwright_start'
+PHASE_SPAWN_CONNECT = 'browser.launch.spawn_connect'
+PHASE_CONTEXT_CREATE = 'browser.launch.context_create'
+PHASE_FIRST_NAVIGATION = 'browser.launch.first_navigation'
+PHASE_FIRST_PAINT = 'browser.launch.first_paint'
+
+FIRST_CONTENTFUL_PAINT_SCRIPT = """
+() => {
+    const entry = performance.getEntriesByName('first-contentful-paint')[0];
+    return entry ? entry.startTime : null;
+}
+"""
+
+
+def merge_disable_features(args: Iterable[str]) -> List[str]:
+    """
+    Chromium only honours the last --disable-features flag, so combine all of them into one
+    (e.g. the fast-launch features and the ones disable_security turns off).
+    """
+    features = []
+    merged = []
+    for arg in args:
+        if arg.startswith('--disable-features='):
+            features += [f for f in arg.split('=', 1)[1].split(',') if f and f not in features]
+        else:
+            merged.append(arg)
+    if features:
+        merged.append(f'--disable-features={",".join(features)}')
+    return merged
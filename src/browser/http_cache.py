@@ -0,0 +1,296 @@
+import asyncio
+import atexit
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from distutils.util import strtobool
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Only static sub-resources are cached; documents and XHR are often personalised
+CACHEABLE_RESOURCE_TYPES = frozenset({"stylesheet", "script", "font", "image"})
+# Headers that describe the transfer, not the content (route.fetch returns the decoded body)
+TRANSFER_HEADERS = frozenset({"content-encoding", "content-length", "transfer-encoding", "connection"})
+# Request headers that make a response specific to one user; such requests are never cached
+CREDENTIAL_HEADERS = ("authorization", "cookie")
+# Vary values that do not change the cached body (route.fetch returns it decoded)
+IGNORABLE_VARY = frozenset({"accept-encoding"})
+# Heuristic freshness without explicit lifetime: 10% of the age since Last-Modified, capped,
+# or a short default when there is no Last-Modified either
+HEURISTIC_TTL = 300
+MAX_HEURISTIC_TTL = 3600
+MAX_ENTRY_BYTES = 5 * 1024 * 1024
+# The index is written at most this often; stores in between only mark it dirty
+INDEX_SAVE_INTERVAL = 5.0
+
+
+def _parse_http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def _freshness_lifetime(headers: Dict[str, str], now: Optional[float] = None) -> Optional[float]:
+    """Seconds the response may be reused for, or None if it must not be cached."""
+    cache_control = headers.get("cache-control", "").lower()
+    if any(directive in cache_control for directive in ("no-store", "no-cache", "private")):
+        return None
+    vary = {value.strip().lower() for value in headers.get("vary", "").split(",") if value.strip()}
+    if vary - IGNORABLE_VARY:
+        # The body depends on request headers the cache does not key on (or on anything, for "*")
+        return None
+    match = re.search(r"(?:s-maxage|max-age)=(\d+)", cache_control)
+    if match:
+        return float(match.group(1)) or None
+    if "must-revalidate" in cache_control or "proxy-revalidate" in cache_control:
+        return None  # Has to be revalidated and there is no explicit lifetime to trust until then
+    now = now or time.time()
+    date = _parse_http_date(headers.get("date")) or now
+    if "expires" in headers:
+        expires = _parse_http_date(headers["expires"])
+        # An invalid Expires (e.g. "0") means already expired
+        return (expires - date) if expires and expires > date else None
+    last_modified = _parse_http_date(headers.get("last-modified"))
+    if last_modified and last_modified < date:
+        return min((date - last_modified) * 0.1, MAX_HEURISTIC_TTL)
+    return HEURISTIC_TTL
+
+
+class HttpResponseCache:
+    """
+    Size-bounded on-disk cache of static responses, shared by all browser contexts and runs.
+
+    Bodies are stored once per content hash (the same library served from several URLs takes
+    the space once); a JSON index maps URLs to body hashes, headers and expiry. Entries are
+    evicted least-recently-used once the stored bodies exceed max_bytes. The index is written
+    at most every INDEX_SAVE_INTERVAL seconds and at exit; bodies no index entry refers to
+    (e.g. after a crash) are deleted on load.
+
+    Only anonymous GETs of static sub-resources are cached: requests carrying Authorization or
+    Cookie headers, responses that set cookies, are private or vary on request headers are not.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._blob_dir = os.path.join(cache_dir, "blobs")
+        self._index_path = os.path.join(cache_dir, "index.json")
+        os.makedirs(self._blob_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._index_lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._blob_refs: Dict[str, int] = {}
+        self._blob_sizes: Dict[str, int] = {}
+        self._stored_bytes = 0
+        self._index_dirty = False
+        self._index_saved_at = 0.0
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "bytes_served": 0}
+        self._load_index()
+        atexit.register(self.flush)
+
+    # --- Index persistence ---
+
+    def _load_index(self):
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            stored = {}
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable browser HTTP cache index {self._index_path}: {e}")
+            stored = {}
+        blobs = set(os.listdir(self._blob_dir))
+        for url, entry in stored.items():
+            if entry["hash"] not in blobs:
+                continue
+            self._entries[url] = entry
+            self._blob_refs[entry["hash"]] = self._blob_refs.get(entry["hash"], 0) + 1
+            if entry["hash"] not in self._blob_sizes:
+                self._blob_sizes[entry["hash"]] = entry["size"]
+                self._stored_bytes += entry["size"]
+        for orphan in blobs - set(self._blob_refs):
+            try:
+                os.remove(os.path.join(self._blob_dir, orphan))
+            except OSError:
+                pass
+
+    def _save_index(self):
+        with self._lock:
+            snapshot = dict(self._entries)
+            self._index_dirty = False
+            self._index_saved_at = time.monotonic()
+        with self._index_lock:
+            tmp_path = f"{self._index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self._index_path)
+
+    def _index_changed(self):
+        """Marks the index dirty and writes it if the last write is INDEX_SAVE_INTERVAL old."""
+        with self._lock:
+            self._index_dirty = True
+            due = time.monotonic() - self._index_saved_at >= INDEX_SAVE_INTERVAL
+        if due:
+            self._save_index()
+
+    def flush(self):
+        """Writes pending index changes."""
+        if self._index_dirty:
+            try:
+                self._save_index()
+            except Exception as e:
+                logger.warning(f"Failed to write the browser HTTP cache index: {e}")
+
+    # --- Lookup and storage (blocking, run in a worker thread) ---
+
+    def _get(self, url: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                return None
+            if entry["expires_at"] < time.time():
+                self._remove(url)
+                return None
+            self._entries.move_to_end(url)
+        try:
+            with open(os.path.join(self._blob_dir, entry["hash"]), "rb") as f:
+                return {**entry, "body": f.read()}
+        except FileNotFoundError:
+            with self._lock:
+                self._remove(url)
+            return None
+
+    def _put(self, url: str, status: int, headers: Dict[str, str], body: bytes, lifetime: float):
+        digest = hashlib.sha256(body).hexdigest()
+        blob_path = os.path.join(self._blob_dir, digest)
+        if not os.path.exists(blob_path):
+            tmp_path = f"{blob_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, blob_path)
+        with self._lock:
+            if url in self._entries:
+                self._remove(url)
+            self._entries[url] = {
+                "hash": digest,
+                "status": status,
+                "headers": headers,
+                "size": len(body),
+                "expires_at": time.time() + lifetime,
+            }
+            self._blob_refs[digest] = self._blob_refs.get(digest, 0) + 1
+            if digest not in self._blob_sizes:
+                self._blob_sizes[digest] = len(body)
+                self._stored_bytes += len(body)
+            self.stats["stores"] += 1
+            while self._stored_bytes > self.max_bytes and len(self._entries) > 1:
+                self._remove(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+        self._index_changed()
+
+    def _remove(self, url: str):
+        """Drops an index entry and its body once no other URL refers to it. Caller holds the lock."""
+        entry = self._entries.pop(url)
+        digest = entry["hash"]
+        self._blob_refs[digest] -= 1
+        if self._blob_refs[digest] <= 0:
+            del self._blob_refs[digest]
+            self._stored_bytes -= self._blob_sizes.pop(digest, 0)
+            try:
+                os.remove(os.path.join(self._blob_dir, digest))
+            except FileNotFoundError:
+                pass
+
+    # --- Playwright routing ---
+
+    async def handle_route(self, route):
+        request = route.request
+        if request.method != "GET" or request.resource_type not in CACHEABLE_RESOURCE_TYPES:
+            await route.fallback()
+            return
+        request_headers = await request.all_headers()
+        if any(request_headers.get(name) for name in CREDENTIAL_HEADERS):
+            await route.fallback()
+            return
+
+        cached = await asyncio.to_thread(self._get, request.url)
+        if cached is not None:
+            self.stats["hits"] += 1
+            self.stats["bytes_served"] += cached["size"]
+            await route.fulfill(status=cached["status"], headers=cached["headers"], body=cached["body"])
+            return
+
+        self.stats["misses"] += 1
+        try:
+            response = await route.fetch()
+            body = await response.body()
+        except Exception as e:
+            logger.debug(f"Browser HTTP cache could not fetch {request.url}: {e}")
+            await route.fallback()
+            return
+
+        headers = {
+            name.lower(): value for name, value in response.headers.items() if name.lower() not in TRANSFER_HEADERS
+        }
+        lifetime = _freshness_lifetime(headers)
+        if response.status == 200 and lifetime and "set-cookie" not in headers and len(body) <= MAX_ENTRY_BYTES:
+            try:
+                await asyncio.to_thread(self._put, request.url, response.status, headers, body, lifetime)
+            except Exception as e:
+                logger.warning(f"Failed to store {request.url} in the browser HTTP cache: {e}")
+        await route.fulfill(status=response.status, headers=headers, body=body)
+
+    async def attach(self, context):
+        """Serves cacheable requests of a Playwright BrowserContext from this cache."""
+        await context.route("**/*", self.handle_route)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = len(self._entries)
+            stored_bytes = self._stored_bytes
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": entries,
+            "stored_bytes": stored_bytes,
+            "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            for url in list(self._entries):
+                self._remove(url)
+        self._save_index()
+
+
+_shared_cache: Optional[HttpResponseCache] = None
+
+
+def get_http_cache(enabled: Optional[bool] = None) -> Optional[HttpResponseCache]:
+    """
+    Returns the process-wide browser HTTP cache, or None if disabled. The cache is opt-in:
+    routing requests through it replaces Chromium's own cache for the context. enabled=None
+    defers to BROWSER_HTTP_CACHE (default false). Configured by BROWSER_HTTP_CACHE_DIR and
+    BROWSER_HTTP_CACHE_SIZE_MB.
+    """
+    global _shared_cache
+    if enabled is None:
+        enabled = bool(strtobool(os.getenv("BROWSER_HTTP_CACHE") or "false"))
+    if not enabled:
+        return None
+    if _shared_cache is None:
+        _shared_cache = HttpResponseCache(
+            cache_dir=os.getenv("BROWSER_HTTP_CACHE_DIR") or "./tmp/browser_http_cache",
+            max_bytes=int(os.getenv("BROWSER_HTTP_CACHE_SIZE_MB", "256")) * 1024 * 1024,
+        )
+    return _shared_cache
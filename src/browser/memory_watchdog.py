@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+RECYCLE_BROWSER = "browser"
+RECYCLE_CONTEXT = "context"
+
+
+def find_browser_process(browser) -> Optional[psutil.Process]:
+    """
+    The main Chromium process of a CustomBrowser: the descendant of this process launched with the
+    browser's reserved remote-debugging port, or the subprocess started for a user-provided binary.
+    Remote (cdp_url / wss_url) browsers have no local process.
+    """
+    chrome_subprocess = getattr(browser, "_chrome_subprocess", None)
+    if chrome_subprocess is not None:
+        return chrome_subprocess
+    port = getattr(browser, "debugging_port", None)
+    if not port:
+        return None
+    flag = f"--remote-debugging-port={port}"
+    for proc in psutil.Process().children(recursive=True):
+        try:
+            if flag in proc.cmdline():
+                return proc
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return None
+
+
+def sample_process_tree(browser) -> Dict[str, Any]:
+    """RSS of the browser process tree in MB (None if unknown). Only uses psutil, so it may run in a thread."""
+    rss_mb = None
+    process_count = 0
+    root = find_browser_process(browser)
+    if root is not None:
+        try:
+            processes = [root, *root.children(recursive=True)]
+            rss = 0
+            for proc in processes:
+                try:
+                    rss += proc.memory_info().rss
+                    process_count += 1
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    continue
+            rss_mb = round(rss / (1024 * 1024), 1)
+        except psutil.NoSuchProcess:
+            pass
+    return {"rss_mb": rss_mb, "processes": process_count}
+
+
+def sample_browser(browser, process_sample: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """RSS of the browser process tree and the number of open contexts and pages."""
+    process_sample = process_sample or sample_process_tree(browser)
+    contexts = []
+    playwright_browser = getattr(browser, "playwright_browser", None)
+    if playwright_browser is not None:
+        try:
+            contexts = playwright_browser.contexts
+        except Exception:
+            contexts = []
+    return {
+        "timestamp": time.time(),
+        **process_sample,
+        "contexts": len(contexts),
+        "pages": sum(len(context.pages) for context in contexts),
+    }
+
+
+class BrowserMemoryWatchdog:
+    """
+    Periodically samples a CustomBrowser's memory and tab count in the background. When a
+    threshold is crossed it flags a recycle, which on_step_start carries out before the
+    agent's next step, so no action is interrupted:
+    - rss over max_rss_mb: the browser process is relaunched;
+    - more than max_pages pages or max_contexts contexts: the context is replaced.
+    The agent's current URL is re-opened after either.
+    """
+
+    def __init__(
+            self,
+            browser,
+            max_rss_mb: float = 2048,
+            max_pages: int = 20,
+            max_contexts: int = 5,
+            interval: float = 30.0,
+    ):
+        self.browser = browser
+        self.max_rss_mb = max_rss_mb
+        self.max_pages = max_pages
+        self.max_contexts = max_contexts
+        self.interval = interval
+        self.last_sample: Optional[Dict[str, Any]] = None
+        self.pending_recycle: Optional[str] = None
+        self.pending_reason: Optional[str] = None
+        self.recycle_count = 0
+        self.events: List[Dict[str, Any]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def _record_event(self, event: str, **data):
+        self.events.append({"event": event, "timestamp": time.time(), **data})
+        del self.events[:-100]
+
+    def check(self, process_sample: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Samples once and flags a recycle if a threshold is crossed. Returns the sample."""
+        if getattr(self.browser, "playwright_browser", None) is None:
+            return None  # Not launched (yet, or any more)
+        sample = sample_browser(self.browser, process_sample)
+        self.last_sample = sample
+        logger.debug(
+            f"Browser watchdog: rss={sample['rss_mb']}MB in {sample['processes']} processes, "
+            f"{sample['contexts']} contexts, {sample['pages']} pages"
+        )
+
+        scope, reason = None, None
+        if sample["rss_mb"] is not None and sample["rss_mb"] > self.max_rss_mb:
+            scope, reason = RECYCLE_BROWSER, f"rss {sample['rss_mb']}MB > {self.max_rss_mb}MB"
+        elif sample["pages"] > self.max_pages:
+            scope, reason = RECYCLE_CONTEXT, f"{sample['pages']} pages > {self.max_pages}"
+        elif sample["contexts"] > self.max_contexts:
+            scope, reason = RECYCLE_CONTEXT, f"{sample['contexts']} contexts > {self.max_contexts}"
+
+        # A browser recycle also replaces the context, so it wins over a pending context recycle
+        if scope and (self.pending_recycle is None or scope == RECYCLE_BROWSER):
+            if self.pending_recycle != scope:
+                logger.warning(f"Browser watchdog: {reason}, recycling the {scope} before the next agent step.")
+                self._record_event("threshold_crossed", scope=scope, reason=reason, sample=sample)
+            self.pending_recycle, self.pending_reason = scope, reason
+        return sample
+
+    async def _run(self):
+        while True:
+            try:
+                # Walking the process tree is blocking; Playwright objects are only touched on the loop
+                self.check(await asyncio.to_thread(sample_process_tree, self.browser))
+            except Exception as e:
+                logger.debug(f"Browser watchdog sample failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(
+                f"Browser watchdog started (every {self.interval:.0f}s; max rss {self.max_rss_mb}MB, "
+                f"max pages {self.max_pages}, max contexts {self.max_contexts})."
+            )
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def recycle_if_needed(self, browser_context) -> bool:
+        """Carries out a pending recycle on the agent's context. Returns True if one happened."""
+        scope, reason = self.pending_recycle, self.pending_reason
+        if scope is None:
+            return False
+        self.pending_recycle = self.pending_reason = None
+        before = self.last_sample
+        started = time.perf_counter()
+        try:
+            restored = await browser_context.recycle(relaunch_browser=scope == RECYCLE_BROWSER, restore="url")
+        except Exception as e:
+            logger.error(f"Browser watchdog: failed to recycle the {scope}: {e}")
+            self._record_event("recycle_failed", scope=scope, reason=reason, error=str(e))
+            return False
+        self.recycle_count += 1
+        after = sample_browser(self.browser, await asyncio.to_thread(sample_process_tree, self.browser))
+        logger.info(
+            f"Browser watchdog: recycled the {scope} ({reason}) in {time.perf_counter() - started:.1f}s; "
+            f"rss {before and before['rss_mb']}MB -> {after['rss_mb']}MB, pages "
+            f"{before and before['pages']} -> {after['pages']}, restored {restored or 'nothing'}"
+        )
+        self._record_event("recycled", scope=scope, reason=reason, before=before, after=after)
+        return True
+
+    async def on_step_start(self, agent):
+        """Agent on_step_start hook: the point between steps where recycling is safe."""
+        await self.recycle_if_needed(agent.browser_context)
+
+
+def create_memory_watchdog(browser) -> Optional[BrowserMemoryWatchdog]:
+    """
+    Builds a watchdog from BROWSER_MAX_RSS_MB, BROWSER_MAX_PAGES, BROWSER_MAX_CONTEXTS and
+    BROWSER_WATCHDOG_INTERVAL; an interval of 0 disables it.
+    """
+    interval = float(os.getenv("BROWSER_WATCHDOG_INTERVAL", "30"))
+    if interval <= 0:
+        return None
+    return BrowserMemoryWatchdog(
+        browser,
+        max_rss_mb=float(os.getenv("BROWSER_MAX_RSS_MB", "2048")),
+        max_pages=int(os.getenv("BROWSER_MAX_PAGES", "20")),
+        max_contexts=int(os.getenv("BROWSER_MAX_CONTEXTS", "5")),
+        interval=interval,
+    )
@@ -0,0 +1,91 @@
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT_RANGE = (9222, 9321)
+
+
+def _parse_port_range(value: Optional[str]):
+    if not value:
+        return DEFAULT_PORT_RANGE
+    try:
+        start, end = (int(part) for part in value.split("-", 1))
+        return start, end
+    except ValueError:
+        logger.error(f"Invalid BROWSER_DEBUGGING_PORT_RANGE '{value}', expected e.g. 9222-9321.")
+        return DEFAULT_PORT_RANGE
+
+
+class PortAllocator:
+    """
+    Hands out unique Chrome remote-debugging ports from a range.
+
+    A port stays reserved from acquire() until release(), i.e. for the lifetime of the browser,
+    so browsers launched concurrently in this process never pick the same port. Ports that are
+    already bound by another process are skipped at acquisition time.
+    """
+
+    def __init__(self, start: int = DEFAULT_PORT_RANGE[0], end: int = DEFAULT_PORT_RANGE[1], host: str = "127.0.0.1"):
+        if start > end:
+            raise ValueError(f"Invalid port range {start}-{end}")
+        self.start = start
+        self.end = end
+        self.host = host
+        self._lock = threading.Lock()
+        self._reservations: Dict[int, Dict[str, Any]] = {}
+        self._next = start
+
+    def _is_free(self, port: int) -> bool:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            try:
+                s.bind((self.host, port))
+                return True
+            except OSError:
+                return False
+
+    def acquire(self, owner: str, preferred: Optional[int] = None) -> Optional[int]:
+        """Reserves a free port (preferred first, if in range) for owner. Returns None when the range is exhausted."""
+        with self._lock:
+            size = self.end - self.start + 1
+            candidates = [preferred] if preferred is not None and self.start <= preferred <= self.end else []
+            # Round-robin from the last handed-out port, so a just-released port is not reused immediately
+            candidates += [self.start + (self._next - self.start + i) % size for i in range(size)]
+            for port in candidates:
+                if port in self._reservations or not self._is_free(port):
+                    continue
+                self._reservations[port] = {"owner": owner, "reserved_at": time.time(), "endpoint": self.endpoint(port)}
+                self._next = port + 1 if port < self.end else self.start
+                return port
+        logger.warning(f"No free remote-debugging port in {self.start}-{self.end} for {owner}.")
+        return None
+
+    def release(self, port: Optional[int]):
+        if port is None:
+            return
+        with self._lock:
+            self._reservations.pop(port, None)
+
+    def endpoint(self, port: int) -> str:
+        return f"http://{self.host}:{port}"
+
+    def list_reservations(self) -> Dict[int, Dict[str, Any]]:
+        """Currently reserved ports with their owner and CDP endpoint (for re-attaching or inspection)."""
+        with self._lock:
+            return {port: dict(info) for port, info in sorted(self._reservations.items())}
+
+
+_shared_allocator: Optional[PortAllocator] = None
+
+
+def get_port_allocator() -> PortAllocator:
+    """Returns the process-wide allocator; the range is read from BROWSER_DEBUGGING_PORT_RANGE."""
+    global _shared_allocator
+    if _shared_allocator is None:
+        start, end = _parse_port_range(os.getenv("BROWSER_DEBUGGING_PORT_RANGE"))
+        _shared_allocator = PortAllocator(start, end, host=os.getenv("BROWSER_DEBUGGING_HOST") or "127.0.0.1")
+    return _shared_allocator
@@ -0,0 +1,179 @@
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Ad, analytics and tracking hosts; a host matches itself and all of its subdomains
+DEFAULT_BLOCKED_DOMAINS = (
+    "doubleclick.net",
+    "googlesyndication.com",
+    "googleadservices.com",
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googletagservices.com",
+    "adservice.google.com",
+    "connect.facebook.net",
+    "amazon-adsystem.com",
+    "adnxs.com",
+    "criteo.com",
+    "criteo.net",
+    "taboola.com",
+    "outbrain.com",
+    "scorecardresearch.com",
+    "quantserve.com",
+    "moatads.com",
+    "pubmatic.com",
+    "rubiconproject.com",
+    "openx.net",
+    "hotjar.com",
+    "mixpanel.com",
+    "segment.io",
+    "nr-data.net",
+    "hm.baidu.com",
+    "pos.baidu.com",
+    "cpro.baidu.com",
+    "cnzz.com",
+    "mmstat.com",
+    "tanx.com",
+)
+
+# Blocking profiles: which Playwright resource types to drop and whether to apply the domain blocklist.
+# "research" is meant for agents without vision, where images only cost bandwidth and memory.
+BLOCKING_PROFILES: Dict[str, Dict[str, Any]] = {
+    "off": {"resource_types": (), "block_domains": False},
+    "standard": {"resource_types": ("media", "font"), "block_domains": True},
+    "research": {"resource_types": ("media", "font", "image"), "block_domains": True},
+}
+AUTO_PROFILE = "auto"
+
+# Typical transfer sizes, used to estimate what blocked requests would have cost
+ESTIMATED_BYTES = {
+    "image": 40_000,
+    "media": 500_000,
+    "font": 35_000,
+    "script": 30_000,
+    "stylesheet": 15_000,
+    "xhr": 5_000,
+    "fetch": 5_000,
+}
+DEFAULT_ESTIMATED_BYTES = 5_000
+
+# Process-wide totals over all contexts
+_TOTALS = {"requests": 0, "blocked": 0, "estimated_bytes_saved": 0}
+_TOTALS_LOCK = threading.Lock()
+
+
+def profile_for_task(use_vision: bool, profile: Optional[str] = AUTO_PROFILE) -> str:
+    """Resolves "auto" (or an unknown name) to a concrete profile for an agent with or without vision."""
+    if profile in BLOCKING_PROFILES:
+        return profile
+    return "standard" if use_vision else "research"
+
+
+def _host_matches(host: str, domains: Iterable[str]) -> bool:
+    return any(host == domain or host.endswith("." + domain) for domain in domains)
+
+
+class ResourceBlocker:
+    """
+    Aborts requests for ads, trackers and heavy resource types through Playwright context
+    routing. Top-level documents are never blocked, and allowed_domains always pass.
+
+    Note that routing disables Chromium's own HTTP cache for the context.
+    """
+
+    def __init__(
+            self,
+            profile: str = "standard",
+            blocked_domains: Optional[Iterable[str]] = None,
+            allowed_domains: Optional[Iterable[str]] = None,
+    ):
+        if profile not in BLOCKING_PROFILES:
+            raise ValueError(f"Unknown resource blocking profile '{profile}', expected one of {list(BLOCKING_PROFILES)}")
+        self.profile = profile
+        settings = BLOCKING_PROFILES[profile]
+        self.resource_types = frozenset(settings["resource_types"])
+        self.blocked_domains = tuple(
+            (DEFAULT_BLOCKED_DOMAINS if settings["block_domains"] else ()) + tuple(blocked_domains or ())
+        )
+        self.allowed_domains = tuple(allowed_domains or ())
+        self.stats: Dict[str, Any] = {"requests": 0, "blocked": 0, "estimated_bytes_saved": 0, "by_reason": {}}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.resource_types or self.blocked_domains)
+
+    def should_block(self, url: str, resource_type: str) -> Optional[str]:
+        """Returns why the request should be blocked ("domain" or its resource type), or None."""
+        if resource_type == "document" or not url.startswith(("http://", "https://")):
+            return None
+        host = (urlsplit(url).hostname or "").lower()
+        if self.allowed_domains and _host_matches(host, self.allowed_domains):
+            return None
+        if self.blocked_domains and _host_matches(host, self.blocked_domains):
+            return "domain"
+        if resource_type in self.resource_types:
+            return resource_type
+        return None
+
+    def _record(self, reason: Optional[str], resource_type: str):
+        saved = ESTIMATED_BYTES.get(resource_type, DEFAULT_ESTIMATED_BYTES) if reason else 0
+        with self._lock:
+            self.stats["requests"] += 1
+            if reason:
+                self.stats["blocked"] += 1
+                self.stats["estimated_bytes_saved"] += saved
+                self.stats["by_reason"][reason] = self.stats["by_reason"].get(reason, 0) + 1
+        with _TOTALS_LOCK:
+            _TOTALS["requests"] += 1
+            if reason:
+                _TOTALS["blocked"] += 1
+                _TOTALS["estimated_bytes_saved"] += saved
+
+    async def handle_route(self, route):
+        request = route.request
+        reason = self.should_block(request.url, request.resource_type)
+        self._record(reason, request.resource_type)
+        if reason:
+            await route.abort("blockedbyclient")
+        else:
+            # Let later routes (e.g. the shared HTTP cache) or the network handle it
+            await route.fallback()
+
+    async def attach(self, context):
+        """Installs the blocker on a Playwright BrowserContext (no-op for the "off" profile)."""
+        if not self.enabled:
+            return
+        await context.route("**/*", self.handle_route)
+        logger.info(f"Resource blocking enabled on browser context (profile: {self.profile}).")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "by_reason": dict(self.stats["by_reason"]), "profile": self.profile}
+
+
+def get_blocking_stats() -> Dict[str, Any]:
+    """Requests seen and blocked, and the estimated bytes saved, over all contexts since process start."""
+    with _TOTALS_LOCK:
+        return dict(_TOTALS)
+
+
+def create_resource_blocker(
+        profile: Optional[str],
+        use_vision: bool = True,
+        blocked_domains: Optional[Iterable[str]] = None,
+) -> Optional[ResourceBlocker]:
+    """
+    Builds the blocker for a context. profile None falls back to BROWSER_BLOCK_PROFILE (default "off");
+    "auto" picks by use_vision. Extra blocked domains can be listed, comma separated, in BROWSER_BLOCKED_DOMAINS.
+    """
+    profile = profile or os.getenv("BROWSER_BLOCK_PROFILE") or "off"
+    profile = profile_for_task(use_vision, profile)
+    if profile == "off":
+        return None
+    env_domains = [d.strip().lower() for d in os.getenv("BROWSER_BLOCKED_DOMAINS", "").split(",") if d.strip()]
+    return ResourceBlocker(profile, blocked_domains=[*env_domains, *(blocked_domains or [])])
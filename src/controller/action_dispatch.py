@@ -0,0 +1,80 @@
+from typing import Any, Callable, Dict, Optional
+
+KIND_REGISTRY = "registry"
+KIND_MCP = "mcp"
+
+# Metadata of built-in actions that differ from the defaults (no timeout, has side effects,
+# not parallel-safe, not cacheable)
+BUILTIN_ACTION_METADATA: Dict[str, Dict[str, Any]] = {
+    # Read-only: can run concurrently with each other within a step
+    "extract_content": {"side_effects": False, "parallel_safe": True},
+    "extract_tab_content": {"side_effects": False, "parallel_safe": True},
+    # Page loads and searches are bounded so a hung navigation fails the action instead of the step
+    "go_to_url": {"timeout": 90.0},
+    "open_tab": {"timeout": 90.0},
+    "search_google": {"timeout": 90.0},
+    "search_bing": {"timeout": 90.0},
+}
+
+
+class ActionSpec:
+    """How to execute one registered action, and what the controller may assume about it."""
+
+    def __init__(
+            self,
+            name: str,
+            kind: str,
+            function: Callable,
+            timeout: Optional[float] = None,
+            side_effects: bool = True,
+            parallel_safe: bool = False,
+            cacheable: bool = False,
+            cache_ttl: Optional[float] = None,
+            server: Optional[str] = None,
+    ):
+        self.name = name
+        # KIND_REGISTRY: executed through Registry.execute_action; KIND_MCP: a LangChain tool invoked directly
+        self.kind = kind
+        self.function = function
+        # Seconds before the action is cancelled and reported as failed, None for no limit
+        self.timeout = timeout
+        # False when the action only reads (the page, a tab or an external service)
+        self.side_effects = side_effects
+        self.parallel_safe = parallel_safe
+        # Results may be served from the MCP result cache, for cache_ttl seconds (None: the cache default)
+        self.cacheable = cacheable
+        self.cache_ttl = cache_ttl
+        self.server = server
+
+    def __repr__(self):
+        return (f"ActionSpec({self.name!r}, kind={self.kind!r}, timeout={self.timeout}, "
+                f"side_effects={self.side_effects}, parallel_safe={self.parallel_safe}, cacheable={self.cacheable})")
+
+
+class ActionDispatchTable:
+    """Action name -> ActionSpec, filled when actions and MCP tools are registered."""
+
+    def __init__(self):
+        self._specs: Dict[str, ActionSpec] = {}
+
+    def register(self, spec: ActionSpec):
+        self._specs[spec.name] = spec
+
+    def unregister(self, name: str):
+        self._specs.pop(name, None)
+
+    def get(self, name: str) -> Optional[ActionSpec]:
+        return self._specs.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._specs
+
+    def __len__(self) -> int:
+        return len(self._specs)
+
+    def specs(self) -> Dict[str, ActionSpec]:
+        return dict(self._specs)
+
+
+def builtin_action_spec(name: str, function: Callable) -> ActionSpec:
+    return ActionSpec(name, KIND_REGISTRY, function, **BUILTIN_ACTION_METADATA.get(name, {}))
@@ -24,10 +24,19 @@ import logging
 import inspect
 import asyncio
 import os
+import time
 from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.prompts import PromptTemplate
+import markdownify
 from browser_use.agent.views import ActionModel, ActionResult
 
+from src.controller.action_dispatch import KIND_MCP, ActionDispatchTable, ActionSpec, builtin_action_spec
+from src.controller.mcp_result_cache import get_mcp_result_cache
+from src.controller.serp_cache import get_serp_cache
+from src.controller.serp_engines import extract_serp_page, format_serp_results, get_serp_url, load_serp_page
+from src.controller.serp_fetcher import get_serp_fetcher
 from src.utils.mcp_client import create_tool_param_model, setup_mcp_client_and_tools
+from src.utils.metrics import get_all_histograms, observe
 
 from browser_use.utils import time_execution_sync
 
@@ -39,6 +48,11 @@ class SearchBingAction(BaseModel):
     query: str
 
 
+class ExtractTabContentAction(BaseModel):
+    page_id: int
+    goal: str
+
+
 class CustomController(Controller):
     def __init__(self, exclude_actions: list[str] = [],
                  output_model: Optional[Type[BaseModel]] = None,
@@ -50,6 +64,11 @@ class CustomController(Controller):
         self.ask_assistant_callback = ask_assistant_callback
         self.mcp_client = None
         self.mcp_server_config = None
+        # MCP_TOOL_TIMEOUT: seconds before an MCP tool call is abandoned (0 for no limit)
+        self.mcp_tool_timeout = float(os.getenv("MCP_TOOL_TIMEOUT", "120")) or None
+        self.dispatch_table = ActionDispatchTable()
+        for action_name, registered in self.registry.registry.actions.items():
+            self.dispatch_table.register(builtin_action_spec(action_name, registered.function))
 
     def _register_custom_actions(self):
         """Register all custom browser actions"""
@@ -112,6 +131,35 @@ class CustomController(Controller):
 
 
 
+        @self.registry.action(
+            'Extract content from the tab with the given page_id without switching to it, e.g. to read several '
+            'open tabs in one step. Same output as extract_content.',
+            param_model=ExtractTabContentAction,
+        )
+        async def extract_tab_content(params: ExtractTabContentAction, browser: BrowserContext,
+                                      page_extraction_llm: BaseChatModel):
+            session = await browser.get_session()
+            pages = session.context.pages
+            if not 0 <= params.page_id < len(pages):
+                return ActionResult(error=f"No tab with page_id {params.page_id}")
+            page = pages[params.page_id]
+            content = markdownify.markdownify(await page.content())
+            prompt = PromptTemplate(
+                input_variables=["goal", "page"],
+                template="Your task is to extract the content of the page. You will be given a page and a goal and "
+                         "you should extract all relevant information around this goal from the page. If the goal "
+                         "is vague, summarize the page. Respond in json format. Extraction goal: {goal}, Page: {page}",
+            )
+            try:
+                output = await page_extraction_llm.ainvoke(prompt.format(goal=params.goal, page=content))
+                msg = f"📄  Extracted from tab {params.page_id} ({page.url})\n: {output.content}\n"
+                logger.info(msg)
+                return ActionResult(extracted_content=msg, include_in_memory=True)
+            except Exception as e:
+                logger.debug(f"Error extracting content from tab {params.page_id}: {e}")
+                msg = f"📄  Extracted from tab {params.page_id} ({page.url})\n: {content}\n"
+                return ActionResult(extracted_content=msg)
+
         @self.registry.action(
             'Search the query in Bing search engine. Use this action for all web searches instead of navigating to Google. The query should be concrete and not vague or super long.',
             param_model=SearchBingAction,
@@ -120,16 +168,38 @@ class CustomController(Controller):
             """使用必应搜索引擎进行搜索"""
             try:
                 query = params.query
-                encoded_query = query.replace(" ", "+")
-                search_url = f"https://cn.bing.com/search?q={encoded_query}"
-                
-                # 导航到搜索页面
-                page = await browser.get_current_page()
-                await page.goto(search_url)
-                await page.wait_for_load_state()
-                
-                msg = f'🔍  Searched for "{query}" in Bing'
-                logger.info(msg)
+                search_url = get_serp_url("bing", query)
+                navigated = False
+
+                async def navigate_and_extract() -> str:
+                    nonlocal navigated
+                    # 导航到搜索页面
+                    page = await browser.get_current_page()
+                    await load_serp_page(page, "bing", search_url)
+                    navigated = True
+                    try:
+                        return format_serp_results(await extract_serp_page(page, "bing", timeout=0))
+                    except Exception as e:
+                        # 提取失败时页面仍然可用，只是不缓存
+                        logger.warning(f"Failed to extract Bing results: {e}")
+                        return ""
+
+                async def refetch_over_http() -> str:
+                    return format_serp_results(await get_serp_fetcher().search(query, "bing"))
+
+                # 命中缓存时直接返回结果，不再导航
+                results = await get_serp_cache().get_or_fetch(
+                    "bing", query, navigate_and_extract, revalidate=refetch_over_http
+                )
+
+                if navigated:
+                    msg = f'🔍  Searched for "{query}" in Bing'
+                    if results:
+                        msg += f"\n{results}"
+                else:
+                    msg = (f'🔍  Cached Bing results for "{query}" (the page was not opened, '
+                           f'use go_to_url to visit a result):\n{results}')
+                logger.info(msg.splitlines()[0])
                 return ActionResult(extracted_content=msg, include_in_memory=True)
                 
             except Exception as e:
@@ -149,50 +219,121 @@ class CustomController(Controller):
             context: Context | None = None,
     ) -> ActionResult:
         """Execute an action"""
+        # ActionModel 每次只设置一个动作字段，直接取出而不是遍历整个 model_dump
+        for action_name in action.model_fields_set:
+            params = getattr(action, action_name)
+            if params is not None:
+                break
+        else:
+            return ActionResult()
+        if isinstance(params, BaseModel):
+            params = params.model_dump(exclude_unset=True)
+
+        spec = self.get_action_spec(action_name)
+        if spec is not None and spec.kind == KIND_MCP:
+            logger.debug(f"Invoke MCP tool: {action_name}")
+            if spec.cacheable:
+                # 幂等的 MCP 工具：相同参数的重复调用直接返回缓存结果
+                call = get_mcp_result_cache().get_or_call(
+                    action_name, params, lambda: spec.function.ainvoke(params), ttl=spec.cache_ttl
+                )
+            else:
+                call = spec.function.ainvoke(params)
+        else:
+            call = self.registry.execute_action(
+                action_name,
+                params,
+                browser=browser_context,
+                page_extraction_llm=page_extraction_llm,
+                sensitive_data=sensitive_data,
+                available_file_paths=available_file_paths,
+                context=context,
+            )
 
+        started = time.perf_counter()
+        failed = False
         try:
-            for action_name, params in action.model_dump(exclude_unset=True).items():
-                if params is not None:
-                    if action_name.startswith("mcp"):
-                        # this is a mcp tool
-                        logger.debug(f"Invoke MCP tool: {action_name}")
-                        mcp_tool = self.registry.registry.actions.get(action_name).function
-                        result = await mcp_tool.ainvoke(params)
-                    else:
-                        result = await self.registry.execute_action(
-                            action_name,
-                            params,
-                            browser=browser_context,
-                            page_extraction_llm=page_extraction_llm,
-                            sensitive_data=sensitive_data,
-                            available_file_paths=available_file_paths,
-                            context=context,
-                        )
-
-                    if isinstance(result, str):
-                        return ActionResult(extracted_content=result)
-                    elif isinstance(result, ActionResult):
-                        return result
-                    elif result is None:
-                        return ActionResult()
-                    else:
-                        raise ValueError(f'Invalid action result type: {type(result)} of {result}')
+            if spec is not None and spec.timeout:
+                result = await asyncio.wait_for(call, spec.timeout)
+            else:
+                result = await call
+        except asyncio.TimeoutError:
+            failed = True
+            msg = f"Action {action_name} timed out after {spec.timeout:g}s"
+            logger.warning(msg)
+            return ActionResult(error=msg)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            # 每次调用都记录耗时，失败的调用另外记一份
+            elapsed = time.perf_counter() - started
+            observe(f"controller.action.{action_name}", elapsed)
+            if failed:
+                observe(f"controller.action_error.{action_name}", elapsed)
+            if spec is not None and spec.kind == KIND_MCP and spec.side_effects and not spec.cacheable:
+                # 有副作用的调用（失败或超时也可能已部分生效）之后，同一服务器缓存的读取结果可能已过期
+                get_mcp_result_cache().invalidate(f"mcp.{spec.server}.")
+
+        if isinstance(result, str):
+            return ActionResult(extracted_content=result)
+        elif isinstance(result, ActionResult):
+            return result
+        elif result is None:
             return ActionResult()
-        except Exception as e:
-            raise e
+        else:
+            raise ValueError(f'Invalid action result type: {type(result)} of {result}')
+
+    def get_action_spec(self, action_name: str) -> Optional[ActionSpec]:
+        """The dispatch entry of an action; actions registered on the registry later are added on first use."""
+        spec = self.dispatch_table.get(action_name)
+        if spec is None:
+            registered = self.registry.registry.actions.get(action_name)
+            if registered is None:
+                return None
+            spec = builtin_action_spec(action_name, registered.function)
+            self.dispatch_table.register(spec)
+        return spec
+
+    def is_parallel_safe(self, action: ActionModel) -> bool:
+        """Whether the action can run concurrently with other parallel-safe actions of the same step."""
+        names = [name for name in action.model_fields_set if getattr(action, name) is not None]
+        return bool(names) and all(
+            (spec := self.get_action_spec(name)) is not None and spec.parallel_safe for name in names
+        )
+
+    @staticmethod
+    def get_action_timings() -> Dict[str, Dict]:
+        """Per-action latency histograms of all dispatches (controller.action.*) and failed ones (controller.action_error.*)."""
+        return get_all_histograms("controller.action")
 
     async def setup_mcp_client(self, mcp_server_config: Optional[Dict[str, Any]] = None):
         self.mcp_server_config = mcp_server_config
         if self.mcp_server_config:
             self.mcp_client = await setup_mcp_client_and_tools(self.mcp_server_config)
             self.register_mcp_tools()
+            if self.mcp_client:
+                # 服务器重连后工具绑定到新会话，需要重新注册
+                self.mcp_client.add_reconnect_listener(lambda server_name: self.register_mcp_tools())
 
     def register_mcp_tools(self):
         """
         Register the MCP tools used by this controller.
         """
         if self.mcp_client:
+            servers = self.mcp_server_config or {}
+            servers = servers.get("mcpServers", servers)
             for server_name in self.mcp_client.server_name_to_tools:
+                # MCP tools run concurrently with each other only when the server's config marks them
+                # side-effect-free ("side_effects": false) or sets "parallel_safe": true; by default a
+                # step's calls run in order (e.g. write_file then read_file).
+                # "tool_timeout" (seconds per call) can be set per server as well. Results are
+                # cached only for tools the config opts in with "cacheable": true (all tools of the
+                # server) or a list of tool names, for "cache_ttl" seconds.
+                server_config = servers.get(server_name) or {}
+                timeout = server_config.get("tool_timeout", self.mcp_tool_timeout)
+                cacheable = server_config.get("cacheable", False)
+                side_effects = server_config.get("side_effects", True)
                 for tool in self.mcp_client.server_name_to_tools[server_name]:
                     tool_name = f"mcp.{server_name}.{tool.name}"
                     self.registry.registry.actions[tool_name] = RegisteredAction(
@@ -201,6 +342,17 @@ class CustomController(Controller):
                         function=tool,
                         param_model=create_tool_param_model(tool),
                     )
+                    self.dispatch_table.register(ActionSpec(
+                        tool_name,
+                        KIND_MCP,
+                        tool,
+                        timeout=float(timeout) if timeout else None,
+                        side_effects=side_effects,
+                        parallel_safe=server_config.get("parallel_safe", not side_effects),
+                        cacheable=tool.name in cacheable if isinstance(cacheable, list) else bool(cacheable),
+                        cache_ttl=server_config.get("cache_ttl"),
+                        server=server_name,
+                    ))
                     logger.info(f"Add mcp tool: {tool_name}")
                 logger.debug(
                     f"Registered {len(self.mcp_client.server_name_to_tools[server_name])} mcp tools for {server_name}")
@@ -208,5 +360,7 @@ class CustomController(Controller):
             logger.warning(f"MCP client not started.")
 
     async def close_mcp_client(self):
+        """Releases this controller's MCP connections; the shared servers stay up for other users."""
         if self.mcp_client:
-            await self.mcp_client.__aexit__(None, None, None)
+            await self.mcp_client.release()
+            self.mcp_client = None
@@ -0,0 +1,161 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def hash_arguments(params: Any) -> str:
+    """Stable digest of tool arguments: key order and whitespace do not matter."""
+    canonical = json.dumps(params, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+
+class McpResultCache:
+    """
+    Results of idempotent MCP tool calls keyed by (tool name, argument hash), so an agent that
+    repeats the same read-only call (the same file read, the same search) across steps gets the
+    earlier result back instead of another round trip to the server.
+
+    Only tools marked cacheable in their server's config go through the cache. Entries expire
+    after their ttl, the cache holds at most max_entries (least recently used are evicted) and
+    results longer than max_result_chars are returned but not stored. Errors are never cached.
+    The controller drops a server's entries after one of its side-effecting tools is called.
+    Concurrent calls with the same key share one invocation; if the caller that made it is
+    cancelled, the others retry instead of being cancelled with it.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 300, max_result_chars: int = 50000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_result_chars = max_result_chars
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self.stats = {"hits": 0, "misses": 0, "shared": 0, "evictions": 0, "expired": 0, "oversized": 0}
+        self.tool_stats: Dict[str, Dict[str, int]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _count(self, tool_name: str, event: str):
+        self.stats[event] += 1
+        counters = self.tool_stats.setdefault(tool_name, {"hits": 0, "misses": 0})
+        if event in counters:
+            counters[event] += 1
+
+    def _lookup(self, key: Tuple[str, str]) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                self.stats["expired"] += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _remember(self, key: Tuple[str, str], value: Any, ttl: float):
+        if len(str(value)) > self.max_result_chars:
+            self.stats["oversized"] += 1
+            return
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    async def get_or_call(
+            self,
+            tool_name: str,
+            params: Any,
+            call: Callable[[], Awaitable[Any]],
+            ttl: Optional[float] = None,
+    ) -> Any:
+        """Returns the cached result of tool_name(params) or awaits call() and caches its result for ttl seconds."""
+        if not self.enabled:
+            return await call()
+        key = (tool_name, hash_arguments(params))
+        while True:
+            cached = self._lookup(key)
+            if cached is not None:
+                self._count(tool_name, "hits")
+                logger.debug(f"MCP result cache hit: {tool_name}")
+                return cached
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            self.stats["shared"] += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # The caller that made the shared call was cancelled (e.g. its own timeout), not
+                # this one: call again, as the new leader if nobody else did yet
+                current = asyncio.current_task()
+                if not inflight.cancelled() or (current is not None and current.cancelling()):
+                    raise
+
+        self._count(tool_name, "misses")
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await call()
+            if value is not None:
+                self._remember(key, value, self.ttl if ttl is None else ttl)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved when nobody else is waiting
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def invalidate(self, tool_prefix: str = ""):
+        """Drops the entries of tools whose name starts with tool_prefix (all entries by default)."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0].startswith(tool_prefix)]:
+                del self._entries[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        with self._lock:
+            size = len(self._entries)
+        return {
+            **self.stats,
+            "entries": size,
+            "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+            "tools": {name: dict(counters) for name, counters in self.tool_stats.items()},
+        }
+
+
+_shared_cache: Optional[McpResultCache] = None
+
+
+def get_mcp_result_cache() -> McpResultCache:
+    """
+    Returns the process-wide MCP result cache. Configured by MCP_CACHE_SIZE (0 disables it),
+    MCP_CACHE_TTL (default for servers without "cache_ttl") and MCP_CACHE_MAX_RESULT_CHARS.
+    """
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = McpResultCache(
+            max_entries=int(os.getenv("MCP_CACHE_SIZE", "256")),
+            ttl=float(os.getenv("MCP_CACHE_TTL", "300")),
+            max_result_chars=int(os.getenv("MCP_CACHE_MAX_RESULT_CHARS", "50000")),
+        )
+    return _shared_cache
@@ -1,25 +1,47 @@
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from browser_use.controller.service import Controller
 from browser_use.browser.context import BrowserContext
 from browser_use.agent.views import ActionResult
 from browser_use.controller.views import SearchGoogleAction
 
+from src.controller.serp_cache import DEFAULT_LOCALE, get_serp_cache
+from src.controller.serp_engines import (
+    SERP_ENGINES,
+    format_serp_results,
+    get_engine_limit,
+    search_in_page,
+)
+from src.controller.serp_fetcher import get_serp_fetcher
+
 logger = logging.getLogger(__name__)
 
 
 class SearchController(Controller):
     """自定义搜索控制器，支持多种搜索引擎"""
     
-    def __init__(self, search_engine: str = "baidu", **kwargs):
+    def __init__(self, search_engine: str = "baidu", fetch_mode: str = "browser",
+                 fanout_engines: Optional[List[str]] = None, result_limit: Optional[int] = None,
+                 locale: str = DEFAULT_LOCALE, **kwargs):
         """
         初始化搜索控制器
         
         Args:
             search_engine: 搜索引擎类型，支持 "baidu", "bing", "sogou", "360", "google"
+                           以及 SERP_ENGINES_FILE 中额外注册的引擎
+            fetch_mode: "browser" 在浏览器页面中打开结果页；"http" 通过 HTTP 连接池直接抓取并解析结果页，
+                        解析不到结果时回退到浏览器
+            fanout_engines: http 模式下并发查询的搜索引擎列表，结果按规范化 URL 去重合并；默认只查 search_engine
+            result_limit: 返回的结果数量，超过一页时自动翻页；默认使用引擎注册表中的配置
+            locale: 搜索结果缓存键中的语言区域
         """
         super().__init__(**kwargs)
         self.search_engine = search_engine.lower()
+        self.fetch_mode = fetch_mode.lower()
+        self.fanout_engines = [e.lower() for e in fanout_engines if e.lower() in SERP_ENGINES] \
+            if fanout_engines else [self.search_engine]
+        self.result_limit = result_limit
+        self.locale = locale
         self._register_search_actions()
     
     def _register_search_actions(self):
@@ -31,274 +53,49 @@ class SearchController(Controller):
         async def search_web(query: str, browser: BrowserContext):
             """使用配置的搜索引擎进行搜索"""
             try:
-                # 根据配置的搜索引擎选择搜索URL
-                search_url = self._get_search_url(query)
-                
-                # 导航到搜索页面
-                page = await browser.new_page()
-                await page.goto(search_url)
-                
-                # 等待页面加载
-                await page.wait_for_load_state("networkidle")
-                
-                # 提取搜索结果
-                results = await self._extract_search_results(page)
-                
-                await page.close()
-                
+                # 相同的 (搜索引擎, 规范化查询, 语言) 直接命中缓存，不再打开页面
+                results = await get_serp_cache().get_or_fetch(
+                    self._cache_engine_key(),
+                    query,
+                    lambda: self._fetch_results(query, browser),
+                    locale=self.locale,
+                    # 过期条目在后台通过 HTTP 刷新，避免在 agent 的浏览器里打开页面
+                    revalidate=lambda: self._revalidate_results(query),
+                )
                 return ActionResult(
-                    extracted_content=f"Search results for '{query}':\n{results}",
+                    extracted_content=f"Search results for '{query}':\n{results or 'No results found.'}",
                     include_in_memory=True
                 )
                 
             except Exception as e:
                 logger.error(f"Search failed: {e}")
                 return ActionResult(error=f"Search failed: {str(e)}")
-    
-    def _get_search_url(self, query: str) -> str:
-        """根据搜索引擎类型返回搜索URL"""
-        encoded_query = query.replace(" ", "+")
-        
-        if self.search_engine == "baidu":
-            return f"https://www.baidu.com/s?wd={encoded_query}"
-        elif self.search_engine == "bing":
-            return f"https://cn.bing.com/search?q={encoded_query}"
-        elif self.search_engine == "sogou":
-            return f"https://www.sogou.com/web?query={encoded_query}"
-        elif self.search_engine == "360":
-            return f"https://www.so.com/s?q={encoded_query}"
-        elif self.search_engine == "google":
-            return f"https://www.google.com/search?q={encoded_query}"
-        else:
-            # 默认使用百度
-            return f"https://www.baidu.com/s?wd={encoded_query}"
-    
-    async def _extract_search_results(self, page) -> str:
-        """提取搜索结果"""
-        try:
-            # 根据不同的搜索引擎提取结果
-            if self.search_engine == "baidu":
-                return await self._extract_baidu_results(page)
-            elif self.search_engine == "bing":
-                return await self._extract_bing_results(page)
-            elif self.search_engine == "sogou":
-                return await self._extract_sogou_results(page)
-            elif self.search_engine == "360":
-                return await self._extract_360_results(page)
-            elif self.search_engine == "google":
-                return await self._extract_google_results(page)
-            else:
-                return await self._extract_baidu_results(page)
-        except Exception as e:
-            logger.error(f"Failed to extract search results: {e}")
-            return f"Failed to extract search results: {str(e)}"
-    
-    async def _extract_baidu_results(self, page) -> str:
-        """提取百度搜索结果"""
-        try:
-            # 等待搜索结果加载
-            await page.wait_for_selector(".result", timeout=10000)
-            
-            # 提取搜索结果
-            results = await page.evaluate("""
-                () => {
-                    const results = [];
-                    const elements = document.querySelectorAll('.result');
-                    elements.forEach((el, index) => {
-                        if (index < 5) { // 只取前5个结果
-                            const titleEl = el.querySelector('h3');
-                            const contentEl = el.querySelector('.content-right_8Zs40');
-                            const linkEl = el.querySelector('a');
-                            
-                            if (titleEl && contentEl && linkEl) {
-                                results.push({
-                                    title: titleEl.textContent.trim(),
-                                    content: contentEl.textContent.trim(),
-                                    url: linkEl.href
-                                });
-                            }
-                        }
-                    });
-                    return results;
-                }
-            """)
-            
-            # 格式化结果
-            formatted_results = []
-            for i, result in enumerate(results, 1):
-                formatted_results.append(
-                    f"{i}. {result['title']}\n"
-                    f"   {result['content'][:200]}...\n"
-                    f"   URL: {result['url']}\n"
-                )
-            
-            return "\n".join(formatted_results)
-            
-        except Exception as e:
-            logger.error(f"Failed to extract Baidu results: {e}")
-            return f"Failed to extract Baidu results: {str(e)}"
-    
-    async def _extract_bing_results(self, page) -> str:
-        """提取必应搜索结果"""
-        try:
-            await page.wait_for_selector(".b_algo", timeout=10000)
-            
-            results = await page.evaluate("""
-                () => {
-                    const results = [];
-                    const elements = document.querySelectorAll('.b_algo');
-                    elements.forEach((el, index) => {
-                        if (index < 5) {
-                            const titleEl = el.querySelector('h2 a');
-                            const contentEl = el.querySelector('.b_caption p');
-                            
-                            if (titleEl && contentEl) {
-                                results.push({
-                                    title: titleEl.textContent.trim(),
-                                    content: contentEl.textContent.trim(),
-                                    url: titleEl.href
-                                });
-                            }
-                        }
-                    });
-                    return results;
-                }
-            """)
-            
-            formatted_results = []
-            for i, result in enumerate(results, 1):
-                formatted_results.append(
-                    f"{i}. {result['title']}\n"
-                    f"   {result['content'][:200]}...\n"
-                    f"   URL: {result['url']}\n"
-                )
-            
-            return "\n".join(formatted_results)
-            
-        except Exception as e:
-            logger.error(f"Failed to extract Bing results: {e}")
-            return f"Failed to extract Bing results: {str(e)}"
-    
-    async def _extract_sogou_results(self, page) -> str:
-        """提取搜狗搜索结果"""
-        try:
-            await page.wait_for_selector(".vrwrap", timeout=10000)
-            
-            results = await page.evaluate("""
-                () => {
-                    const results = [];
-                    const elements = document.querySelectorAll('.vrwrap');
-                    elements.forEach((el, index) => {
-                        if (index < 5) {
-                            const titleEl = el.querySelector('h3 a');
-                            const contentEl = el.querySelector('.text');
-                            
-                            if (titleEl && contentEl) {
-                                results.push({
-                                    title: titleEl.textContent.trim(),
-                                    content: contentEl.textContent.trim(),
-                                    url: titleEl.href
-                                });
-                            }
-                        }
-                    });
-                    return results;
-                }
-            """)
-            
-            formatted_results = []
-            for i, result in enumerate(results, 1):
-                formatted_results.append(
-                    f"{i}. {result['title']}\n"
-                    f"   {result['content'][:200]}...\n"
-                    f"   URL: {result['url']}\n"
-                )
-            
-            return "\n".join(formatted_results)
-            
-        except Exception as e:
-            logger.error(f"Failed to extract Sogou results: {e}")
-            return f"Failed to extract Sogou results: {str(e)}"
-    
-    async def _extract_360_results(self, page) -> str:
-        """提取360搜索结果"""
-        try:
-            await page.wait_for_selector(".res-list", timeout=10000)
-            
-            results = await page.evaluate("""
-                () => {
-                    const results = [];
-                    const elements = document.querySelectorAll('.res-list');
-                    elements.forEach((el, index) => {
-                        if (index < 5) {
-                            const titleEl = el.querySelector('h3 a');
-                            const contentEl = el.querySelector('.res-desc');
-                            
-                            if (titleEl && contentEl) {
-                                results.push({
-                                    title: titleEl.textContent.trim(),
-                                    content: contentEl.textContent.trim(),
-                                    url: titleEl.href
-                                });
-                            }
-                        }
-                    });
-                    return results;
-                }
-            """)
-            
-            formatted_results = []
-            for i, result in enumerate(results, 1):
-                formatted_results.append(
-                    f"{i}. {result['title']}\n"
-                    f"   {result['content'][:200]}...\n"
-                    f"   URL: {result['url']}\n"
-                )
-            
-            return "\n".join(formatted_results)
-            
-        except Exception as e:
-            logger.error(f"Failed to extract 360 results: {e}")
-            return f"Failed to extract 360 results: {str(e)}"
-    
-    async def _extract_google_results(self, page) -> str:
-        """提取Google搜索结果"""
+
+    def _cache_engine_key(self) -> str:
+        """缓存键中的搜索引擎部分：http 多引擎并发时为合并后的引擎组合"""
+        engines = "+".join(sorted(self.fanout_engines)) if self.fetch_mode == "http" else self.search_engine
+        return f"{engines}#{self._result_limit()}"
+
+    async def _revalidate_results(self, query: str) -> str:
+        results = await get_serp_fetcher().search_many(query, self.fanout_engines, self._result_limit())
+        return format_serp_results(results)
+
+    async def _fetch_results(self, query: str, browser: BrowserContext) -> str:
+        """实际执行搜索并返回格式化的结果（未命中缓存时调用）"""
+        if self.fetch_mode == "http":
+            results = await get_serp_fetcher().search_many(query, self.fanout_engines, self._result_limit())
+            if results:
+                return format_serp_results(results)
+            logger.info(f"HTTP search returned no results for '{query}', falling back to browser.")
+
+        # 在新标签页中打开结果页（结果不足时翻页），由注册表中的选择器统一提取
+        page = await browser.new_page()
         try:
-            await page.wait_for_selector(".g", timeout=10000)
-            
-            results = await page.evaluate("""
-                () => {
-                    const results = [];
-                    const elements = document.querySelectorAll('.g');
-                    elements.forEach((el, index) => {
-                        if (index < 5) {
-                            const titleEl = el.querySelector('h3');
-                            const contentEl = el.querySelector('.VwiC3b');
-                            const linkEl = el.querySelector('a');
-                            
-                            if (titleEl && contentEl && linkEl) {
-                                results.push({
-                                    title: titleEl.textContent.trim(),
-                                    content: contentEl.textContent.trim(),
-                                    url: linkEl.href
-                                });
-                            }
-                        }
-                    });
-                    return results;
-                }
-            """)
-            
-            formatted_results = []
-            for i, result in enumerate(results, 1):
-                formatted_results.append(
-                    f"{i}. {result['title']}\n"
-                    f"   {result['content'][:200]}...\n"
-                    f"   URL: {result['url']}\n"
-                )
-            
-            return "\n".join(formatted_results)
-            
-        except Exception as e:
-            logger.error(f"Failed to extract Google results: {e}")
-            return f"Failed to extract Google results: {str(e)}" 
\ No newline at end of file
+            results = await search_in_page(page, self.search_engine, query, self._result_limit())
+        finally:
+            await page.close()
+
+        return format_serp_results(results)
+
+    def _result_limit(self) -> int:
+        return get_engine_limit(self.search_engine, self.result_limit)
@@ -0,0 +1,230 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOCALE = "zh-CN"
+
+
+def normalize_query(query: str) -> str:
+    """Folds case, full-width characters and whitespace so trivially different queries share an entry."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", query)).strip().casefold()
+
+
+class SerpCache:
+    """
+    Search result cache keyed by (engine, normalised query, locale).
+
+    Entries live in an in-memory LRU and, if disk_dir is set, in one JSON file per key so
+    they survive restarts. An entry is fresh for ttl seconds; for a further
+    stale_while_revalidate seconds it is still served, while a single background refresh
+    replaces it. Concurrent misses for the same key share one fetch; if the caller running it is
+    cancelled, the others fetch again instead of being cancelled too.
+    """
+
+    def __init__(
+            self,
+            max_entries: int = 512,
+            ttl: float = 3600,
+            stale_while_revalidate: float = 86400,
+            disk_dir: Optional[str] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_while_revalidate = stale_while_revalidate
+        self.disk_dir = disk_dir
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[Tuple[str, str, str], asyncio.Future] = {}
+        self._refreshing = set()
+        self._background_tasks = set()  # Strong references, so pending refreshes are not garbage-collected
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "disk_hits": 0, "revalidations": 0, "evictions": 0}
+
+    @staticmethod
+    def make_key(engine: str, query: str, locale: str = DEFAULT_LOCALE) -> Tuple[str, str, str]:
+        return engine.lower(), normalize_query(query), locale
+
+    def _disk_path(self, key: Tuple[str, str, str]) -> str:
+        digest = hashlib.sha1("\x1f".join(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.disk_dir, f"{digest}.json")
+
+    def _load_from_disk(self, key) -> Optional[Tuple[float, Any]]:
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                stored = json.load(f)
+            return stored["stored_at"], stored["value"]
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable SERP cache file for {key}: {e}")
+            return None
+
+    def _save_to_disk(self, key, stored_at: float, value: Any):
+        if not self.disk_dir:
+            return
+        try:
+            with open(self._disk_path(key), "w", encoding="utf-8") as f:
+                json.dump({"key": list(key), "stored_at": stored_at, "value": value}, f, ensure_ascii=False)
+        except Exception as e:
+            logger.warning(f"Failed to persist SERP cache entry {key}: {e}")
+
+    def _lookup(self, key) -> Optional[Tuple[float, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        entry = self._load_from_disk(key)
+        if entry is not None:
+            self.stats["disk_hits"] += 1
+            self._remember(key, *entry)
+        return entry
+
+    def _remember(self, key, stored_at: float, value: Any):
+        with self._lock:
+            self._entries[key] = (stored_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def get(self, engine: str, query: str, locale: str = DEFAULT_LOCALE, allow_stale: bool = True) -> Optional[Any]:
+        """Returns the cached value if it is fresh (or stale but revalidatable, with allow_stale)."""
+        entry = self._lookup(self.make_key(engine, query, locale))
+        if entry is None:
+            return None
+        age = time.time() - entry[0]
+        if age <= self.ttl or (allow_stale and age <= self.ttl + self.stale_while_revalidate):
+            return entry[1]
+        return None
+
+    def set(self, engine: str, query: str, value: Any, locale: str = DEFAULT_LOCALE):
+        key = self.make_key(engine, query, locale)
+        stored_at = time.time()
+        self._remember(key, stored_at, value)
+        self._save_to_disk(key, stored_at, value)
+
+    async def get_or_fetch(
+            self,
+            engine: str,
+            query: str,
+            fetch: Callable[[], Awaitable[Any]],
+            locale: str = DEFAULT_LOCALE,
+            revalidate: Optional[Callable[[], Awaitable[Any]]] = None,
+    ) -> Any:
+        """
+        Returns a cached value or calls fetch() to produce one. Empty results are returned but
+        not cached, so a blocked or failed search is retried next time. revalidate, if given,
+        replaces fetch for background refreshes of stale entries (e.g. when fetch has side
+        effects such as navigating the agent's page).
+        """
+        key = self.make_key(engine, query, locale)
+        entry = self._lookup(key)
+        if entry is not None:
+            age = time.time() - entry[0]
+            if age <= self.ttl:
+                self.stats["hits"] += 1
+                return entry[1]
+            if age <= self.ttl + self.stale_while_revalidate:
+                self.stats["stale_hits"] += 1
+                self._schedule_revalidation(key, revalidate or fetch)
+                return entry[1]
+
+        self.stats["misses"] += 1
+        return await self._fetch_once(key, fetch)
+
+    async def _fetch_once(self, key, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        while True:
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # Only the caller that started the fetch was cancelled: fetch again ourselves
+                current = asyncio.current_task()
+                if not inflight.cancelled() or (current is not None and current.cancelling()):
+                    raise
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await fetch()
+            if value:
+                stored_at = time.time()
+                self._remember(key, stored_at, value)
+                self._save_to_disk(key, stored_at, value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved when nobody else is waiting
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def _schedule_revalidation(self, key, fetch: Callable[[], Awaitable[Any]]):
+        if key in self._refreshing or key in self._inflight:
+            return
+        self._refreshing.add(key)
+        self.stats["revalidations"] += 1
+
+        async def refresh():
+            try:
+                await self._fetch_once(key, fetch)
+            except Exception as e:
+                logger.warning(f"Background SERP revalidation failed for {key}: {e}")
+            finally:
+                self._refreshing.discard(key)
+
+        task = asyncio.ensure_future(refresh())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["stale_hits"] + self.stats["misses"]
+        with self._lock:
+            size = len(self._entries)
+        return {
+            **self.stats,
+            "entries": size,
+            "hit_rate": round((self.stats["hits"] + self.stats["stale_hits"]) / lookups, 3) if lookups else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_shared_cache: Optional[SerpCache] = None
+
+
+def get_serp_cache() -> SerpCache:
+    """
+    Returns the process-wide SERP cache. Configured by SERP_CACHE_TTL, SERP_CACHE_SWR,
+    SERP_CACHE_SIZE and SERP_CACHE_DIR (unset keeps the cache in memory only).
+    """
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = SerpCache(
+            max_entries=int(os.getenv("SERP_CACHE_SIZE", "512")),
+            ttl=float(os.getenv("SERP_CACHE_TTL", "3600")),
+            stale_while_revalidate=float(os.getenv("SERP_CACHE_SWR", "86400")),
+            disk_dir=os.getenv("SERP_CACHE_DIR") or None,
+        )
+    return _shared_cache
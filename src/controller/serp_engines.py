@@ -0,0 +1,306 @@
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote_plus, urljoin, urlsplit
+
+from bs4 import BeautifulSoup
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+from src.utils.metrics import get_all_histograms, observe
+
+logger = logging.getLogger(__name__)
+
+# 搜索引擎注册表：每个引擎只是一份数据，新增引擎或修正选择器不需要改代码。
+# 选择器字段均为列表，按顺序回退；url 模板可用 {query}、{page}（从 1 开始）、{offset}（从 0 开始的结果偏移）、{first}（offset + 1）。
+# 可选字段：no_results（"无结果"页面的标记，出现时同样视为页面就绪）、ready_timeout（等待结果出现的总时限，秒）、
+# real_url_attrs（链接或结果容器上保存真实地址的属性，用来绕过 /link?url= 这类跳转链接）。
+DEFAULT_SERP_ENGINES: Dict[str, Dict[str, Any]] = {
+    "baidu": {
+        "url": "https://www.baidu.com/s?wd={query}&pn={offset}",
+        "per_page": 10,
+        "container": ["div.result", "div.result-op"],
+        "title": ["h3"],
+        "link": ["h3 a", "a[href]"],
+        "snippet": ["[class*='content-right']", ".c-abstract", ".c-span-last"],
+        "no_results": ["div.nors"],
+        "real_url_attrs": ["mu", "data-url"],
+    },
+    "bing": {
+        "url": "https://cn.bing.com/search?q={query}&first={first}",
+        "per_page": 10,
+        "container": ["li.b_algo"],
+        "title": ["h2 a", "h2"],
+        "link": ["h2 a"],
+        "snippet": [".b_caption p", "p.b_lineclamp2", ".b_caption"],
+        "no_results": ["li.b_no"],
+    },
+    "sogou": {
+        "url": "https://www.sogou.com/web?query={query}&page={page}",
+        "per_page": 10,
+        "container": ["div.vrwrap", "div.rb"],
+        "title": ["h3 a", "h3"],
+        "link": ["h3 a"],
+        "snippet": [".text", ".str-text", ".space-txt", ".str_info"],
+        "real_url_attrs": ["data-url"],
+    },
+    "360": {
+        "url": "https://www.so.com/s?q={query}&pn={page}",
+        "per_page": 10,
+        "container": ["li.res-list"],
+        "title": ["h3 a", "h3"],
+        "link": ["h3 a"],
+        "snippet": [".res-desc", ".res-rich", ".res-comm-con"],
+        "real_url_attrs": ["data-mdurl", "data-url"],
+    },
+    "google": {
+        "url": "https://www.google.com/search?q={query}&start={offset}&hl=en",
+        "per_page": 10,
+        "container": ["div.g", "div.Gx5Zad"],
+        "title": ["h3"],
+        "link": ["a[href]"],
+        "snippet": [".VwiC3b", ".BNeawe.s3v9rd", ".IsZvec"],
+    },
+}
+
+DEFAULT_ENGINE = "baidu"
+# 与原先各引擎的提取脚本一致，只取前5个结果
+DEFAULT_RESULT_LIMIT = 5
+MAX_PAGES = 5
+# 等待结果容器出现的默认总时限；超时后再给页面一小段时间完成 DOMContentLoaded，然后按现状提取
+DEFAULT_READY_TIMEOUT = 8.0
+FALLBACK_GRACE = 2.0
+
+
+def _load_engines() -> Dict[str, Dict[str, Any]]:
+    """Built-in engines, overridden/extended by the JSON file in SERP_ENGINES_FILE if set."""
+    engines = {name: dict(spec) for name, spec in DEFAULT_SERP_ENGINES.items()}
+    override_file = os.getenv("SERP_ENGINES_FILE")
+    if override_file:
+        try:
+            with open(override_file, "r", encoding="utf-8") as f:
+                for name, spec in json.load(f).items():
+                    engines[name.lower()] = {**engines.get(name.lower(), {}), **spec}
+            logger.info(f"Loaded SERP engine overrides from {override_file}")
+        except Exception as e:
+            logger.error(f"Failed to load SERP engine overrides from {override_file}: {e}")
+    return engines
+
+
+SERP_ENGINES = _load_engines()
+
+
+def get_engine_spec(engine: str) -> Dict[str, Any]:
+    return SERP_ENGINES.get(engine.lower(), SERP_ENGINES[DEFAULT_ENGINE])
+
+
+def get_serp_url(engine: str, query: str, page: int = 1) -> str:
+    spec = get_engine_spec(engine)
+    offset = (page - 1) * spec.get("per_page", 10)
+    return spec["url"].format(query=quote_plus(query), page=page, offset=offset, first=offset + 1)
+
+
+def pages_for_limit(engine: str, limit: int) -> int:
+    spec = get_engine_spec(engine)
+    per_page = spec.get("per_page", 10)
+    return max(1, min(spec.get("max_pages", MAX_PAGES), -(-limit // per_page)))
+
+
+# 所有引擎共用的提取脚本：在页面内等待结果容器出现，再一次性返回结构化结果（一次往返）
+SERP_EXTRACT_SCRIPT = """
+async ({spec, limit, timeoutMs}) => {
+    const deadline = Date.now() + timeoutMs;
+    const containerSelector = spec.container.join(', ');
+    let containers = document.querySelectorAll(containerSelector);
+    while (containers.length === 0 && Date.now() < deadline) {
+        await new Promise(resolve => setTimeout(resolve, 100));
+        containers = document.querySelectorAll(containerSelector);
+    }
+    const first = (root, selectors) => {
+        for (const selector of selectors) {
+            const el = root.querySelector(selector);
+            if (el) return el;
+        }
+        return null;
+    };
+    const realUrl = (linkEl, el) => {
+        for (const attr of spec.real_url_attrs || []) {
+            for (const node of [linkEl, el]) {
+                const value = node.getAttribute(attr);
+                if (value && /^https?:\/\//.test(value)) return value;
+            }
+        }
+        return linkEl.href;
+    };
+    const all = Array.from(containers);
+    const results = [];
+    for (const el of all) {
+        if (results.length >= limit) break;
+        if (all.some(other => other !== el && other.contains(el))) continue;  // nested match
+        const titleEl = first(el, spec.title);
+        const linkEl = first(el, spec.link);
+        if (!titleEl || !linkEl || !linkEl.href) continue;
+        const snippetEl = first(el, spec.snippet);
+        results.push({
+            title: titleEl.textContent.trim(),
+            url: realUrl(linkEl, el),
+            snippet: snippetEl ? snippetEl.textContent.trim() : '',
+        });
+    }
+    return results;
+}
+"""
+
+
+def _finalize_results(engine: str, raw_results: List[Dict[str, Any]], start_rank: int = 1) -> List[Dict[str, Any]]:
+    return [
+        {
+            "title": result["title"],
+            "url": result["url"],
+            "snippet": result["snippet"],
+            "site": urlsplit(result["url"]).netloc,
+            "engine": engine,
+            "rank": start_rank + i,
+        }
+        for i, result in enumerate(raw_results)
+    ]
+
+
+async def extract_serp_page(page, engine: str, limit: int = DEFAULT_RESULT_LIMIT, timeout: float = 10.0,
+                            start_rank: int = 1) -> List[Dict[str, Any]]:
+    """Extracts up to limit results from the result page already loaded in a Playwright page."""
+    raw_results = await page.evaluate(
+        SERP_EXTRACT_SCRIPT,
+        {"spec": get_engine_spec(engine), "limit": limit, "timeoutMs": int(timeout * 1000)},
+    )
+    return _finalize_results(engine, raw_results, start_rank)
+
+
+async def wait_for_serp_ready(page, engine: str, timeout: Optional[float] = None) -> str:
+    """
+    Waits until the engine's result containers (or its no-results marker) are in the DOM,
+    instead of waiting for load/networkidle, which ad-heavy result pages may never reach.
+
+    Returns "ready" when a marker appeared in time, "fallback" when none did but the document
+    finished parsing within a short grace period (results may still be extractable), and
+    "timeout" otherwise.
+    """
+    spec = get_engine_spec(engine)
+    timeout = timeout if timeout is not None else spec.get("ready_timeout", DEFAULT_READY_TIMEOUT)
+    selector = ", ".join(spec["container"] + spec.get("no_results", []))
+    try:
+        await page.wait_for_selector(selector, state="attached", timeout=max(timeout, 0.1) * 1000)
+        return "ready"
+    except PlaywrightTimeoutError:
+        pass
+    try:
+        await page.wait_for_load_state("domcontentloaded", timeout=FALLBACK_GRACE * 1000)
+        return "fallback"
+    except PlaywrightTimeoutError:
+        return "timeout"
+
+
+async def load_serp_page(page, engine: str, url: str, timeout: Optional[float] = None) -> str:
+    """
+    Navigates to a result page and waits for it to become ready, recording per-engine
+    timings: serp.<engine>.navigate (until the response started), serp.<engine>.<outcome>
+    (until ready, fallback or timeout, measured from the start of navigation).
+    """
+    spec = get_engine_spec(engine)
+    timeout = timeout if timeout is not None else spec.get("ready_timeout", DEFAULT_READY_TIMEOUT)
+    start = time.perf_counter()
+    # 只等到服务器开始返回响应，其余交给 wait_for_serp_ready
+    await page.goto(url, wait_until="commit", timeout=timeout * 1000)
+    observe(f"serp.{engine}.navigate", time.perf_counter() - start)
+    outcome = await wait_for_serp_ready(page, engine, timeout - (time.perf_counter() - start))
+    elapsed = time.perf_counter() - start
+    observe(f"serp.{engine}.{outcome}", elapsed)
+    if outcome != "ready":
+        logger.warning(f"{engine} result page not ready after {elapsed:.2f}s ({outcome}), extracting what loaded.")
+    return outcome
+
+
+async def search_in_page(page, engine: str, query: str, limit: int = DEFAULT_RESULT_LIMIT,
+                         timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Navigates the page through as many result pages as needed to collect limit results.
+    timeout is the readiness deadline of each result page (default: the engine's ready_timeout).
+    """
+    results: List[Dict[str, Any]] = []
+    for page_number in range(1, pages_for_limit(engine, limit) + 1):
+        await load_serp_page(page, engine, get_serp_url(engine, query, page_number), timeout)
+        start = time.perf_counter()
+        # 页面已就绪（或已放弃等待），提取脚本不再额外等待
+        page_results = await extract_serp_page(page, engine, limit - len(results), 0, len(results) + 1)
+        observe(f"serp.{engine}.extract", time.perf_counter() - start)
+        results.extend(page_results)
+        if not page_results or len(results) >= limit:
+            break
+    return results
+
+
+def parse_serp_html(engine: str, html: str, base_url: str, limit: int = DEFAULT_RESULT_LIMIT,
+                    start_rank: int = 1) -> List[Dict[str, Any]]:
+    """The same extraction as SERP_EXTRACT_SCRIPT, for HTML fetched without a browser."""
+    spec = get_engine_spec(engine)
+    soup = BeautifulSoup(html, "lxml")
+
+    def first(root, selectors: List[str]):
+        for selector in selectors:
+            el = root.select_one(selector)
+            if el is not None:
+                return el
+        return None
+
+    def real_url(link_el, el) -> str:
+        for attr in spec.get("real_url_attrs", []):
+            for node in (link_el, el):
+                value = node.get(attr)
+                if value and value.startswith(("http://", "https://")):
+                    return value
+        return urljoin(base_url, link_el["href"])
+
+    containers = soup.select(", ".join(spec["container"]))
+    matched = set(map(id, containers))
+    raw_results = []
+    for el in containers:
+        if len(raw_results) >= limit:
+            break
+        if any(id(parent) in matched for parent in el.parents):  # nested match
+            continue
+        title_el = first(el, spec["title"])
+        link_el = first(el, spec["link"])
+        if title_el is None or link_el is None or not link_el.get("href"):
+            continue
+        snippet_el = first(el, spec["snippet"])
+        raw_results.append({
+            "title": title_el.get_text(" ", strip=True),
+            "url": real_url(link_el, el),
+            "snippet": snippet_el.get_text(" ", strip=True) if snippet_el is not None else "",
+        })
+    return _finalize_results(engine, raw_results, start_rank)
+
+
+def format_serp_results(results: List[Dict[str, Any]]) -> str:
+    formatted_results = []
+    for i, result in enumerate(results, 1):
+        formatted_results.append(
+            f"{i}. {result['title']}\n"
+            f"   {result['snippet'][:200]}...\n"
+            f"   URL: {result['url']}\n"
+        )
+    return "\n".join(formatted_results)
+
+
+def list_engines() -> List[str]:
+    return list(SERP_ENGINES)
+
+
+def get_engine_limit(engine: str, limit: Optional[int]) -> int:
+    return limit or get_engine_spec(engine).get("result_limit", DEFAULT_RESULT_LIMIT)
+
+
+def get_serp_timings() -> Dict[str, Dict]:
+    """Per-engine latency histograms of browser (serp.*) and HTTP (serp_http.*) result page loads."""
+    return get_all_histograms("serp")
@@ -0,0 +1,205 @@
+import asyncio
+import base64
+import html
+import logging
+import re
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+
+from src.controller.serp_engines import DEFAULT_RESULT_LIMIT, get_serp_url, pages_for_limit, parse_serp_html
+from src.utils.metrics import observe
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
+}
+
+# Query parameters that only track the click and never change the page
+TRACKING_PARAMS = {"spm", "from", "ref", "ref_src", "fbclid", "gclid", "yclid", "msclkid", "si"}
+# Click redirects whose target is encrypted in the URL and only known after requesting it
+OPAQUE_REDIRECT_HOSTS = ("baidu.com", "sogou.com", "so.com")
+# Targets of redirect pages that answer 200 with a script or meta refresh (e.g. Sogou)
+REDIRECT_BODY_PATTERNS = (
+    re.compile(r"""location\.replace\(\s*["']([^"']+)["']"""),
+    re.compile(r"""(?:window\.)?location(?:\.href)?\s*=\s*["']([^"']+)["']"""),
+    re.compile(r"""<meta[^>]+http-equiv=["']?refresh["']?[^>]+url=['"]?([^'">]+)""", re.I),
+)
+
+
+def unwrap_redirect_url(url: str) -> str:
+    """Returns the target of well-known search-engine click redirects that encode it in the URL."""
+    parts = urlsplit(url)
+    params = dict(parse_qsl(parts.query))
+    if parts.netloc.endswith("google.com") and parts.path == "/url":
+        return params.get("q") or params.get("url") or url
+    if parts.netloc.endswith("so.com") and parts.path == "/link" and params.get("url", "").startswith("http"):
+        return params["url"]
+    if parts.netloc.endswith("bing.com") and parts.path.startswith("/ck/"):
+        encoded = params.get("u", "")
+        if encoded.startswith("a1"):
+            encoded = encoded[2:]
+            try:
+                return base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)).decode("utf-8")
+            except Exception:
+                return url
+    return url
+
+
+def is_opaque_redirect(url: str) -> bool:
+    """Whether url is a Baidu/Sogou/360 click redirect (/link?url=...) that has to be requested to be resolved."""
+    parts = urlsplit(url)
+    return parts.netloc.endswith(OPAQUE_REDIRECT_HOSTS) and parts.path.startswith("/link")
+
+
+def redirect_target_from_body(body: str) -> Optional[str]:
+    for pattern in REDIRECT_BODY_PATTERNS:
+        match = pattern.search(body)
+        if match and match.group(1).startswith(("http://", "https://")):
+            return html.unescape(match.group(1))
+    return None
+
+
+def canonicalize_url(url: str) -> str:
+    """Normalises a result URL so the same page found by different engines deduplicates."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    ))
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(("https" if parts.scheme in ("http", "https") else parts.scheme, host, path, query, ""))
+
+
+def merge_serp_results(result_lists: List[List[Dict[str, Any]]], limit: int = DEFAULT_RESULT_LIMIT) -> List[Dict[str, Any]]:
+    """
+    Interleaves per-engine results by rank and drops duplicates by canonical URL.
+    A result found by several engines keeps its best rank and lists all engines.
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    max_len = max((len(results) for results in result_lists), default=0)
+    for rank in range(max_len):
+        for results in result_lists:
+            if rank >= len(results):
+                continue
+            result = results[rank]
+            key = canonicalize_url(result["url"])
+            if key in merged:
+                merged[key]["engines"].append(result["engine"])
+                if not merged[key]["snippet"] and result["snippet"]:
+                    merged[key]["snippet"] = result["snippet"]
+            else:
+                merged[key] = {**result, "engines": [result["engine"]]}
+    return list(merged.values())[:limit]
+
+
+class SerpFetcher:
+    """Fetches and parses search result pages over a pooled async HTTP client, without a browser."""
+
+    def __init__(self, timeout: float = 8.0, max_connections: int = 20):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                headers=DEFAULT_HEADERS,
+                timeout=self.timeout,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+        return self._client
+
+    async def _fetch_page(self, query: str, engine: str, page: int, limit: int) -> List[Dict[str, Any]]:
+        start = time.perf_counter()
+        response = await self._get_client().get(get_serp_url(engine, query, page))
+        observe(f"serp_http.{engine}.fetch", time.perf_counter() - start)
+        response.raise_for_status()
+        # Parsing a full SERP is a few ms of CPU; keep it off the event loop
+        results = await asyncio.to_thread(parse_serp_html, engine, response.text, str(response.url), limit)
+        for result in results:
+            result["url"] = unwrap_redirect_url(result["url"])
+        opaque = [result for result in results if is_opaque_redirect(result["url"])]
+        if opaque:
+            # Without the real URL the same page found by another engine cannot be deduplicated
+            targets = await asyncio.gather(*(self.resolve_redirect(result["url"]) for result in opaque))
+            for result, target in zip(opaque, targets):
+                result["url"] = target
+                result["site"] = urlsplit(target).netloc
+        return [result for result in results if result["url"].startswith(("http://", "https://"))]
+
+    async def resolve_redirect(self, url: str) -> str:
+        """
+        The target of a click redirect: the Location of its 3xx response, or the URL its page
+        redirects to by script or meta refresh. Returns url unchanged if neither is found.
+        """
+        start = time.perf_counter()
+        try:
+            response = await self._get_client().get(url, follow_redirects=False)
+            if response.is_redirect and response.headers.get("location"):
+                target = str(response.url.join(response.headers["location"]))
+            else:
+                target = redirect_target_from_body(response.text[:20000]) or url
+        except Exception as e:
+            logger.debug(f"Could not resolve search redirect {url}: {e}")
+            target = url
+        observe("serp_http.resolve_redirect", time.perf_counter() - start)
+        return target
+
+    async def search(self, query: str, engine: str, limit: int = DEFAULT_RESULT_LIMIT) -> List[Dict[str, Any]]:
+        """
+        Searches one engine, fetching as many result pages as limit needs concurrently.
+        Returns an empty list when the engine fails or serves no parsable results.
+        """
+        start = time.monotonic()
+        pages = await asyncio.gather(
+            *(self._fetch_page(query, engine, page, limit) for page in range(1, pages_for_limit(engine, limit) + 1)),
+            return_exceptions=True,
+        )
+        results = []
+        for page_results in pages:
+            if isinstance(page_results, Exception):
+                logger.warning(f"HTTP search on {engine} failed for '{query}': {page_results}")
+                break  # Later pages without the earlier ones would leave gaps in the ranking
+            results.extend(page_results)
+        results = results[:limit]
+        for rank, result in enumerate(results, 1):
+            result["rank"] = rank
+        logger.info(
+            f"HTTP search on {engine} for '{query}': {len(results)} results in {time.monotonic() - start:.2f}s"
+        )
+        return results
+
+    async def search_many(self, query: str, engines: List[str], limit: int = DEFAULT_RESULT_LIMIT) -> List[Dict[str, Any]]:
+        """Queries several engines concurrently and merges their results, deduplicated by canonical URL."""
+        result_lists = await asyncio.gather(*(self.search(query, engine, limit) for engine in engines))
+        return merge_serp_results(list(result_lists), limit)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+_shared_fetcher: Optional[SerpFetcher] = None
+
+
+def get_serp_fetcher() -> SerpFetcher:
+    """Returns the process-wide fetcher, so all controllers share one connection pool."""
+    global _shared_fetcher
+    if _shared_fetcher is None:
+        _shared_fetcher = SerpFetcher()
+    return _shared_fetcher
@@ -1,4 +1,6 @@
+import hashlib
 import inspect
+import json
 import logging
 import uuid
 from datetime import date, datetime, time
@@ -7,43 +9,76 @@ from typing import Any, Dict, List, Optional, Set, Type, Union, get_type_hints
 
 from browser_use.controller.registry.views import ActionModel
 from langchain.tools import BaseTool
-from langchain_mcp_adapters.client import MultiServerMCPClient
 from pydantic import BaseModel, Field, create_model
 from pydantic.v1 import BaseModel, Field
 
+from src.utils.mcp_connections import McpClientLease, get_mcp_connection_manager
+
 logger = logging.getLogger(__name__)
 
+# Generated param models by schema hash, kept for the life of the process
+_PARAM_MODEL_CACHE: Dict[str, Type[BaseModel]] = {}
+_PARAM_MODEL_CACHE_STATS = {"hits": 0, "misses": 0}
+
 
-async def setup_mcp_client_and_tools(mcp_server_config: Dict[str, Any]) -> Optional[MultiServerMCPClient]:
+async def setup_mcp_client_and_tools(mcp_server_config: Dict[str, Any]) -> Optional[McpClientLease]:
     """
-    Initializes the MultiServerMCPClient, connects to servers, fetches tools,
-    filters them, and returns a flat list of usable tools and the client instance.
+    Acquires connections to the configured MCP servers from the process-wide connection pool,
+    so servers already started by another agent or an earlier run are reused.
 
     Returns:
-        A tuple containing:
-        - list[BaseTool]: The filtered list of usable LangChain tools.
-        - MultiServerMCPClient | None: The initialized and started client instance, or None on failure.
+        McpClientLease | None: Behaves like a started MultiServerMCPClient (server_name_to_tools,
+        get_tools()); call release() (or __aexit__) when done instead of closing it.
+        None if no configuration is given or no server could be connected.
     """
 
-    logger.info("Initializing MultiServerMCPClient...")
+    logger.info("Acquiring MCP server connections...")
 
     if not mcp_server_config:
         logger.error("No MCP server configuration provided.")
         return None
 
     try:
-        if "mcpServers" in mcp_server_config:
-            mcp_server_config = mcp_server_config["mcpServers"]
-        client = MultiServerMCPClient(mcp_server_config)
-        await client.__aenter__()
-        return client
+        return await get_mcp_connection_manager().acquire(mcp_server_config)
 
     except Exception as e:
         logger.error(f"Failed to setup MCP client or fetch tools: {e}", exc_info=True)
         return None
 
 
+def tool_schema_hash(tool: BaseTool) -> str:
+    """
+    Hash of everything the generated param model depends on: the tool name (used in the model
+    and enum names) and its JSON schema, or the tool class when the model comes from _run.
+    """
+    if tool.args_schema is not None:
+        source = {"name": tool.name, "schema": tool.args_schema}
+    else:
+        source = {"name": tool.name, "class": f"{type(tool).__module__}.{type(tool).__qualname__}"}
+    return hashlib.sha256(json.dumps(source, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
 def create_tool_param_model(tool: BaseTool) -> Type[BaseModel]:
+    """
+    Returns the Pydantic param model of a LangChain tool. Models (with their nested models and
+    enums) are generated once per schema hash, so registering the same server again or creating
+    another controller reuses them.
+    """
+    key = tool_schema_hash(tool)
+    param_model = _PARAM_MODEL_CACHE.get(key)
+    if param_model is not None:
+        _PARAM_MODEL_CACHE_STATS["hits"] += 1
+        return param_model
+    _PARAM_MODEL_CACHE_STATS["misses"] += 1
+    param_model = _PARAM_MODEL_CACHE[key] = build_tool_param_model(tool)
+    return param_model
+
+
+def get_param_model_cache_stats() -> Dict[str, int]:
+    return {**_PARAM_MODEL_CACHE_STATS, "models": len(_PARAM_MODEL_CACHE)}
+
+
+def build_tool_param_model(tool: BaseTool) -> Type[BaseModel]:
     """Creates a Pydantic model from a LangChain tool's schema"""
 
     # Get tool schema information
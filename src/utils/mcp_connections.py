@@ -0,0 +1,312 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain.tools import BaseTool
+from langchain_mcp_adapters.client import MultiServerMCPClient
+
+logger = logging.getLogger(__name__)
+
+# Keys of a server config that configure how tools are used, not how the server is reached
+TOOL_CONFIG_KEYS = frozenset({"parallel_safe", "side_effects", "cacheable", "cache_ttl", "tool_timeout"})
+
+
+def connection_key(server_name: str, server_config: Dict[str, Any]) -> Tuple[str, str]:
+    """Identifies a server connection: its name and a hash of how it is reached."""
+    connection = {key: value for key, value in server_config.items() if key not in TOOL_CONFIG_KEYS}
+    digest = hashlib.sha1(json.dumps(connection, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return server_name, digest
+
+
+class McpServerConnection:
+    """
+    One session to one MCP server, shared by every agent that uses the server.
+
+    The session is opened, health-checked and closed by a dedicated owner task: the transports
+    (e.g. the stdio subprocess) are entered through anyio task groups, which must be exited by
+    the task that entered them. The owner pings the server every health_interval seconds and
+    reconnects with backoff when the ping fails; reconnect listeners are then called with the
+    server name so users can pick up the new tools, which are bound to the new session.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            config: Dict[str, Any],
+            health_interval: float = 60,
+            ping_timeout: float = 10,
+            reconnect_attempts: int = 5,
+    ):
+        self.name = name
+        self.config = {key: value for key, value in config.items() if key not in TOOL_CONFIG_KEYS}
+        self.key = connection_key(name, config)
+        self.health_interval = health_interval
+        self.ping_timeout = ping_timeout
+        self.reconnect_attempts = reconnect_attempts
+        self.refcount = 0
+        self.client: Optional[MultiServerMCPClient] = None
+        self.tools: List[BaseTool] = []
+        self.reconnects = 0
+        self.listeners: List[Callable[[str], Any]] = []
+        self._owner: Optional[asyncio.Task] = None
+        self._closing = asyncio.Event()
+        self._idle_handle: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.client is not None and self._owner is not None and not self._owner.done()
+
+    async def open(self, timeout: float = 60):
+        """Starts the owner task and waits until the first session is ready (raises if it cannot connect)."""
+        ready = asyncio.get_running_loop().create_future()
+        self._owner = asyncio.ensure_future(self._own(ready))
+        try:
+            await asyncio.wait_for(asyncio.shield(ready), timeout)
+        except BaseException:
+            self._closing.set()
+            self._owner.cancel()
+            raise
+
+    async def _connect(self) -> MultiServerMCPClient:
+        client = MultiServerMCPClient({self.name: self.config})
+        await client.__aenter__()
+        return client
+
+    async def _ping(self) -> bool:
+        try:
+            await asyncio.wait_for(self.client.sessions[self.name].send_ping(), self.ping_timeout)
+            return True
+        except Exception as e:
+            logger.warning(f"MCP server {self.name} failed its health check: {e!r}")
+            return False
+
+    async def _own(self, ready: asyncio.Future):
+        attempt = 0
+        while not self._closing.is_set():
+            try:
+                client = await self._connect()
+            except Exception as e:
+                if not ready.done():
+                    ready.set_exception(e)
+                    return
+                attempt += 1
+                if attempt > self.reconnect_attempts:
+                    logger.error(f"Giving up on MCP server {self.name} after {attempt - 1} reconnect attempts: {e}")
+                    return
+                delay = min(2 ** (attempt - 1), 30)
+                logger.warning(f"Reconnecting to MCP server {self.name} failed ({e}), retrying in {delay}s")
+                try:
+                    await asyncio.wait_for(self._closing.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            attempt = 0
+            self.client = client
+            self.tools = client.server_name_to_tools.get(self.name, [])
+            if ready.done():
+                self.reconnects += 1
+                logger.info(f"Reconnected to MCP server {self.name} ({len(self.tools)} tools)")
+                for listener in list(self.listeners):
+                    try:
+                        listener(self.name)
+                    except Exception as e:
+                        logger.warning(f"MCP reconnect listener failed for {self.name}: {e}")
+            else:
+                ready.set_result(None)
+            try:
+                while not self._closing.is_set():
+                    try:
+                        await asyncio.wait_for(self._closing.wait(), self.health_interval or None)
+                    except asyncio.TimeoutError:
+                        if not await self._ping():
+                            break
+            finally:
+                self.client = None
+                try:
+                    await client.__aexit__(None, None, None)
+                except Exception as e:
+                    logger.debug(f"Error while closing MCP server {self.name}: {e}")
+
+    async def close(self, timeout: float = 10):
+        if self._idle_handle is not None:
+            self._idle_handle.cancel()
+            self._idle_handle = None
+        self._closing.set()
+        if self._owner is not None and not self._owner.done():
+            try:
+                await asyncio.wait_for(self._owner, timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                logger.warning(f"MCP server {self.name} did not shut down within {timeout}s")
+
+
+class McpClientLease:
+    """
+    A set of pooled server connections acquired together, usable where a MultiServerMCPClient
+    was: server_name_to_tools, get_tools() and async-with/__aexit__ (which releases the lease
+    instead of closing the servers).
+    """
+
+    def __init__(self, manager: "McpConnectionManager", connections: Dict[str, McpServerConnection]):
+        self.manager = manager
+        self.connections = connections
+        self._listeners: List[Callable[[str], Any]] = []
+        self.released = False
+
+    @property
+    def server_name_to_tools(self) -> Dict[str, List[BaseTool]]:
+        return {name: connection.tools for name, connection in self.connections.items()}
+
+    def get_tools(self) -> List[BaseTool]:
+        return [tool for connection in self.connections.values() for tool in connection.tools]
+
+    def add_reconnect_listener(self, listener: Callable[[str], Any]):
+        """listener(server_name) is called after a server of this lease reconnected with new tools."""
+        self._listeners.append(listener)
+        for connection in self.connections.values():
+            connection.listeners.append(listener)
+
+    async def release(self):
+        if self.released:
+            return
+        self.released = True
+        for connection in self.connections.values():
+            for listener in self._listeners:
+                if listener in connection.listeners:
+                    connection.listeners.remove(listener)
+        await self.manager.release(self)
+
+    async def __aenter__(self) -> "McpClientLease":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.release()
+
+
+class McpConnectionManager:
+    """
+    Process-wide pool of MCP server connections with reference counting. Acquiring a config
+    reuses the open connection of every server already connected with the same settings, so a
+    stdio server is spawned once rather than per controller or research run. A connection
+    nobody holds is closed after idle_timeout seconds (0 closes it on the last release).
+    """
+
+    def __init__(
+            self,
+            idle_timeout: float = 600,
+            health_interval: float = 60,
+            connect_timeout: float = 60,
+            reconnect_attempts: int = 5,
+    ):
+        self.idle_timeout = idle_timeout
+        self.health_interval = health_interval
+        self.connect_timeout = connect_timeout
+        self.reconnect_attempts = reconnect_attempts
+        self._connections: Dict[Tuple[str, str], McpServerConnection] = {}
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+        self.stats = {"acquired": 0, "reused": 0, "opened": 0, "closed": 0, "failed": 0}
+
+    async def _get_connection(self, server_name: str, server_config: Dict[str, Any]) -> McpServerConnection:
+        key = connection_key(server_name, server_config)
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            connection = self._connections.get(key)
+            if connection is not None and connection.alive:
+                self.stats["reused"] += 1
+            else:
+                if connection is not None:
+                    await connection.close()
+                connection = McpServerConnection(
+                    server_name,
+                    server_config,
+                    health_interval=self.health_interval,
+                    reconnect_attempts=self.reconnect_attempts,
+                )
+                await connection.open(timeout=self.connect_timeout)
+                self._connections[key] = connection
+                self.stats["opened"] += 1
+                logger.info(f"Connected to MCP server {server_name} ({len(connection.tools)} tools)")
+            if connection._idle_handle is not None:
+                connection._idle_handle.cancel()
+                connection._idle_handle = None
+            connection.refcount += 1
+            return connection
+
+    async def acquire(self, mcp_server_config: Dict[str, Any]) -> Optional[McpClientLease]:
+        """
+        Connections to every server of the config (a {"mcpServers": {...}} document or the
+        servers mapping itself). Servers that cannot be reached are logged and left out; returns
+        None when none could be connected.
+        """
+        servers = mcp_server_config.get("mcpServers", mcp_server_config)
+        connections = {}
+        for server_name, server_config in servers.items():
+            try:
+                connections[server_name] = await self._get_connection(server_name, server_config or {})
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.error(f"Failed to connect to MCP server {server_name}: {e}", exc_info=True)
+        if not connections:
+            return None
+        self.stats["acquired"] += 1
+        return McpClientLease(self, connections)
+
+    async def release(self, lease: McpClientLease):
+        for connection in lease.connections.values():
+            connection.refcount = max(connection.refcount - 1, 0)
+            if connection.refcount == 0:
+                if self.idle_timeout > 0:
+                    connection._idle_handle = asyncio.get_running_loop().call_later(
+                        self.idle_timeout, lambda conn=connection: asyncio.ensure_future(self._close_if_idle(conn))
+                    )
+                else:
+                    await self._close_if_idle(connection)
+
+    async def _close_if_idle(self, connection: McpServerConnection):
+        connection._idle_handle = None
+        async with self._locks.setdefault(connection.key, asyncio.Lock()):
+            if connection.refcount > 0:
+                return
+            if self._connections.get(connection.key) is connection:
+                del self._connections[connection.key]
+            await connection.close()
+            self.stats["closed"] += 1
+            logger.info(f"Closed idle MCP server {connection.name}")
+
+    async def close_all(self):
+        for connection in list(self._connections.values()):
+            await connection.close()
+            self.stats["closed"] += 1
+        self._connections.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "servers": {
+                connection.name: {"refcount": connection.refcount, "alive": connection.alive,
+                                  "reconnects": connection.reconnects, "tools": len(connection.tools)}
+                for connection in self._connections.values()
+            },
+        }
+
+
+_shared_manager: Optional[McpConnectionManager] = None
+
+
+def get_mcp_connection_manager() -> McpConnectionManager:
+    """
+    Returns the process-wide MCP connection manager. Configured by MCP_IDLE_TIMEOUT,
+    MCP_HEALTH_CHECK_INTERVAL (0 disables health checks), MCP_CONNECT_TIMEOUT and
+    MCP_RECONNECT_ATTEMPTS.
+    """
+    global _shared_manager
+    if _shared_manager is None:
+        _shared_manager = McpConnectionManager(
+            idle_timeout=float(os.getenv("MCP_IDLE_TIMEOUT", "600")),
+            health_interval=float(os.getenv("MCP_HEALTH_CHECK_INTERVAL", "60")),
+            connect_timeout=float(os.getenv("MCP_CONNECT_TIMEOUT", "60")),
+            reconnect_attempts=int(os.getenv("MCP_RECONNECT_ATTEMPTS", "5")),
+        )
+    return _shared_manager
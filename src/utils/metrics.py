@@ -0,0 +1,100 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional, Sequence
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+
+
+class LatencyHistogram:
+    """
+    Latency histogram with fixed cumulative-style buckets plus a window of recent samples
+    for percentiles. Cheap enough to record on every action; safe to use from threads.
+    """
+
+    def __init__(self, name: str, buckets: Sequence[float] = DEFAULT_BUCKETS, window: int = 1024):
+        self.name = name
+        self.buckets = tuple(sorted(buckets))
+        self._bucket_counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._bucket_counts[bisect_left(self.buckets, seconds)] += 1
+            self._recent.append(seconds)
+            self.count += 1
+            self.total += seconds
+            self.min = seconds if self.min is None else min(self.min, seconds)
+            self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._recent)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            bucket_counts = list(self._bucket_counts)
+            count, total, low, high = self.count, self.total, self.min, self.max
+        labels = [f"<={bound:g}s" for bound in self.buckets] + ["+Inf"]
+        return {
+            "count": count,
+            "mean": round(total / count, 4) if count else None,
+            "min": low,
+            "max": high,
+            "p50": self.percentile(0.5),
+            "p90": self.percentile(0.9),
+            "p99": self.percentile(0.99),
+            "buckets": dict(zip(labels, bucket_counts)),
+        }
+
+    def reset(self):
+        with self._lock:
+            self._bucket_counts = [0] * (len(self.buckets) + 1)
+            self._recent.clear()
+            self.count = 0
+            self.total = 0.0
+            self.min = None
+            self.max = None
+
+
+_HISTOGRAMS: Dict[str, LatencyHistogram] = {}
+_HISTOGRAMS_LOCK = threading.Lock()
+
+
+def get_histogram(name: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> LatencyHistogram:
+    """Returns the process-wide histogram with this name, creating it on first use."""
+    with _HISTOGRAMS_LOCK:
+        histogram = _HISTOGRAMS.get(name)
+        if histogram is None:
+            histogram = _HISTOGRAMS[name] = LatencyHistogram(name, buckets)
+        return histogram
+
+
+def observe(name: str, seconds: float):
+    get_histogram(name).observe(seconds)
+
+
+@contextmanager
+def timed(name: str):
+    """Records the wall-clock duration of the with-block into the named histogram."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def get_all_histograms(prefix: str = "") -> Dict[str, Dict]:
+    with _HISTOGRAMS_LOCK:
+        histograms = [h for name, h in _HISTOGRAMS.items() if name.startswith(prefix)]
+    return {h.name: h.snapshot() for h in sorted(histograms, key=lambda h: h.name)}
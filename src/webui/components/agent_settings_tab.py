@@ -210,6 +210,12 @@ def create_agent_settings_tab(webui_manager: WebuiManager):
             choices=['function_calling', 'json_mode', 'raw', 'auto', 'tools', "None"],
             visible=True
         )
+        replay_recorded_runs = gr.Checkbox(
+            label="Replay Recorded Runs",
+            value=os.getenv("AGENT_REPLAY", "false").lower() in ("true", "1", "yes"),
+            info="Replay the last successful run of the same task without the LLM, which takes over where the page differs",
+            interactive=True
+        )
     tab_components.update(dict(
         override_system_prompt=override_system_prompt,
         extend_system_prompt=extend_system_prompt,
@@ -231,6 +237,7 @@ def create_agent_settings_tab(webui_manager: WebuiManager):
         max_actions=max_actions,
         max_input_tokens=max_input_tokens,
         tool_calling_method=tool_calling_method,
+        replay_recorded_runs=replay_recorded_runs,
         mcp_json_file=mcp_json_file,
         mcp_server_config=mcp_server_config,
     ))
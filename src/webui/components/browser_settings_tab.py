@@ -17,6 +17,10 @@ async def close_browser(webui_manager: WebuiManager):
         webui_manager.bu_current_task.cancel()
         webui_manager.bu_current_task = None
 
+    if webui_manager.bu_browser_watchdog:
+        await webui_manager.bu_browser_watchdog.stop()
+        webui_manager.bu_browser_watchdog = None
+
     if webui_manager.bu_browser_context:
         logger.info("⚠️ Closing browser context when changing browser config.")
         await webui_manager.bu_browser_context.close()
@@ -74,6 +78,13 @@ def create_browser_settings_tab(webui_manager: WebuiManager):
                 info="Disable browser security",
                 interactive=True
             )
+            resource_blocking = gr.Dropdown(
+                label="Resource Blocking",
+                choices=["auto", "off", "standard", "research"],
+                value=os.getenv("BROWSER_BLOCK_PROFILE") or "off",
+                info="Block ads/trackers, fonts and media (research also blocks images); auto picks by Use Vision",
+                interactive=True
+            )
 
     with gr.Group():
         with gr.Row():
@@ -139,6 +150,7 @@ def create_browser_settings_tab(webui_manager: WebuiManager):
             keep_browser_open=keep_browser_open,
             headless=headless,
             disable_security=disable_security,
+            resource_blocking=resource_blocking,
             save_recording_path=save_recording_path,
             save_trace_path=save_trace_path,
             save_agent_history_path=save_agent_history_path,
@@ -158,4 +170,5 @@ def create_browser_settings_tab(webui_manager: WebuiManager):
     headless.change(close_wrapper)
     keep_browser_open.change(close_wrapper)
     disable_security.change(close_wrapper)
+    resource_blocking.change(close_wrapper)
     use_own_browser.change(close_wrapper)
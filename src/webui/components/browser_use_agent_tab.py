@@ -20,8 +20,12 @@ from browser_use.browser.views import BrowserState
 from gradio.components import Component
 from langchain_core.language_models.chat_models import BaseChatModel
 
+from src.agent.browser_use.agent_control import wait_for_first
 from src.agent.browser_use.browser_use_agent import BrowserUseAgent
+from src.agent.browser_use.replay import get_recording_store
 from src.browser.custom_browser import CustomBrowser
+from src.browser.custom_context import CustomBrowserContext, CustomBrowserContextConfig
+from src.browser.memory_watchdog import BrowserMemoryWatchdog, create_memory_watchdog
 from src.controller.custom_controller import CustomController
 from src.utils import llm_provider
 from src.webui.webui_manager import WebuiManager
@@ -274,6 +278,20 @@ async def _ask_assistant_callback(
 # --- Core Agent Execution Logic --- (Needs access to webui_manager)
 
 
+async def _ensure_browser_watchdog(webui_manager: WebuiManager) -> Optional[BrowserMemoryWatchdog]:
+    """Starts the memory watchdog for the current browser, replacing one left over from a closed browser."""
+    watchdog = webui_manager.bu_browser_watchdog
+    if watchdog and watchdog.browser is webui_manager.bu_browser:
+        return watchdog
+    if watchdog:
+        await watchdog.stop()
+    watchdog = create_memory_watchdog(webui_manager.bu_browser) if webui_manager.bu_browser else None
+    if watchdog:
+        watchdog.start()
+    webui_manager.bu_browser_watchdog = watchdog
+    return watchdog
+
+
 async def run_agent_task(
         webui_manager: WebuiManager, components: Dict[gr.components.Component, Any]
 ) -> AsyncGenerator[Dict[gr.components.Component, Any], None]:
@@ -346,6 +364,7 @@ async def run_agent_task(
     max_input_tokens = get_setting("max_input_tokens", 128000)
     tool_calling_str = get_setting("tool_calling_method", "auto")
     tool_calling_method = tool_calling_str if tool_calling_str != "None" else None
+    replay_recorded_runs = get_setting("replay_recorded_runs", False)
     mcp_server_config_comp = webui_manager.id_to_component.get(
         "agent_settings.mcp_server_config"
     )
@@ -400,6 +419,7 @@ async def run_agent_task(
         "save_agent_history_path", "./tmp/agent_history"
     )
     save_download_path = get_browser_setting("save_download_path", "./tmp/downloads")
+    resource_blocking = get_browser_setting("resource_blocking", "off")
 
     stream_vw = 70
     stream_vh = int(70 * window_h // window_w)
@@ -494,7 +514,7 @@ async def run_agent_task(
         # Create Context if needed
         if not webui_manager.bu_browser_context:
             logger.info("Creating new browser context.")
-            context_config = BrowserContextConfig(
+            context_config = CustomBrowserContextConfig(
                 trace_path=save_trace_path if save_trace_path else None,
                 save_recording_path=save_recording_path
                 if save_recording_path
@@ -502,6 +522,8 @@ async def run_agent_task(
                 save_downloads_path=save_download_path if save_download_path else None,
                 window_height=window_h,
                 window_width=window_w,
+                resource_blocking=resource_blocking,
+                use_vision=use_vision,
             )
             if not webui_manager.bu_browser:
                 raise ValueError("Browser not initialized, cannot create context.")
@@ -570,7 +592,27 @@ async def run_agent_task(
             webui_manager.bu_agent.controller = webui_manager.bu_controller
 
         # --- 6. Run Agent Task and Stream Updates ---
-        agent_run_coro = webui_manager.bu_agent.run(max_steps=max_steps)
+        # 浏览器长期保持打开时，由看门狗在步骤之间按内存/标签页阈值回收浏览器或上下文
+        watchdog = await _ensure_browser_watchdog(webui_manager)
+
+        async def on_step_start(agent):
+            # 每步开始前检查浏览器是否存活，崩溃或断开时就地重启并恢复页面
+            if isinstance(agent.browser_context, CustomBrowserContext):
+                await agent.browser_context.ensure_alive()
+            if watchdog:
+                await watchdog.on_step_start(agent)
+
+        # 同一任务之前成功运行过时，先按录制的步骤回放，页面不一致时再交给 LLM
+        replay_history = None
+        if replay_recorded_runs:
+            replay_history = get_recording_store().load(task, webui_manager.bu_agent.AgentOutput)
+            if replay_history:
+                logger.info(f"Found a recorded run with {len(replay_history.history)} steps, replaying it first.")
+        history_start = len(webui_manager.bu_agent.state.history.history)
+
+        agent_run_coro = webui_manager.bu_agent.run(
+            max_steps=max_steps, on_step_start=on_step_start, replay_history=replay_history
+        )
         agent_task = asyncio.create_task(agent_run_coro)
         webui_manager.bu_current_task = agent_task  # Store the task
 
@@ -587,14 +629,9 @@ async def run_agent_task(
                     ),
                     stop_button_comp: gr.update(interactive=True),
                 }
-                # Wait until pause is released or task is stopped/done
-                while is_paused and not agent_task.done():
-                    # Re-check agent state in loop
-                    is_paused = webui_manager.bu_agent.state.paused
-                    is_stopped = webui_manager.bu_agent.state.stopped
-                    if is_stopped:  # Stop signal received while paused
-                        break
-                    await asyncio.sleep(0.2)
+                # 等待恢复、停止或任务结束（事件唤醒，不轮询）
+                await wait_for_first(webui_manager.bu_agent.control.wait_until_resumed(), agent_task)
+                is_stopped = webui_manager.bu_agent.state.stopped
 
                 if (
                         agent_task.done() or is_stopped
@@ -647,11 +684,9 @@ async def run_agent_task(
                 last_chat_len = len(webui_manager.bu_chat_history)
                 yield update_dict
                 # Wait until response is submitted or task finishes
-                while (
-                        webui_manager.bu_response_event is not None
-                        and not agent_task.done()
-                ):
-                    await asyncio.sleep(0.2)
+                response_event = webui_manager.bu_response_event
+                if response_event is not None:
+                    await wait_for_first(response_event.wait(), agent_task)
                 # Restore UI after response submitted or if task ended unexpectedly
                 if not agent_task.done():
                     yield {
@@ -721,8 +756,7 @@ async def run_agent_task(
             await asyncio.sleep(0.1)  # Polling interval
 
         # --- 7. Task Finalization ---
-        webui_manager.bu_agent.state.paused = False
-        webui_manager.bu_agent.state.stopped = False
+        webui_manager.bu_agent.control.reset()
         final_update = {}
         try:
             logger.info("Agent task completing...")
@@ -735,6 +769,11 @@ async def run_agent_task(
 
             logger.info(f"Explicitly saving agent history to: {history_file}")
             webui_manager.bu_agent.save_history(history_file)
+            if replay_recorded_runs:
+                # 只录制本次任务的步骤（同一个 agent 可能先执行过其他任务）
+                get_recording_store().save(
+                    task, AgentHistoryList(history=webui_manager.bu_agent.state.history.history[history_start:])
+                )
 
             if os.path.exists(history_file):
                 final_update[history_file_comp] = gr.File(value=history_file)
@@ -783,6 +822,9 @@ async def run_agent_task(
                     logger.info("Closing browser after task.")
                     await webui_manager.bu_browser.close()
                     webui_manager.bu_browser = None
+                if webui_manager.bu_browser_watchdog:
+                    await webui_manager.bu_browser_watchdog.stop()
+                    webui_manager.bu_browser_watchdog = None
 
             # --- 8. Final UI Update ---
             final_update.update(
@@ -897,9 +939,8 @@ async def handle_stop(webui_manager: WebuiManager):
     task = webui_manager.bu_current_task
 
     if agent and task and not task.done():
-        # Signal the agent to stop by setting its internal flag
-        agent.state.stopped = True
-        agent.state.paused = False  # Ensure not paused if stopped
+        # Signal the agent to stop; this also wakes it if it is paused
+        agent.stop()
         return {
             webui_manager.get_component_by_id(
                 "browser_use_agent.stop_button"
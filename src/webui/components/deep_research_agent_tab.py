@@ -9,7 +9,9 @@ import os
 from typing import Any, Dict, AsyncGenerator, Optional, Tuple, Union
 import asyncio
 import json
-from src.agent.deep_research.deep_research_agent import DeepResearchAgent
+from collections import deque
+from src.agent.deep_research import progress_events
+from src.agent.deep_research.deep_research_agent import DeepResearchAgent, format_plan_markdown
 from src.utils import llm_provider
 
 logger = logging.getLogger(__name__)
@@ -52,6 +54,46 @@ def _read_file_safe(file_path: str) -> Optional[str]:
         return None
 
 
+def _apply_research_event(progress: Dict[str, Any], event: Dict[str, Any]) -> bool:
+    """Folds a progress event into the live view state. Returns True if the view changed."""
+    event_type = event["type"]
+    data = event["data"]
+    if event_type == progress_events.PLAN_UPDATED:
+        progress["plan"] = data["plan"]
+    elif event_type == progress_events.TASK_STARTED:
+        progress["current_task"] = data["task_description"]
+        progress["activity"].append(f"▶️ Started: {data['task_description']}")
+    elif event_type == progress_events.TASK_COMPLETED:
+        progress["current_task"] = None
+        icon = "✅" if data["status"] == "completed" else "❌" if data["status"] == "failed" else "⏸️"
+        progress["activity"].append(f"{icon} {data['status'].capitalize()}: {data['task_description']}")
+    elif event_type == progress_events.QUERY_RESULT:
+        progress["activity"].append(f"🔎 Query \"{data['query']}\" → {data['status']}")
+    elif event_type == progress_events.TOKEN_USAGE:
+        progress["token_usage"] = data["cumulative"]
+    elif event_type == progress_events.SYNTHESIS_STARTED:
+        progress["current_task"] = f"Synthesizing report from {data['result_count']} results"
+        progress["activity"].append("📝 Synthesizing final report")
+    else:
+        return False
+    return True
+
+
+def _render_research_progress(progress: Dict[str, Any]) -> str:
+    """Renders the live plan, current task, token usage and recent activity as Markdown."""
+    content = format_plan_markdown(progress["plan"]) if progress["plan"] else "# Research Plan\n\n*Planning...*\n"
+    content += "\n---\n"
+    if progress["current_task"]:
+        content += f"**Current task:** {progress['current_task']}\n\n"
+    usage = progress["token_usage"]
+    if usage:
+        content += (f"**Tokens:** {usage.get('total_tokens', 0)} "
+                    f"(in {usage.get('input_tokens', 0)} / out {usage.get('output_tokens', 0)})\n\n")
+    if progress["activity"]:
+        content += "**Recent activity:**\n\n" + "\n".join(f"- {line}" for line in progress["activity"]) + "\n"
+    return content
+
+
 # --- Deep Research Agent Specific Logic ---
 
 async def run_deep_research(webui_manager: WebuiManager, components: Dict[Component, Any]) -> AsyncGenerator[
@@ -62,6 +104,8 @@ async def run_deep_research(webui_manager: WebuiManager, components: Dict[Compon
     research_task_comp = webui_manager.get_component_by_id("deep_research_agent.research_task")
     resume_task_id_comp = webui_manager.get_component_by_id("deep_research_agent.resume_task_id")
     parallel_num_comp = webui_manager.get_component_by_id("deep_research_agent.parallel_num")
+    query_max_steps_comp = webui_manager.get_component_by_id("deep_research_agent.query_max_steps")
+    query_timeout_comp = webui_manager.get_component_by_id("deep_research_agent.query_timeout")
     save_dir_comp = webui_manager.get_component_by_id(
         "deep_research_agent.max_query")  # Note: component ID seems misnamed in original code
     start_button_comp = webui_manager.get_component_by_id("deep_research_agent.start_button")
@@ -74,6 +118,8 @@ async def run_deep_research(webui_manager: WebuiManager, components: Dict[Compon
     task_topic = components.get(research_task_comp, "").strip()
     task_id_to_resume = components.get(resume_task_id_comp, "").strip() or None
     max_parallel_agents = int(components.get(parallel_num_comp, 1))
+    query_max_steps = int(components.get(query_max_steps_comp, 100) or 100)
+    query_timeout = float(components.get(query_timeout_comp, 0) or 0) or None  # 0 disables the time budget
     base_save_dir = components.get(save_dir_comp, "./tmp/deep_research").strip()
     safe_root_dir = "./tmp/deep_research"
     normalized_base_save_dir = os.path.abspath(os.path.normpath(base_save_dir))
@@ -100,6 +146,8 @@ async def run_deep_research(webui_manager: WebuiManager, components: Dict[Compon
         research_task_comp: gr.update(interactive=False),
         resume_task_id_comp: gr.update(interactive=False),
         parallel_num_comp: gr.update(interactive=False),
+        query_max_steps_comp: gr.update(interactive=False),
+        query_timeout_comp: gr.update(interactive=False),
         save_dir_comp: gr.update(interactive=False),
         markdown_display_comp: gr.update(value="Starting research..."),
         markdown_download_comp: gr.update(value=None, interactive=False)
@@ -107,10 +155,7 @@ async def run_deep_research(webui_manager: WebuiManager, components: Dict[Compon
 
     agent_task = None
     running_task_id = None
-    plan_file_path = None
     report_file_path = None
-    last_plan_content = None
-    last_plan_mtime = 0
 
     try:
         # --- 3. Get LLM and Browser Config from other tabs ---
@@ -143,6 +188,7 @@ async def run_deep_research(webui_manager: WebuiManager, components: Dict[Compon
             "user_data_dir": get_setting("browser_settings", "browser_user_data_dir"),
             "window_width": int(get_setting("browser_settings", "window_w", 1280)),
             "window_height": int(get_setting("browser_settings", "window_h", 1100)),
+            "resource_blocking": get_setting("browser_settings", "resource_blocking", "off"),
             # Add other relevant fields if DeepResearchAgent accepts them
         }
 
@@ -156,77 +202,58 @@ async def run_deep_research(webui_manager: WebuiManager, components: Dict[Compon
             logger.info("DeepResearchAgent initialized.")
 
         # --- 5. Start Agent Run ---
+        # Subscribe before starting so no early event (e.g. run_started) is missed
+        event_bus = webui_manager.dr_agent.event_bus
+        event_queue = event_bus.subscribe()
         agent_run_coro = webui_manager.dr_agent.run(
             topic=task_topic,
             task_id=task_id_to_resume,
             save_dir=base_save_dir,
-            max_parallel_browsers=max_parallel_agents
+            max_parallel_browsers=max_parallel_agents,
+            max_query_steps=query_max_steps,
+            query_timeout=query_timeout,
         )
         agent_task = asyncio.create_task(agent_run_coro)
         webui_manager.dr_current_task = agent_task
 
-        # Wait briefly for the agent to start and potentially create the task ID/folder
-        await asyncio.sleep(1.0)
-
-        # Determine the actual task ID being used (agent sets this)
-        running_task_id = webui_manager.dr_agent.current_task_id
-        if not running_task_id:
-            # Agent might not have set it yet, try to get from result later? Risky.
-            # Or derive from resume_task_id if provided?
-            running_task_id = task_id_to_resume
-            if not running_task_id:
-                logger.warning("Could not determine running task ID immediately.")
-                # We can still monitor, but might miss initial plan if ID needed for path
-            else:
-                logger.info(f"Assuming task ID based on resume ID: {running_task_id}")
-        else:
-            logger.info(f"Agent started with Task ID: {running_task_id}")
-
-        webui_manager.dr_task_id = running_task_id  # Store for stop handler
-
-        # --- 6. Monitor Progress via research_plan.md ---
-        if running_task_id:
-            task_specific_dir = os.path.join(base_save_dir, str(running_task_id))
-            plan_file_path = os.path.join(task_specific_dir, "research_plan.md")
-            report_file_path = os.path.join(task_specific_dir, "report.md")
-            logger.info(f"Monitoring plan file: {plan_file_path}")
-        else:
-            logger.warning("Cannot monitor plan file: Task ID unknown.")
-            plan_file_path = None
-        last_plan_content = None
-        while not agent_task.done():
-            update_dict = {}
-            update_dict[resume_task_id_comp] = gr.update(value=running_task_id)
-            agent_stopped = getattr(webui_manager.dr_agent, 'stopped', False)
-            if agent_stopped:
-                logger.info("Stop signal detected from agent state.")
-                break  # Exit monitoring loop
-
-            # Check and update research plan display
-            if plan_file_path:
-                try:
-                    current_mtime = os.path.getmtime(plan_file_path) if os.path.exists(plan_file_path) else 0
-                    if current_mtime > last_plan_mtime:
-                        logger.info(f"Detected change in {plan_file_path}")
-                        plan_content = _read_file_safe(plan_file_path)
-                        if last_plan_content is None or (
-                                plan_content is not None and plan_content != last_plan_content):
-                            update_dict[markdown_display_comp] = gr.update(value=plan_content)
-                            last_plan_content = plan_content
-                            last_plan_mtime = current_mtime
-                        elif plan_content is None:
-                            # File might have been deleted or became unreadable
-                            last_plan_mtime = 0  # Reset to force re-read attempt later
-                except Exception as e:
-                    logger.warning(f"Error checking/reading plan file {plan_file_path}: {e}")
-                    # Avoid continuous logging for the same error
-                    await asyncio.sleep(2.0)
-
-            # Yield updates if any
-            if update_dict:
-                yield update_dict
-
-            await asyncio.sleep(1.0)  # Check file changes every second
+        # --- 6. Monitor Progress via the agent's event bus ---
+        progress = {"plan": [], "current_task": None, "activity": deque(maxlen=12), "token_usage": {}}
+        next_event = None
+        try:
+            while not agent_task.done():
+                agent_stopped = getattr(webui_manager.dr_agent, 'stopped', False)
+                if agent_stopped:
+                    logger.info("Stop signal detected from agent state.")
+                    break  # Exit monitoring loop
+
+                if next_event is None:
+                    next_event = asyncio.ensure_future(event_queue.get())
+                await asyncio.wait({next_event, agent_task}, return_when=asyncio.FIRST_COMPLETED)
+                if not next_event.done():
+                    continue  # Agent finished without further events
+                event = next_event.result()
+                next_event = None
+
+                update_dict = {}
+                event_type = event["type"]
+                data = event["data"]
+                if event_type == progress_events.RUN_STARTED:
+                    running_task_id = event["task_id"]
+                    webui_manager.dr_task_id = running_task_id  # Store for stop handler
+                    report_file_path = os.path.join(data["output_dir"], "report.md")
+                    logger.info(f"Agent started with Task ID: {running_task_id}")
+                    update_dict[resume_task_id_comp] = gr.update(value=running_task_id)
+                elif event_type == progress_events.REPORT_READY:
+                    update_dict[markdown_display_comp] = gr.update(value=data["report"])
+                elif _apply_research_event(progress, event):
+                    update_dict[markdown_display_comp] = gr.update(value=_render_research_progress(progress))
+
+                if update_dict:
+                    yield update_dict
+        finally:
+            if next_event and not next_event.done():
+                next_event.cancel()
+            event_bus.unsubscribe(event_queue)
 
         # --- 7. Task Finalization ---
         logger.info("Agent task processing finished. Awaiting final result...")
@@ -283,6 +310,8 @@ async def run_deep_research(webui_manager: WebuiManager, components: Dict[Compon
             research_task_comp: gr.update(interactive=True),
             resume_task_id_comp: gr.update(value="", interactive=True),
             parallel_num_comp: gr.update(interactive=True),
+            query_max_steps_comp: gr.update(interactive=True),
+            query_timeout_comp: gr.update(interactive=True),
             save_dir_comp: gr.update(interactive=True),
             # Keep download button enabled if file exists
             markdown_download_comp: gr.update() if report_file_path and os.path.exists(report_file_path) else gr.update(
@@ -397,6 +426,15 @@ def create_deep_research_agent_tab(webui_manager: WebuiManager):
                                      interactive=True)
             max_query = gr.Textbox(label="Research Save Dir", value="./tmp/deep_research",
                                    interactive=True)
+        with gr.Row():
+            query_max_steps = gr.Number(label="Max Steps per Query", value=100,
+                                        precision=0,
+                                        info="Step budget for each browser sub-agent",
+                                        interactive=True)
+            query_timeout = gr.Number(label="Query Timeout (s)", value=600,
+                                      precision=0,
+                                      info="Wall-clock budget for each browser sub-agent, 0 to disable",
+                                      interactive=True)
     with gr.Row():
         stop_button = gr.Button("⏹️ Stop", variant="stop", scale=2)
         start_button = gr.Button("▶️ Run", variant="primary", scale=3)
@@ -407,6 +445,8 @@ def create_deep_research_agent_tab(webui_manager: WebuiManager):
         dict(
             research_task=research_task,
             parallel_num=parallel_num,
+            query_max_steps=query_max_steps,
+            query_timeout=query_timeout,
             max_query=max_query,
             start_button=start_button,
             stop_button=stop_button,
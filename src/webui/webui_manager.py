@@ -15,6 +15,7 @@ from browser_use.browser.context import BrowserContext
 from browser_use.agent.service import Agent
 from src.browser.custom_browser import CustomBrowser
 from src.browser.custom_context import CustomBrowserContext
+from src.browser.memory_watchdog import BrowserMemoryWatchdog
 from src.controller.custom_controller import CustomController
 from src.agent.deep_research.deep_research_agent import DeepResearchAgent
 from src.utils.log_handler import setup_ui_logging
@@ -42,6 +43,7 @@ class WebuiManager:
         self.bu_agent: Optional[Agent] = None
         self.bu_browser: Optional[CustomBrowser] = None
         self.bu_browser_context: Optional[CustomBrowserContext] = None
+        self.bu_browser_watchdog: Optional[BrowserMemoryWatchdog] = None
         self.bu_controller: Optional[CustomController] = None
         self.bu_chat_history: List[Dict[str, Optional[str]]] = []
         self.bu_response_event: Optional[asyncio.Event] = None
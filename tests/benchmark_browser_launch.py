@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+浏览器启动耗时基准：多次启动 CustomBrowser，统计各阶段（Playwright 启动、进程启动与 CDP 连接、
+上下文创建、首次导航、首次绘制）的耗时分布，可对比 fast-launch 模式与默认参数。
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 添加项目根目录到Python路径
+sys.path.append(".")
+
+from browser_use.browser.browser import BrowserConfig
+
+from src.browser.custom_browser import CustomBrowser
+from src.browser.custom_context import CustomBrowserContextConfig
+from src.browser.fast_launch import PHASE_FIRST_PAINT
+from src.utils.metrics import get_all_histograms, get_histogram
+
+TOTAL_PHASE = "browser.launch.total"
+
+
+async def launch_once(url: str, fast_launch: bool, headless: bool):
+    started = time.perf_counter()
+    browser = CustomBrowser(config=BrowserConfig(headless=headless), fast_launch=fast_launch)
+    context = None
+    try:
+        # 关闭资源拦截和共享缓存，只测量浏览器本身
+        context = await browser.new_context(
+            CustomBrowserContextConfig(resource_blocking="off", http_cache=False)
+        )
+        page = await context.get_current_page()
+        await page.goto(url, wait_until="load")
+        # 首次绘制由 load 事件回调异步记录，稍等片刻
+        deadline = time.perf_counter() + 2
+        while PHASE_FIRST_PAINT not in browser.launch_timings and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        browser.record_launch_phase(TOTAL_PHASE, started)
+    finally:
+        if context:
+            await context.close()
+        await browser.close()
+
+
+def print_report(title: str, histograms: dict):
+    print(f"\n=== {title} ===")
+    print(f"{'phase':<36}{'n':>4}{'mean':>9}{'p50':>9}{'p90':>9}{'max':>9}")
+    for name, snapshot in histograms.items():
+        def fmt(value):
+            return f"{value:.3f}" if value is not None else "-"
+
+        print(f"{name:<36}{snapshot['count']:>4}{fmt(snapshot['mean']):>9}{fmt(snapshot['p50']):>9}"
+              f"{fmt(snapshot['p90']):>9}{fmt(snapshot['max']):>9}")
+
+
+async def run_benchmark(runs: int, url: str, modes, headless: bool):
+    for fast_launch in modes:
+        for name in get_all_histograms("browser.launch"):
+            get_histogram(name).reset()
+        for i in range(runs):
+            try:
+                await launch_once(url, fast_launch, headless)
+            except Exception as e:
+                print(f"Run {i + 1} failed: {e}")
+        print_report(f"{'fast-launch' if fast_launch else 'default'} ({runs} runs, seconds)",
+                     get_all_histograms("browser.launch"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CustomBrowser launch phases")
+    parser.add_argument("--runs", type=int, default=5, help="Number of launches per mode")
+    parser.add_argument("--url", type=str, default="https://example.com", help="Page used for the first navigation")
+    parser.add_argument("--mode", choices=["fast", "default", "compare"], default="compare",
+                        help="Launch with fast-launch flags, without them, or both")
+    parser.add_argument("--headful", action="store_true", help="Launch with a window (fast-launch flags apply to headless only)")
+    args = parser.parse_args()
+
+    modes = {"fast": [True], "default": [False], "compare": [False, True]}[args.mode]
+    asyncio.run(run_benchmark(args.runs, args.url, modes, headless=not args.headful))
+
+
+if __name__ == '__main__':
+    main()
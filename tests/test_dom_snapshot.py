@@ -0,0 +1,45 @@
+import sys
+
+sys.path.append(".")
+
+from src.browser.dom_snapshot import DomSnapshot, diff_snapshots
+
+
+def snapshot(elements, texts=()):
+    """elements: (xpath, highlight index, html) in page order; texts: plain text lines."""
+    items = [(("element", xpath, 1), index, html) for xpath, index, html in elements]
+    items += [(("text", text, 1), None, text) for text in texts]
+    return DomSnapshot("https://example.com", "", items)
+
+
+def buttons(labels, first_index=0):
+    return [(f"/html/body/button[{label}]", first_index + i, f"<button>{label} />") for i, label in enumerate(labels)]
+
+
+def test_identical_snapshots_have_an_empty_delta():
+    baseline = snapshot(buttons("abc"), texts=["Welcome"])
+    delta = diff_snapshots(baseline, snapshot(buttons("abc"), texts=["Welcome"]))
+    assert delta.size == 0
+    assert delta.to_text(3) == "Unchanged since the page snapshot of step 3."
+
+
+def test_inserted_element_renumbers_the_following_run():
+    baseline = snapshot(buttons("abcd"))
+    current = snapshot([("/html/body/a", 0, "<a>New />")] + buttons("abcd", first_index=1))
+    delta = diff_snapshots(baseline, current)
+    assert delta.added == ["[0]<a>New />"]
+    assert delta.renumbered == [(0, 3, 1)]
+    assert "Renumbered: [0]-[3] are now [1]-[4]" in delta.to_text(None)
+
+
+def test_removed_and_changed_elements():
+    baseline = snapshot(buttons("abcd"), texts=["Old banner"])
+    current_elements = buttons("ab") + [("/html/body/button[d]", 2, "<button>d (selected) />")]
+    delta = diff_snapshots(baseline, snapshot(current_elements))
+    assert delta.removed == [2]
+    assert delta.removed_text == ["Old banner"]
+    assert delta.added == ["[2]<button>d (selected) />"]
+    assert delta.renumbered == []
+    text = delta.to_text(None)
+    assert "Removed elements (snapshot indices): [2]" in text
+    assert "Removed text: Old banner" in text
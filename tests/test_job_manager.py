@@ -0,0 +1,189 @@
+import asyncio
+import sys
+
+import pytest
+
+sys.path.append(".")
+
+from src.agent.deep_research import job_manager, progress_events
+from src.agent.deep_research.job_manager import BudgetSemaphore, ResearchJobManager
+from src.agent.deep_research.progress_events import ResearchEventBus
+
+
+class FakeResearchAgent:
+    """Stands in for DeepResearchAgent: holds one shared browser slot until finished or stopped."""
+
+    def __init__(self, llm, browser_config, mcp_server_config=None, browser_semaphore=None, llm_semaphore=None):
+        self.llm = llm
+        self.browser_semaphore = browser_semaphore
+        self.event_bus = ResearchEventBus()
+        self.holding_browser = asyncio.Event()
+        self.release = asyncio.Event()
+        self.stopped = False
+        self.run_kwargs = None
+
+    async def run(self, topic, task_id=None, save_dir=None, **kwargs):
+        self.run_kwargs = kwargs
+        task_id = task_id or f"task-{topic}"
+        self.event_bus.publish(progress_events.RUN_STARTED, task_id, output_dir=save_dir)
+        async with self.browser_semaphore:
+            self.holding_browser.set()
+            await self.release.wait()
+        self.holding_browser.clear()
+        if self.stopped:
+            return {"status": "stopped", "message": "Stopped.", "task_id": task_id, "final_state": {}}
+        if topic == "boom":
+            raise RuntimeError("graph failed")
+        self.event_bus.publish(progress_events.QUERY_RESULT, task_id, query=topic)
+        return {"status": "completed", "message": None, "task_id": task_id, "final_state": {}}
+
+    async def stop(self):
+        self.stopped = True
+        self.release.set()
+
+
+@pytest.fixture(autouse=True)
+def fake_agent(monkeypatch):
+    monkeypatch.setattr(job_manager, "DeepResearchAgent", FakeResearchAgent)
+
+
+async def until(condition, turns=100):
+    for _ in range(turns):
+        if condition():
+            return
+        await asyncio.sleep(0)
+    raise AssertionError("condition not reached")
+
+
+def new_manager(**kwargs):
+    return ResearchJobManager(llm="default-llm", browser_config={}, save_dir="./tmp/test_jobs", **kwargs)
+
+
+def test_jobs_run_in_isolation():
+    async def main():
+        manager = new_manager(max_concurrent_jobs=2, max_total_browsers=2)
+        first = await manager.submit("alpha", max_parallel_browsers=3)
+        second = await manager.submit("beta", llm="other-llm")
+        agents = {job_id: manager.jobs[job_id].agent for job_id in (first, second)}
+        await until(lambda: all(agent.holding_browser.is_set() for agent in agents.values()))
+
+        agents[first].release.set()
+        result = await manager.wait(first, timeout=1)
+        assert result["task_id"] == "task-alpha"
+        assert manager.get_status(first)["status"] == "completed"
+        assert manager.get_status(first)["query_results"] == 1
+        assert manager.get_status(second)["status"] == "running"
+        assert agents[first].run_kwargs == {"max_parallel_browsers": 3}
+        assert agents[second].llm == "other-llm"
+
+        agents[second].release.set()
+        await manager.wait(second, timeout=1)
+        assert manager.get_status(second)["task_id"] == "task-beta"
+
+    asyncio.run(main())
+
+
+def test_stop_only_affects_its_job():
+    async def main():
+        manager = new_manager(max_concurrent_jobs=2, max_total_browsers=2)
+        first = await manager.submit("alpha")
+        second = await manager.submit("beta")
+        await until(lambda: all(job.agent.holding_browser.is_set() for job in manager.jobs.values()))
+
+        await manager.stop(first)
+        await manager.wait(first, timeout=1)
+        assert manager.get_status(first)["status"] == "stopped"
+        assert manager.get_status(second)["status"] == "running"
+
+        await manager.stop_all()
+        await manager.wait(second, timeout=1)
+        assert manager.get_status(second)["status"] == "stopped"
+
+    asyncio.run(main())
+
+
+def test_stopping_a_queued_job_never_runs_it():
+    async def main():
+        manager = new_manager(max_concurrent_jobs=1)
+        first = await manager.submit("alpha")
+        second = await manager.submit("beta")
+        await until(lambda: manager.jobs[first].agent.holding_browser.is_set())
+        assert [job["job_id"] for job in manager.list_jobs(status="queued")] == [second]
+
+        await manager.stop(second)
+        manager.jobs[first].agent.release.set()
+        result = await manager.wait(second, timeout=1)
+        assert result["status"] == "stopped"
+        assert manager.jobs[second].agent.run_kwargs is None
+        assert manager.get_status(second)["started_at"] is None
+
+    asyncio.run(main())
+
+
+def test_browser_budget_is_shared_across_jobs():
+    async def main():
+        manager = new_manager(max_concurrent_jobs=2, max_total_browsers=1)
+        first = await manager.submit("alpha")
+        second = await manager.submit("beta")
+        first_agent, second_agent = manager.jobs[first].agent, manager.jobs[second].agent
+        await until(lambda: first_agent.holding_browser.is_set())
+        await until(lambda: manager.get_budget()["jobs_running"] == 2)
+        budget = manager.get_budget()
+        assert budget["browsers_in_use"] == 1
+        assert budget["max_total_browsers"] == 1
+        assert not second_agent.holding_browser.is_set()
+
+        first_agent.release.set()
+        await until(lambda: second_agent.holding_browser.is_set())
+        assert manager.get_budget()["browsers_in_use"] == 1
+
+        second_agent.release.set()
+        await manager.wait(second, timeout=1)
+        assert manager.get_budget()["browsers_in_use"] == 0
+
+    asyncio.run(main())
+
+
+def test_failed_job_reports_error_and_can_be_removed():
+    async def main():
+        manager = new_manager()
+        job_id = await manager.submit("boom")
+        other = await manager.submit("alpha")
+        manager.jobs[job_id].agent.release.set()
+        result = await manager.wait(job_id, timeout=1)
+        assert result["status"] == "error"
+        assert manager.get_status(job_id)["message"] == "graph failed"
+
+        assert manager.remove(other) is False  # Still running
+        assert manager.remove(job_id) is True
+        assert manager.get_status(job_id) is None
+        await manager.stop_all()
+
+    asyncio.run(main())
+
+
+def test_resuming_an_active_task_is_rejected():
+    async def main():
+        manager = new_manager()
+        await manager.submit("alpha", resume_task_id="task-1")
+        with pytest.raises(ValueError):
+            await manager.submit("alpha", resume_task_id="task-1")
+        await manager.stop_all()
+
+    asyncio.run(main())
+
+
+def test_budget_semaphore_counts_holders():
+    async def main():
+        semaphore = BudgetSemaphore(2)
+        async with semaphore:
+            async with semaphore:
+                assert semaphore.in_use == 2
+                waiter = asyncio.ensure_future(semaphore.acquire())
+                await asyncio.sleep(0)
+                assert semaphore.in_use == 2
+                waiter.cancel()
+            assert semaphore.in_use == 1
+        assert semaphore.in_use == 0
+
+    asyncio.run(main())
@@ -0,0 +1,163 @@
+import asyncio
+import sys
+
+import pytest
+
+sys.path.append(".")
+
+from src.controller import mcp_result_cache
+from src.controller.mcp_result_cache import McpResultCache, hash_arguments
+
+
+class CountingTool:
+    def __init__(self, result="result", delay=0.0):
+        self.result = result
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+def test_hash_arguments_ignores_key_order():
+    assert hash_arguments({"a": 1, "b": [1, 2]}) == hash_arguments({"b": [1, 2], "a": 1})
+    assert hash_arguments({"a": 1}) != hash_arguments({"a": 2})
+
+
+def test_repeated_call_is_served_from_cache():
+    cache = McpResultCache()
+    tool = CountingTool()
+
+    async def main():
+        first = await cache.get_or_call("fs.read", {"path": "a"}, tool)
+        second = await cache.get_or_call("fs.read", {"path": "a"}, tool)
+        other = await cache.get_or_call("fs.read", {"path": "b"}, tool)
+        return first, second, other
+
+    assert asyncio.run(main()) == ("result", "result", "result")
+    assert tool.calls == 2
+    stats = cache.get_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2
+    assert stats["tools"]["fs.read"] == {"hits": 1, "misses": 2}
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(mcp_result_cache.time, "time", lambda: now[0])
+    cache = McpResultCache(ttl=10)
+    tool = CountingTool()
+
+    async def call(ttl=None):
+        return await cache.get_or_call("search", {"q": "x"}, tool, ttl=ttl)
+
+    asyncio.run(call())
+    now[0] += 5
+    asyncio.run(call())
+    assert tool.calls == 1
+    now[0] += 10
+    asyncio.run(call(ttl=100))
+    assert tool.calls == 2
+    now[0] += 50
+    asyncio.run(call())
+    assert tool.calls == 2
+    assert cache.stats["expired"] == 1
+
+
+def test_errors_are_not_cached():
+    cache = McpResultCache()
+    tool = CountingTool(result=RuntimeError("server down"))
+
+    async def main():
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                await cache.get_or_call("search", {"q": "x"}, tool)
+
+    asyncio.run(main())
+    assert tool.calls == 2
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_oversized_results_are_returned_but_not_stored():
+    cache = McpResultCache(max_result_chars=10)
+    tool = CountingTool(result="x" * 11)
+
+    async def main():
+        await cache.get_or_call("read", {}, tool)
+        return await cache.get_or_call("read", {}, tool)
+
+    assert asyncio.run(main()) == "x" * 11
+    assert tool.calls == 2
+    assert cache.stats["oversized"] == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = McpResultCache(max_entries=2)
+    tool = CountingTool()
+
+    async def main():
+        for path in ("a", "b", "a", "c", "a", "b"):
+            await cache.get_or_call("read", {"path": path}, tool)
+
+    asyncio.run(main())
+    assert tool.calls == 4  # a, b, c, then b again after it was evicted
+    assert cache.stats["evictions"] == 2
+
+
+def test_disabled_cache_always_calls():
+    cache = McpResultCache(max_entries=0)
+    tool = CountingTool()
+
+    async def main():
+        await cache.get_or_call("read", {}, tool)
+        await cache.get_or_call("read", {}, tool)
+
+    asyncio.run(main())
+    assert tool.calls == 2
+
+
+def test_concurrent_calls_share_one_invocation():
+    cache = McpResultCache()
+    tool = CountingTool(delay=0.05)
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_call("search", {"q": "x"}, tool) for _ in range(4)))
+
+    assert asyncio.run(main()) == ["result"] * 4
+    assert tool.calls == 1
+    assert cache.stats["shared"] == 3
+
+
+def test_followers_retry_when_the_leading_call_is_cancelled():
+    cache = McpResultCache()
+    tool = CountingTool(delay=0.05)
+
+    async def main():
+        leader = asyncio.ensure_future(cache.get_or_call("search", {"q": "x"}, tool))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(cache.get_or_call("search", {"q": "x"}, tool))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(main()) == "result"
+    assert tool.calls == 2
+
+
+def test_invalidate_by_prefix():
+    cache = McpResultCache()
+    tool = CountingTool()
+
+    async def main():
+        await cache.get_or_call("mcp.fs.read", {}, tool)
+        await cache.get_or_call("mcp.web.search", {}, tool)
+        cache.invalidate("mcp.fs.")
+        await cache.get_or_call("mcp.fs.read", {}, tool)
+        await cache.get_or_call("mcp.web.search", {}, tool)
+
+    asyncio.run(main())
+    assert tool.calls == 3
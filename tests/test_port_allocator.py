@@ -0,0 +1,61 @@
+import socket
+import sys
+
+sys.path.append(".")
+
+from src.browser.port_allocator import DEFAULT_PORT_RANGE, PortAllocator, _parse_port_range
+
+# A range well away from Chrome's usual 9222 so a running browser does not interfere
+START, END = 45100, 45103
+
+
+def test_acquire_hands_out_distinct_ports():
+    allocator = PortAllocator(START, END)
+    ports = [allocator.acquire(f"browser-{i}") for i in range(4)]
+    assert sorted(ports) == list(range(START, END + 1))
+    assert allocator.acquire("browser-5") is None
+
+
+def test_release_makes_port_available_again():
+    allocator = PortAllocator(START, END)
+    ports = [allocator.acquire(f"browser-{i}") for i in range(4)]
+    allocator.release(ports[1])
+    allocator.release(None)  # Browsers launched without a port release None
+    assert allocator.acquire("browser-5") == ports[1]
+    assert list(allocator.list_reservations()) == sorted(ports)
+
+
+def test_round_robin_does_not_reuse_a_just_released_port():
+    allocator = PortAllocator(START, END)
+    first = allocator.acquire("a")
+    allocator.release(first)
+    assert allocator.acquire("b") == first + 1
+
+
+def test_preferred_port_is_used_when_free_and_in_range():
+    allocator = PortAllocator(START, END)
+    assert allocator.acquire("a", preferred=START + 2) == START + 2
+    assert allocator.acquire("b", preferred=START + 2) != START + 2
+    assert allocator.acquire("c", preferred=1234) in range(START, END + 1)
+
+
+def test_ports_bound_by_other_processes_are_skipped():
+    allocator = PortAllocator(START, END)
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", START))
+        s.listen()
+        assert allocator.acquire("a") == START + 1
+
+
+def test_reservations_record_owner_and_endpoint():
+    allocator = PortAllocator(START, END)
+    port = allocator.acquire("agent-1")
+    info = allocator.list_reservations()[port]
+    assert info["owner"] == "agent-1"
+    assert info["endpoint"] == f"http://127.0.0.1:{port}"
+
+
+def test_parse_port_range():
+    assert _parse_port_range("9300-9310") == (9300, 9310)
+    assert _parse_port_range(None) == DEFAULT_PORT_RANGE
+    assert _parse_port_range("not-a-range") == DEFAULT_PORT_RANGE
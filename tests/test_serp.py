@@ -0,0 +1,167 @@
+import asyncio
+import sys
+
+sys.path.append(".")
+
+from src.controller import serp_cache
+from src.controller.serp_cache import SerpCache, normalize_query
+from src.controller.serp_fetcher import canonicalize_url, merge_serp_results, unwrap_redirect_url
+
+
+def result(url, engine, snippet=""):
+    return {"title": url, "url": url, "snippet": snippet, "engine": engine}
+
+
+def test_canonicalize_url_folds_trivial_differences():
+    assert canonicalize_url("http://www.Example.com/a/?utm_source=x&b=2&a=1#top") == "https://example.com/a?a=1&b=2"
+    assert canonicalize_url("https://example.com") == "https://example.com/"
+    assert canonicalize_url("https://example.com/a?spm=1.2&gclid=x") == "https://example.com/a"
+
+
+def test_canonicalize_url_keeps_meaningful_query():
+    assert canonicalize_url("https://example.com/item?id=1") != canonicalize_url("https://example.com/item?id=2")
+
+
+def test_unwrap_redirect_url():
+    assert unwrap_redirect_url("https://www.google.com/url?q=https://example.com/a&sa=U") == "https://example.com/a"
+    assert unwrap_redirect_url("https://www.so.com/link?m=x&url=https://example.com/b") == "https://example.com/b"
+    assert unwrap_redirect_url("https://example.com/c") == "https://example.com/c"
+
+
+def test_merge_interleaves_by_rank_and_dedupes():
+    bing = [result("https://a.com/", "bing"), result("https://b.com/", "bing")]
+    baidu = [result("http://www.b.com", "baidu", snippet="from baidu"), result("https://c.com/", "baidu")]
+    merged = merge_serp_results([bing, baidu], limit=10)
+    assert [r["url"] for r in merged] == ["https://a.com/", "http://www.b.com", "https://c.com/"]
+    b = merged[1]
+    assert b["engines"] == ["baidu", "bing"]
+    assert b["snippet"] == "from baidu"
+
+
+def test_merge_fills_missing_snippet_and_respects_limit():
+    first = [result("https://a.com/", "bing")]
+    second = [result("https://a.com", "sogou", snippet="text"), result("https://d.com/", "sogou")]
+    merged = merge_serp_results([first, second], limit=1)
+    assert len(merged) == 1
+    assert merged[0]["snippet"] == "text"
+    assert merge_serp_results([]) == []
+
+
+def test_normalize_query():
+    assert normalize_query("  Python   ＡＳＹＮＣＩＯ ") == "python asyncio"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+def test_serp_cache_fresh_stale_and_expired(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(serp_cache.time, "time", clock.time)
+    cache = SerpCache(ttl=10, stale_while_revalidate=20)
+    cache.set("bing", "Query", ["v1"])
+
+    assert cache.get("BING", " query ") == ["v1"]
+    clock.now += 15
+    assert cache.get("bing", "query") == ["v1"]
+    assert cache.get("bing", "query", allow_stale=False) is None
+    clock.now += 20
+    assert cache.get("bing", "query") is None
+
+
+def test_serp_cache_serves_stale_and_revalidates_in_background(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(serp_cache.time, "time", clock.time)
+    cache = SerpCache(ttl=10, stale_while_revalidate=20)
+    calls = []
+
+    async def fetch():
+        calls.append("fetch")
+        return [f"v{len(calls)}"]
+
+    async def main():
+        assert await cache.get_or_fetch("bing", "q", fetch) == ["v1"]
+        assert await cache.get_or_fetch("bing", "q", fetch) == ["v1"]
+        clock.now += 15
+        assert await cache.get_or_fetch("bing", "q", fetch) == ["v1"]  # Stale, refresh scheduled
+        await asyncio.gather(*cache._background_tasks)
+        assert await cache.get_or_fetch("bing", "q", fetch) == ["v2"]
+
+    asyncio.run(main())
+    assert len(calls) == 2
+    assert cache.stats["hits"] == 2 and cache.stats["stale_hits"] == 1 and cache.stats["misses"] == 1
+
+
+def test_serp_cache_does_not_cache_empty_results():
+    cache = SerpCache()
+    calls = []
+
+    async def fetch():
+        calls.append("fetch")
+        return []
+
+    async def main():
+        await cache.get_or_fetch("bing", "q", fetch)
+        await cache.get_or_fetch("bing", "q", fetch)
+
+    asyncio.run(main())
+    assert len(calls) == 2
+
+
+def test_serp_cache_shares_concurrent_misses():
+    cache = SerpCache()
+    calls = []
+
+    async def fetch():
+        calls.append("fetch")
+        await asyncio.sleep(0.05)
+        return ["v"]
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_fetch("bing", "q", fetch) for _ in range(5)))
+
+    assert asyncio.run(main()) == [["v"]] * 5
+    assert len(calls) == 1
+
+
+def test_serp_cache_followers_retry_when_leader_is_cancelled():
+    cache = SerpCache()
+    calls = []
+
+    async def fetch():
+        calls.append("fetch")
+        await asyncio.sleep(0.05)
+        return ["v"]
+
+    async def main():
+        leader = asyncio.ensure_future(cache.get_or_fetch("bing", "q", fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(cache.get_or_fetch("bing", "q", fetch))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(main()) == ["v"]
+    assert len(calls) == 2
+
+
+def test_serp_cache_persists_to_disk(tmp_path):
+    SerpCache(disk_dir=str(tmp_path)).set("bing", "q", ["v"])
+    restarted = SerpCache(disk_dir=str(tmp_path))
+    assert restarted.get("bing", "q") == ["v"]
+    assert restarted.stats["disk_hits"] == 1
+
+
+def test_serp_cache_evicts_least_recently_used():
+    cache = SerpCache(max_entries=2)
+    cache.set("bing", "a", ["a"])
+    cache.set("bing", "b", ["b"])
+    cache.get("bing", "a")
+    cache.set("bing", "c", ["c"])
+    assert cache.get("bing", "b") is None
+    assert cache.get("bing", "a") == ["a"]
+    assert cache.stats["evictions"] == 1